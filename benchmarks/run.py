@@ -0,0 +1,255 @@
+"""
+Benchmarks of the validate, read, stats, format --apply_config and
+gen_meta drivers on synthetic files, see synthetic.py, and of the
+startup of the command line interface.
+
+    python -m benchmarks.run --rows 1M --rows 10M --out bench.json
+    python -m benchmarks.run --rows 1M --baseline bench-1.5.json
+
+Generated files are kept in the work directory under names that say
+how they were made, so later runs reuse them. Each benchmark is run
+--repeat times and the fastest time is recorded. Results are written
+as JSON along with the package version and the machine they ran on.
+Given a baseline from an earlier run, benchmarks that have slowed
+down by more than the tolerance are listed and the exit code is 1.
+The startup benchmark also reports whether a fresh interpreter ran the
+version command within STARTUP_BUDGET seconds.
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, List
+
+import typer
+from rich import print
+
+from benchmarks.synthetic import COMPRESSIONS, VARIANTS, synthetic_filename, write_synthetic
+from gwas_sumstats_tools.schema.pre_defined_configure import pre_defined_configure
+
+
+BENCHMARKS = ("startup", "validate", "read", "stats", "format", "gen_meta")
+# Seconds to start python, import the CLI and run a light command.
+# Loading pandas, pandera and pydantic alone takes longer.
+STARTUP_BUDGET = 0.8
+STARTUP_SCRIPT = "from gwas_sumstats_tools.cli import app; app(['version'])"
+RESULT_KEY = ("benchmark", "rows", "variant", "compression", "preset")
+
+app = typer.Typer(add_completion=False)
+
+
+def parse_rows(rows: str) -> int:
+    """Rows given as e.g. 1000000, 1M or 250k"""
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(rows[-1].lower(), 1)
+    return int(float(rows.rstrip("kKmM")) * multiplier)
+
+
+def synthetic_file(workdir: Path, nrows: int, seed: int, variant: str = "valid",
+                   compression: str = "plain", preset: str = None) -> Path:
+    """A synthetic file from the work directory, written if it is not there yet"""
+    path = workdir / synthetic_filename(nrows, seed=seed, variant=variant,
+                                        compression=compression, preset=preset)
+    if not path.exists():
+        start = time.perf_counter()
+        partial = path.with_name(path.name + ".partial")
+        write_synthetic(partial, nrows, seed=seed, variant=variant,
+                        compression=compression, preset=preset)
+        partial.rename(path)
+        print(f"[dim]wrote {path.name} in {time.perf_counter() - start:.1f} s[/dim]")
+    return path
+
+
+def timed(function: Callable, repeat: int = 1) -> tuple:
+    """(fastest time in seconds, outcome) of calling function repeat
+    times, with its output discarded. The outcome is what the function
+    returns, or "exit <code>" if it exits.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                outcome = function()
+            except SystemExit as error:
+                outcome = f"exit {error.code}"
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, outcome
+
+
+def result(benchmark: str, nrows: int, seconds: float, outcome,
+           variant: str = "valid", compression: str = "plain", preset: str = None) -> dict:
+    entry = {"benchmark": benchmark,
+             "rows": nrows,
+             "variant": variant,
+             "compression": compression,
+             "preset": preset,
+             "seconds": round(seconds, 3),
+             "rows_per_second": round(nrows / seconds) if seconds else None,
+             "outcome": outcome}
+    typer.echo(f"{benchmark:<9} {nrows:>11,} {variant:<6} {compression:<6} {preset or '':<9}"
+               f" {seconds:>9.2f} s {entry['rows_per_second'] or 0:>12,} rows/s  {outcome}")
+    return entry
+
+
+def run_benchmarks(nrows: int,
+                   workdir: Path,
+                   benchmarks: List[str] = BENCHMARKS,
+                   variants: List[str] = VARIANTS,
+                   compressions: List[str] = COMPRESSIONS,
+                   presets: List[str] = None,
+                   seed: int = 0,
+                   workers: int = 1,
+                   repeat: int = 1) -> list:
+    """Run the benchmarks on files of nrows rows
+
+    Arguments:
+        nrows -- rows in the synthetic files
+        workdir -- directory for the synthetic files and outputs
+
+    Keyword Arguments:
+        benchmarks -- benchmarks to run (default: {BENCHMARKS})
+        variants -- variants of file to validate (default: {VARIANTS})
+        compressions -- compressions of file to validate, read and summarise (default: {COMPRESSIONS})
+        presets -- pre_defined_configure presets to format with (default: {None, which means all})
+        seed -- random seed of the synthetic files (default: {0})
+        workers -- processes for read --count and stats (default: {1})
+        repeat -- times to run each benchmark, the fastest is kept (default: {1})
+
+    Returns:
+        list of result dicts
+    """
+    from gwas_sumstats_tools.format import format
+    from gwas_sumstats_tools.gen_meta import gen_meta
+    from gwas_sumstats_tools.read import read
+    from gwas_sumstats_tools.stats import stats
+    from gwas_sumstats_tools.validate import validate
+
+    workdir.mkdir(parents=True, exist_ok=True)
+    presets = list(pre_defined_configure) if presets is None else presets
+    results = []
+    if "startup" in benchmarks:
+        def start_cli():
+            subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], capture_output=True, check=True)
+        start_cli()  # warm the bytecode cache
+        seconds, _ = timed(start_cli, repeat)
+        results.append(result("startup", 0, seconds,
+                              "ok" if seconds < STARTUP_BUDGET else f"over the {STARTUP_BUDGET} s budget"))
+    if "validate" in benchmarks:
+        for variant in variants:
+            for compression in compressions:
+                path = synthetic_file(workdir, nrows, seed, variant, compression)
+                seconds, (valid, _, _, error_type) = timed(
+                    lambda: validate(path, minimum_rows=min(nrows, 100_000)), repeat)
+                results.append(result("validate", nrows, seconds, "valid" if valid else error_type,
+                                      variant=variant, compression=compression))
+    if "read" in benchmarks:
+        for compression in compressions:
+            path = synthetic_file(workdir, nrows, seed, compression=compression)
+            seconds, (count, _) = timed(lambda: read(path, count=True, workers=workers), repeat)
+            results.append(result("read", nrows, seconds, f"{count} rows", compression=compression))
+    if "stats" in benchmarks:
+        for compression in compressions:
+            path = synthetic_file(workdir, nrows, seed, compression=compression)
+            seconds, summary = timed(lambda: stats(path, workers=workers), repeat)
+            results.append(result("stats", nrows, seconds, f"{summary['rows']} rows", compression=compression))
+    if "format" in benchmarks:
+        for preset in presets:
+            path = synthetic_file(workdir, nrows, seed, preset=preset)
+            outfile = workdir / f"formatted-{path.stem}.tsv"
+            seconds, _ = timed(lambda: format(path, data_outfile=outfile,
+                                              analysis_software=preset, apply_config=True), repeat)
+            results.append(result("format", nrows, seconds, "ok" if outfile.exists() else "no output",
+                                  preset=preset))
+    if "gen_meta" in benchmarks:
+        path = synthetic_file(workdir, nrows, seed)
+        metadata_outfile = workdir / f"{path.name}-meta.yaml"
+        seconds, _ = timed(lambda: gen_meta(path, generate_metadata=True, metadata_outfile=metadata_outfile,
+                                            metadata_dict={"genomeAssembly": "GRCh38"}), repeat)
+        results.append(result("gen_meta", nrows, seconds, "ok" if metadata_outfile.exists() else "no output"))
+    return results
+
+
+def environment() -> dict:
+    from gwas_sumstats_tools.utils import get_version
+    return {"version": get_version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+
+
+def regressions(results: list, baseline: list, tolerance: float) -> list:
+    """(result, baseline result) of the results more than tolerance times
+    slower than the same benchmark in the baseline
+    """
+    previous = {tuple(entry[key] for key in RESULT_KEY): entry for entry in baseline}
+    slower = []
+    for entry in results:
+        before = previous.get(tuple(entry[key] for key in RESULT_KEY))
+        if before and before["seconds"] and entry["seconds"] > before["seconds"] * tolerance:
+            slower.append((entry, before))
+    return slower
+
+
+def _split(values: List[str]) -> List[str]:
+    return [value for option in values for value in option.split(",") if value]
+
+
+@app.command()
+def main(rows: List[str] = typer.Option(["1M"], "--rows", "-n",
+                                        help="Rows in the synthetic files, e.g. 1M, 10M, 50M. Can be given more than once"),
+         benchmark: List[str] = typer.Option(list(BENCHMARKS), "--benchmark", "-b",
+                                             help=f"Benchmarks to run, of {', '.join(BENCHMARKS)}"),
+         variant: List[str] = typer.Option(list(VARIANTS), "--variant",
+                                           help=f"Files to validate, of {', '.join(VARIANTS)}"),
+         compression: List[str] = typer.Option(list(COMPRESSIONS), "--compression",
+                                               help=f"Compressions to benchmark, of {', '.join(COMPRESSIONS)}"),
+         preset: List[str] = typer.Option(list(pre_defined_configure), "--preset",
+                                          help="pre_defined_configure presets to format with"),
+         workdir: Path = typer.Option(Path("bench_data"), "--workdir", "-d",
+                                      help="Directory for the synthetic files, reused between runs"),
+         seed: int = typer.Option(0, "--seed", help="Random seed of the synthetic files"),
+         workers: int = typer.Option(1, "--workers", "-w", help="Processes for read --count and stats"),
+         repeat: int = typer.Option(1, "--repeat", help="Times to run each benchmark, the fastest is kept"),
+         out: Path = typer.Option(None, "--out", "-o", help="Write the results to this JSON file"),
+         baseline: Path = typer.Option(None, "--baseline",
+                                       help="JSON results of an earlier run to compare against"),
+         tolerance: float = typer.Option(1.25, "--tolerance",
+                                         help="Slow down over the baseline that counts as a regression")):
+    """Benchmark the gwas-ssf drivers on synthetic files"""
+    results = []
+    for nrows in map(parse_rows, _split(rows)):
+        results.extend(run_benchmarks(nrows, workdir,
+                                      benchmarks=_split(benchmark),
+                                      variants=_split(variant),
+                                      compressions=_split(compression),
+                                      presets=_split(preset),
+                                      seed=seed,
+                                      workers=workers,
+                                      repeat=repeat))
+    report = {**environment(), "seed": seed, "workers": workers, "results": results}
+    if out:
+        out.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Results written to {out}")
+    if baseline:
+        before = json.loads(baseline.read_text())
+        slower = regressions(results, before["results"], tolerance)
+        for entry, previous in slower:
+            print(f"[bold red]{entry['benchmark']} {entry['rows']:,} {entry['variant']} {entry['compression']}"
+                  f" {entry['preset'] or ''}: {previous['seconds']} s -> {entry['seconds']} s[/bold red]")
+        if slower:
+            raise typer.Exit(code=1)
+        print(f"No regressions over {before.get('version')} beyond {tolerance}x")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,227 @@
+"""
+Deterministic synthetic GWAS-SSF files for benchmarks.
+
+Rows are generated CHUNK_ROWS at a time from a generator seeded with
+(seed, chunk number), so the same arguments always give the same
+bytes, whatever the machine. Rows are sorted by chromosome and
+position, spread over chromosomes 1-22 in proportion to their length.
+
+Files can be:
+    valid -- a valid GWAS-SSF file
+    light -- about 1 in 10,000 rows broken, one field each
+    heavy -- about 1 in 20 rows broken, in several fields
+
+and written plain, gzip or BGZF compressed. A file can also be laid
+out as the raw output of one of the pre_defined_configure presets,
+for benchmarking format --apply_config with that preset.
+"""
+
+import gzip
+import math
+from pathlib import Path
+from typing import Iterator, Union
+
+import numpy as np
+
+from gwas_sumstats_tools.interfaces.bgzf import BgzfWriter
+from gwas_sumstats_tools.schema.pre_defined_configure import pre_defined_configure
+
+
+CHUNK_ROWS = 250_000
+VARIANTS = ("valid", "light", "heavy")
+COMPRESSIONS = ("plain", "gz", "bgzf")
+BROKEN_FRACTION = {"valid": 0, "light": 1e-4, "heavy": 0.05}
+GWAS_SSF_FIELDS = ("chromosome", "base_pair_location", "effect_allele", "other_allele",
+                   "beta", "standard_error", "effect_allele_frequency", "p_value",
+                   "variant_id", "rsid")
+# GRCh38 lengths of chromosomes 1-22 in Mb
+CHROMOSOME_MB = (248, 242, 198, 190, 181, 171, 159, 145, 138, 134, 135, 133,
+                 114, 107, 102, 90, 83, 80, 59, 64, 47, 51)
+BASES = np.array(["A", "C", "G", "T"])
+SAMPLE_SIZE = 50_000
+# values that break one field each, by field
+BREAKAGE = {"chromosome": ("chr1", "NA", "0"),
+            "base_pair_location": ("-5", "1.5e3", "#NA"),
+            "effect_allele": ("N", "a", ""),
+            "other_allele": ("X", "#NA", "-"),
+            "beta": ("beta", "#NA", "1,2"),
+            "standard_error": ("se", "#NA", "inf"),
+            "effect_allele_frequency": ("1.5", "-0.1", "freq"),
+            "p_value": ("2", "-1e-5", "p")}
+
+
+def _erfc(x: np.ndarray) -> np.ndarray:
+    """Complementary error function, Abramowitz and Stegun 7.1.26,
+    good to about 1e-7, which is plenty for synthetic p-values
+    """
+    t = 1 / (1 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return poly * np.exp(-x * x)
+
+
+def _chromosome_bounds(nrows: int) -> np.ndarray:
+    """Row index at which each chromosome starts, and nrows"""
+    weights = np.array(CHROMOSOME_MB, dtype=float)
+    counts = np.floor(nrows * weights / weights.sum()).astype(np.int64)
+    counts[:nrows - counts.sum()] += 1
+    return np.concatenate([[0], np.cumsum(counts)])
+
+
+def _chunk(nrows: int, start: int, stop: int, seed: int, variant: str) -> dict:
+    rng = np.random.default_rng([seed, start // CHUNK_ROWS])
+    rows = np.arange(start, stop)
+    bounds = _chromosome_bounds(nrows)
+    chromosome = np.searchsorted(bounds, rows, side="right")
+    first_row = bounds[chromosome - 1]
+    rows_in_chromosome = bounds[chromosome] - first_row
+    # evenly spaced positions with jitter keep the rows sorted
+    spacing = np.array(CHROMOSOME_MB)[chromosome - 1] * 1_000_000 // np.maximum(rows_in_chromosome, 1)
+    position = (rows - first_row) * spacing + 1 + rng.integers(0, np.maximum(spacing, 1))
+    effect = rng.integers(0, 4, len(rows))
+    other = (effect + rng.integers(1, 4, len(rows))) % 4
+    # a few insertions
+    insertion = rng.random(len(rows)) < 0.02
+    effect_allele = np.where(insertion, np.char.add(BASES[effect], BASES[other]), BASES[effect])
+    frequency = rng.uniform(0.005, 0.995, len(rows))
+    standard_error = 0.02 / np.sqrt(2 * frequency * (1 - frequency))
+    z = rng.standard_normal(len(rows))
+    hits = rng.random(len(rows)) < 2e-4
+    z[hits] += np.sign(z[hits]) * rng.uniform(5, 12, hits.sum())
+    p_value = _erfc(np.abs(z) / math.sqrt(2))
+    # formatting with f-strings is several times faster than DataFrame.to_csv
+    columns = {"chromosome": list(map(str, chromosome.tolist())),
+               "base_pair_location": list(map(str, position.tolist())),
+               "effect_allele": effect_allele.tolist(),
+               "other_allele": BASES[other].tolist(),
+               "beta": [f"{value:.5g}" for value in (z * standard_error).tolist()],
+               "standard_error": [f"{value:.5g}" for value in standard_error.tolist()],
+               "effect_allele_frequency": [f"{value:.4f}" for value in frequency.tolist()],
+               "p_value": [f"{value:.4g}" for value in p_value.tolist()]}
+    columns["variant_id"] = [f"{chrom}_{pos}_{other}_{effect}" for chrom, pos, other, effect
+                             in zip(columns["chromosome"], columns["base_pair_location"],
+                                    columns["other_allele"], columns["effect_allele"])]
+    columns["rsid"] = [f"rs{row}" for row in range(start + 1, stop + 1)]
+    if BROKEN_FRACTION[variant]:
+        _break(columns, rng, BROKEN_FRACTION[variant], fields_per_row=1 if variant == "light" else 3)
+    return columns
+
+
+def _break(columns: dict, rng: np.random.Generator, fraction: float, fields_per_row: int) -> None:
+    nrows = len(columns["chromosome"])
+    broken = np.flatnonzero(rng.random(nrows) < fraction)
+    fields = list(BREAKAGE)
+    for _ in range(fields_per_row):
+        chosen = rng.integers(0, len(fields), len(broken))
+        values = rng.integers(0, 3, len(broken))
+        for row, field, value in zip(broken.tolist(), chosen.tolist(), values.tolist()):
+            columns[fields[field]][row] = BREAKAGE[fields[field]][value]
+
+
+def synthetic_chunks(nrows: int, seed: int = 0, variant: str = "valid") -> Iterator[dict]:
+    """GWAS-SSF rows, CHUNK_ROWS rows at a time, as dicts of field to
+    list of values, as written
+
+    Arguments:
+        nrows -- rows in the file
+
+    Keyword Arguments:
+        seed -- random seed (default: {0})
+        variant -- one of VARIANTS (default: {"valid"})
+
+    Returns:
+        iterator of dicts
+    """
+    if variant not in VARIANTS:
+        raise ValueError(f"Variant '{variant}' is not one of {VARIANTS}")
+    for start in range(0, nrows, CHUNK_ROWS):
+        yield _chunk(nrows, start, min(start + CHUNK_ROWS, nrows), seed, variant)
+
+
+def _neg_log10(value: str) -> str:
+    try:
+        return f"{-math.log10(float(value)):.4f}"
+    except ValueError:
+        return "NA"
+
+
+def preset_layout(columns: dict, preset: str) -> dict:
+    """Rows in the columns of the raw output of a pre_defined_configure
+    preset, so that formatting them with the preset gives GWAS-SSF
+    fields back. Columns the preset does not map to a GWAS-SSF field
+    are filled with plausible constants.
+    """
+    config = pre_defined_configure[preset]
+    nrows = len(columns["chromosome"])
+    layout = {}
+    for edit in config["columnConfig"]["edit"]:
+        target = edit["rename"]
+        if target == "p_value" and config["fileConfig"]["convertNegLog10Pvalue"]:
+            layout[edit["field"]] = list(map(_neg_log10, columns["p_value"]))
+        elif target in columns:
+            layout[edit["field"]] = columns[target]
+        elif target == "n":
+            layout[edit["field"]] = [str(SAMPLE_SIZE)] * nrows
+        else:
+            layout[edit["field"]] = ["0.5"] * nrows
+    return layout
+
+
+def preset_separator(preset: str) -> str:
+    return pre_defined_configure[preset]["fileConfig"]["fieldSeparator"] or "\t"
+
+
+def _open(path: Path, compression: str):
+    if compression == "gz":
+        return gzip.open(path, "wb", compresslevel=6)
+    if compression == "bgzf":
+        return BgzfWriter(path)
+    return open(path, "wb")
+
+
+def write_synthetic(path: Union[Path, str],
+                    nrows: int,
+                    seed: int = 0,
+                    variant: str = "valid",
+                    compression: str = "plain",
+                    preset: str = None) -> Path:
+    """Write a synthetic sumstats file
+
+    Arguments:
+        path -- file to write
+        nrows -- rows in the file
+
+    Keyword Arguments:
+        seed -- random seed (default: {0})
+        variant -- one of VARIANTS (default: {"valid"})
+        compression -- one of COMPRESSIONS (default: {"plain"})
+        preset -- lay the file out as the raw output of this pre_defined_configure preset (default: {None})
+
+    Returns:
+        path
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compression '{compression}' is not one of {COMPRESSIONS}")
+    path = Path(path)
+    separator = preset_separator(preset) if preset else "\t"
+    with _open(path, compression) as fh:
+        if preset and pre_defined_configure[preset]["fileConfig"]["removeComments"]:
+            comment = pre_defined_configure[preset]["fileConfig"]["removeComments"]
+            fh.write(f"{comment}synthetic {preset} output, seed {seed}\n".encode())
+        header = True
+        for columns in synthetic_chunks(nrows, seed=seed, variant=variant):
+            if preset:
+                columns = preset_layout(columns, preset)
+            if header:
+                fh.write((separator.join(columns) + "\n").encode())
+                header = False
+            fh.write("".join([separator.join(row) + "\n" for row in zip(*columns.values())]).encode())
+    return path
+
+
+def synthetic_filename(nrows: int, seed: int = 0, variant: str = "valid",
+                       compression: str = "plain", preset: str = None) -> str:
+    """Name of a synthetic file that says how it was made, so it can be reused"""
+    layout = preset.lower().replace("-", "") if preset else "ssf"
+    suffix = ".tsv" if compression == "plain" else ".tsv.gz"
+    tag = "" if compression != "bgzf" else "-bgzf"
+    return f"{layout}-{nrows}-{variant}-seed{seed}{tag}{suffix}"
@@ -1,14 +1,13 @@
+import json
 from pathlib import Path
 from typing import List, Optional
 import typer
-from rich import print
+from rich import print, print_json
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
-from gwas_sumstats_tools.gen_meta import gen_meta
-from gwas_sumstats_tools.validate import validate
-from gwas_sumstats_tools.read import read
-from gwas_sumstats_tools.format import format
-from gwas_sumstats_tools.utils import (header_dict_from_args, metadata_dict_from_args,get_version)
+# The drivers of the commands are imported in the commands, so that
+# each command only loads what it needs, e.g. `version` and `--help`
+# do not load pandas, pandera or pydantic.
 
 
 app = typer.Typer(add_completion=False,
@@ -17,10 +16,58 @@ app = typer.Typer(add_completion=False,
                   context_settings={"help_option_names": ["-h", "--help"]})
 
 
+@app.callback()
+def ss_main(ctx: typer.Context,
+            profile: Path = typer.Option(None,
+                                         "--profile",
+                                         help=("Profile the command with cProfile, write the stats to this "
+                                               "file and print the hot spots on exit. Only the main "
+                                               "process is profiled, not --workers processes")),
+            profile_sample: bool = typer.Option(False,
+                                                "--profile-sample",
+                                                help=("With --profile, also sample the stack every 5 ms, "
+                                                      "write the folded stacks to <profile>.folded for a "
+                                                      "flame graph and print the hot lines")),
+            metrics: Path = typer.Option(None,
+                                         "--metrics",
+                                         help=("Write the time and peak memory of the stages of the command, "
+                                               "e.g. read, p-value split, schema validation, error collection "
+                                               "and write for validate, or read, split and edit, p-value "
+                                               "conversion and write for format, to "
+                                               "this JSON file and print them on exit. Memory is traced "
+                                               "with tracemalloc, which slows the command down"))
+            ):
+    """
+    Tools for GWAS summary statistics files in the GWAS-SSF format
+    """
+    if profile_sample and not profile:
+        raise typer.BadParameter("--profile-sample needs --profile")
+    if metrics:
+        from gwas_sumstats_tools.interfaces.memory import MemoryMonitor
+        ctx.call_on_close(MemoryMonitor(outfile=metrics).start().stop)
+    if profile:
+        from gwas_sumstats_tools.interfaces.profile import Profiler
+        ctx.call_on_close(Profiler(profile, sample=profile_sample).start().stop)
+
+
 def exit_status(status: bool) -> int:
     return 0 if status is True else 1
 
 
+def print_validation(valid: bool, message: str, error_preview, error_type: Optional[str]) -> None:
+    print(f"Validation status: {valid}")
+    print(message)
+    if error_type:
+        print(("Primary reason for validation failure: "
+               f"[red]{error_type}[/red]"))
+    if error_preview:
+        print(("See below for a preview of the errors. "
+               "To get all the errors in a file run the "
+               "[green][bold]validate[/bold][/green] command "
+               "with the [green][bold]-e[/bold][/green] flag."))
+        print(error_preview)
+
+
 @app.command("validate",
              no_args_is_help=True,
              context_settings={"help_option_names": ["-h", "--help"],
@@ -56,6 +103,7 @@ def ss_validate(filename: Path = typer.Argument(...,
     """
     [green]VALIDATE[/green] a GWAS summary statistics data file
     """
+    from gwas_sumstats_tools.validate import validate
     print(f"Validating file: {filename}")
     with Progress(SpinnerColumn(),
                   TextColumn("[progress.description]{task.description}"),
@@ -71,17 +119,10 @@ def ss_validate(filename: Path = typer.Argument(...,
                                 minimum_rows=minimum_rows,
                                 chunksize=chunkzize,
                                 infer_from_metadata=infer_from_metadata)
-    print(f"Validation status: {valid}")
-    print(message)
-    if error_type:
-        print(("Primary reason for validation failure: "
-               f"[red]{error_type}[/red]"))
-    if error_preview:
-        print(("See below for a preview of the errors. "
-               "To get all the errors in a file run the "
-               "[green][bold]validate[/bold][/green] command "
-               "with the [green][bold]-e[/bold][/green] flag."))
-        print(error_preview)
+    print_validation(valid=valid,
+                     message=message,
+                     error_preview=error_preview,
+                     error_type=error_type)
     raise typer.Exit(exit_status(valid))
 
 
@@ -122,20 +163,142 @@ def ss_read(filename: Path = typer.Argument(...,
                                                     help="Specify the delimiter in the file,if not specified," 
                                                     "we can automatically detect the delimiter as whitespace if your is *.txt file,"
                                                     "or comma if your is *.csv file; or tab if your is *.tsv.gz file."
-                                                    "Otherwise, please specific the delimiter which can help to recognise the column correctly.")
+                                                    "Otherwise, please specific the delimiter which can help to recognise the column correctly."),
+            region: str = typer.Option(None,
+                                       "--region",
+                                       help=("Write the rows in a region, chromosome:start-end, as TSV. "
+                                             "BGZF files are read through their tabix index <filename>.tbi, "
+                                             "or else a coordinate index <filename>-coords.json is built on "
+                                             "the first query, as for uncompressed files")),
+            rsids: Optional[List[str]] = typer.Option(None,
+                                                      "--rsid",
+                                                      help=("Write the rows with this rsID as TSV, e.g. "
+                                                            "`--rsid rs123 --rsid rs456`, read through the "
+                                                            "rsID index <filename>-rsid.idx, which is built "
+                                                            "first if need be")),
+            rsid_file: Path = typer.Option(None,
+                                           "--rsid-file",
+                                           exists=True,
+                                           readable=True,
+                                           help="File of rsIDs to write the rows of, one per line"),
+            columns: Optional[List[str]] = typer.Option(None,
+                                                        "--columns", "-c",
+                                                        help=("Only show these columns, e.g. "
+                                                              "`-c chromosome,base_pair_location -c p_value`")),
+            count: bool = typer.Option(False,
+                                       "--count",
+                                       help=("Print the number of data rows, counted from the line breaks "
+                                             "of the file without parsing the rows")),
+            workers: int = typer.Option(1,
+                                        "--workers", "-w",
+                                        min=1,
+                                        help="Processes to count the rows of BGZF or uncompressed files in, with --count")
             ):
     """
     [green]READ[/green] a sumstats file
     """
-    result, message = read(filename=filename,
-                           delimiter=delimiter,
-                           remove_comments=remove_comments,
-                           metadata_infile=metadata_infile,
-                           get_header=get_header,
-                           get_all_metadata=get_all_metadata,
-                           get_metadata=get_metadata)
+    from gwas_sumstats_tools.read import read, read_rsid_file
+    rsids = list(rsids or []) + (read_rsid_file(rsid_file) if rsid_file else [])
+    columns = [column.strip() for value in columns or [] for column in value.split(",") if column.strip()]
+    try:
+        result, message = read(filename=filename,
+                               delimiter=delimiter,
+                               remove_comments=remove_comments,
+                               metadata_infile=metadata_infile,
+                               get_header=get_header,
+                               get_all_metadata=get_all_metadata,
+                               get_metadata=get_metadata,
+                               region=region,
+                               rsids=rsids,
+                               columns=columns,
+                               count=count,
+                               workers=workers)
+    except ValueError as error:
+        print(f"[red]{error}[/red]")
+        raise typer.Exit(1)
+    print(message)
+    if region or rsids:
+        import petl as etl
+        etl.totsv(result)
+    else:
+        print(result)
+
+
+@app.command("index",
+             no_args_is_help=True,
+             context_settings={"help_option_names": ["-h", "--help"]})
+def ss_index(filename: Path = typer.Argument(...,
+                                             exists=True,
+                                             readable=True,
+                                             help="Input sumstats file. Must be uncompressed or BGZF compressed"),
+             rsid: bool = typer.Option(False,
+                                       "--rsid",
+                                       help=("Build the rsID index <filename>-rsid.idx used by "
+                                             "`read --rsid` and `read --rsid-file`")),
+             remove_comments: str = typer.Option(None,
+                                                 "--remove_comments", "-r",
+                                                 help=("remove the comments in the file")),
+             delimiter: str = typer.Option(None,
+                                           "--delimiter", "-d",
+                                           help="Specify the delimiter in the file, detected from the content if not given")
+             ):
+    """
+    [green]INDEX[/green] a sumstats file for random access
+    """
+    from gwas_sumstats_tools.index import index
+    try:
+        message = index(filename=filename,
+                        rsid=rsid,
+                        remove_comments=remove_comments,
+                        delimiter=delimiter)
+    except ValueError as error:
+        print(f"[red]{error}[/red]")
+        raise typer.Exit(1)
     print(message)
-    print(result)
+
+
+@app.command("stats",
+             no_args_is_help=True,
+             context_settings={"help_option_names": ["-h", "--help"]})
+def ss_stats(filename: Path = typer.Argument(...,
+                                             exists=True,
+                                             readable=True,
+                                             help="Input sumstats file"),
+             workers: int = typer.Option(1,
+                                         "--workers", "-w",
+                                         min=1,
+                                         help=("Processes to summarise parts of BGZF or uncompressed "
+                                               "files in. Other files are read in one process")),
+             thresholds: Optional[List[float]] = typer.Option(None,
+                                                              "--threshold", "-t",
+                                                              help=("p-value threshold of significance, can be "
+                                                                    "given more than once [default: 5e-8, 1e-5]")),
+             json_out: Path = typer.Option(None,
+                                           "--json-out", "-o",
+                                           help="Write the summary to this file instead of printing it"),
+             remove_comments: str = typer.Option(None,
+                                                 "--remove_comments", "-r",
+                                                 help=("remove the comments in the file")),
+             delimiter: str = typer.Option(None,
+                                           "--delimiter", "-d",
+                                           help="Specify the delimiter in the file, detected from the content if not given")
+             ):
+    """
+    [green]STATS[/green]: summarise a sumstats file for QC
+    """
+    from gwas_sumstats_tools.stats import stats
+    options = {"thresholds": tuple(thresholds)} if thresholds else {}
+    summary = stats(filename=filename,
+                    workers=workers,
+                    remove_comments=remove_comments,
+                    delimiter=delimiter,
+                    **options)
+    if json_out:
+        with open(json_out, "w") as fh:
+            json.dump(summary, fh, indent=2)
+        print(f"Summary written to {json_out}")
+    else:
+        print_json(data=summary)
 
 
 @app.command("format",
@@ -162,7 +325,7 @@ def ss_format(filename: Path = typer.Argument(...,
                                                 "--ss_out", "-o",
                                                 writable=True,
                                                 file_okay=True,
-                                                help="Output sumstats file"),
+                                                help="Output sumstats file, written as Parquet if it ends with .parquet"),
               config_outfile: Path = typer.Option(None,
                                                     "--config_out",
                                                     writable=True,
@@ -197,7 +360,8 @@ def ss_format(filename: Path = typer.Argument(...,
                                                      help=("Apply the given configure file to the file")),
               test_config: bool = typer.Option(False,
                                                      "--test_config", "-t",
-                                                     help=("Test the given configure file to the first 5 rows of the file")),
+                                                     help=("Test the given configure file on rows sampled from across the file, "
+                                                           "reporting the rows each step of the configure fails for")),
               batch_apply: bool = typer.Option(None,
                                                      "--batch_apply", "-b",
                                                      help=("Apply configure files to the corresponding files")),
@@ -207,25 +371,90 @@ def ss_format(filename: Path = typer.Argument(...,
               slurm: bool = typer.Option(False,
                                                      "--slurm",
                                                      help=("running the batch process via subitting job via Slurm")),
+              workers: int = typer.Option(1,
+                                          "--workers",
+                                          min=1,
+                                          help=("Number of processes used to format the file with --apply_config. "
+                                                "Chunks are formatted in parallel and written in the input order. "
+                                                "With --batch_apply, the number of files formatted at once.")),
+              chunksize: int = typer.Option(100_000,
+                                            "--chunksize",
+                                            min=1,
+                                            help=("Number of rows in each chunk given to a worker process. "
+                                                  "Only used when --workers is greater than 1.")),
+              bgzip: bool = typer.Option(False,
+                                         "--bgzip",
+                                         help=("Write the output with BGZF block compression, using --workers threads. "
+                                               "A tabix index <ss_out>.tbi is also written if the output is sorted "
+                                               "by chromosome and base_pair_location.")),
+              compression_level: int = typer.Option(6,
+                                                    "--compression_level",
+                                                    min=0,
+                                                    max=9,
+                                                    help="Compression level of the --bgzip output"),
+              sort: bool = typer.Option(False,
+                                        "--sort",
+                                        help=("Sort the output by chromosome and base_pair_location and set "
+                                              "is_sorted in the metadata file <ss_out>-meta.yaml")),
+              sort_memory: int = typer.Option(1024,
+                                              "--sort_memory",
+                                              min=1,
+                                              help=("Memory in MB for --sort to hold rows in. Larger files are "
+                                                    "sorted in runs in the temporary directory and merged")),
+              validate: bool = typer.Option(False,
+                                            "--validate",
+                                            help=("Validate the formatted data while it is written with --apply_config, "
+                                                  "instead of running the validate command on the output afterwards. "
+                                                  "The exit status is 1 if the output is invalid.")),
+              minimum_rows: int = typer.Option(100_000,
+                                               "--min_rows",
+                                               help="Minimum rows acceptable for the output with --validate"),
+              test_rows: int = typer.Option(2000,
+                                            "--test_rows",
+                                            min=1,
+                                            help="Number of rows sampled with --test_config"),
+              batch_memory: int = typer.Option(None,
+                                               "--batch_memory",
+                                               min=1,
+                                               help=("Memory in MB that the files formatted at once with --batch_apply "
+                                                     "are estimated to use at most [default: the physical memory]")),
               extra_args: typer.Context = typer.Option(None)
               ):
     """
     [green]FORMAT[/green] a sumstats file by creating a new one from the existing one. Add/edit metadata.
     """   
-    format(filename=filename,
-           data_outfile=data_outfile,
-           delimiter=delimiter,
-           remove_comments=remove_comments,
-           minimal_to_standard=minimal_to_standard,
-           config_outfile=config_outfile,
-           config_infile=config_infile,
-           analysis_software=analysis_software,
-           generate_config=generate_config,
-           apply_config=apply_config,
-           test_config=test_config,
-           batch_apply=batch_apply,
-           lsf=lsf,
-           slurm=slurm)
+    from gwas_sumstats_tools.format import format
+    result = format(filename=filename,
+                    data_outfile=data_outfile,
+                    delimiter=delimiter,
+                    remove_comments=remove_comments,
+                    minimal_to_standard=minimal_to_standard,
+                    config_outfile=config_outfile,
+                    config_infile=config_infile,
+                    analysis_software=analysis_software,
+                    generate_config=generate_config,
+                    apply_config=apply_config,
+                    test_config=test_config,
+                    batch_apply=batch_apply,
+                    lsf=lsf,
+                    slurm=slurm,
+                    workers=workers,
+                    chunksize=chunksize,
+                    bgzip=bgzip,
+                    compression_level=compression_level,
+                    sort=sort,
+                    sort_memory=sort_memory,
+                    validate=validate,
+                    minimum_rows=minimum_rows,
+                    batch_memory=batch_memory,
+                    test_rows=test_rows)
+    if validate and (apply_config or minimal_to_standard) and not (generate_config or test_config) and result:
+        _, (valid, message, error_preview, error_type) = result
+        print_validation(valid=valid,
+                         message=message,
+                         error_preview=error_preview,
+                         error_type=error_type)
+        raise typer.Exit(exit_status(valid))
 
 # NOTE: For dev internal use only — not intended for end users.
 @app.command("gen_meta",
@@ -264,6 +493,8 @@ def ss_gen_meta(filename: Path = typer.Argument(...,
     """
     [green]GEN_META[/green] Generate or edit metadata for a sumstats file. It is also used internally to generate metadata from the GWAS Catalog for testing purposes. 
     """
+    from gwas_sumstats_tools.gen_meta import gen_meta
+    from gwas_sumstats_tools.utils import metadata_dict_from_args
     print("[bold yellow]WARNING:[/bold yellow] This command is for dev internal use only and is not intended for end users.")
     meta_dict = metadata_dict_from_args(args=extra_args.args) \
         if metadata_edit_mode else {}
@@ -279,6 +510,7 @@ def ss_gen_meta(filename: Path = typer.Argument(...,
 def ss_version():
     """Print installed version and exit.
     """
+    from gwas_sumstats_tools.utils import get_version
     print(get_version())
 
 
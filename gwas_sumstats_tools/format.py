@@ -1,20 +1,32 @@
 from pathlib import Path
+from functools import partial
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import time
 import petl as etl
 from rich import print
 from rich.progress import Progress, SpinnerColumn, TextColumn
 import json,re,os,subprocess
-from bsub import bsub
 
 from gwas_sumstats_tools.schema.headermap import header_mapper
+from gwas_sumstats_tools.interfaces.header_index import header_candidates
 from gwas_sumstats_tools.schema.pre_defined_configure import pre_defined_configure
 from gwas_sumstats_tools.schema.configure_json import Formatconfig
 
 from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+from gwas_sumstats_tools.interfaces.metadata import MetadataClient, get_file_metadata
+from gwas_sumstats_tools.interfaces.sample import sample_rows, DEFAULT_SAMPLE_ROWS
+from gwas_sumstats_tools.interfaces.sniff import sniff, sniff_compression
+from gwas_sumstats_tools.interfaces.batch_state import BatchState, config_hash, input_digest
+from gwas_sumstats_tools.interfaces.memory import MeasuredView, stage
+from gwas_sumstats_tools.validate import StreamValidator, validation_result
 
 from gwas_sumstats_tools.utils import (
     parse_accession_id,
     append_to_path,
     exit_if_no_data,
+    imap_ordered,
+    set_metadata_outfile_name,
 )
 
 
@@ -30,9 +42,26 @@ class Formatter:
         config_dict: dict = {},
         format_data: bool = False,
         analysis_software: str = None,
+        workers: int = 1,
+        chunksize: int = 100_000,
+        bgzip: bool = False,
+        compression_level: int = 6,
+        sort: bool = False,
+        sort_memory: int = 1024,
+        validate: bool = False,
+        minimum_rows: int = 100_000,
     ) -> None:
         
         self.format_data = format_data
+        self.workers = workers
+        self.chunksize = chunksize
+        self.bgzip = bgzip
+        self.compression_level = compression_level
+        self.sort = sort
+        self.sort_memory = sort_memory
+        self.validate = validate
+        self.minimum_rows = minimum_rows
+        self.validation = None
         self.data_infile = Path(data_infile)
         self.config_outfile = Path(config_outfile) if config_outfile else None
         self.config = Formatconfig.construct()
@@ -89,18 +118,27 @@ class Formatter:
         """
         return self.data_to_file()
     
-    def test_config(self):
+    def test_config(self, nrows=DEFAULT_SAMPLE_ROWS):
         """
-        Apply the configure file to a sumstats file and save the format result in a file    
+        Apply the configure file to about nrows rows sampled from across the sumstats file.
+        Each step of the configure is applied in turn, and a row failing a step is kept in
+        self.config_failures, {step: [(location in the file, row, error)]}, and left out of the later steps.
+        Returns the formatted sample rows
         """
-        test_in=self.data.example_table()
-        test_split_table=self.split(config=self.config_dict,data=test_in)
-        test_edit_table=self.edit(config=self.config_dict,data=test_split_table)
-        test_filled_table=test_edit_table.normalise_missing_values(na_value=self.na)
-        test_formatted_data=test_filled_table.map_header()
-        
-        return test_formatted_data
-    
+        header, rows, locations = sample_rows(self.data_infile,
+                                              delimiter=self.delimiter,
+                                              nrows=nrows,
+                                              removecomments=self.removecomments)
+        self.config_failures={}
+        for description, step in self.steps(config=self.config_dict, na_value=self.na):
+            out_header, out_rows, failures = _apply_step(step, header, rows)
+            if failures:
+                self.config_failures[description]=[(locations[i], rows[i], error) for i, error in failures]
+                failed={i for i, _ in failures}
+                locations=[location for i, location in enumerate(locations) if i not in failed]
+            header, rows = out_header, out_rows
+        return SumStatsTable.from_table(etl.wrap([header] + rows))
+
     def _set_data_outfile_name(self) -> str:
         """Set the data outfile name.
         If the data is to be formatted, the outfile name will be:
@@ -111,22 +149,7 @@ class Formatter:
         Returns:
             data outfile name string
         """
-        if self.format_data:
-            accession_id = parse_accession_id(filename=self.data_infile)
-            if accession_id:
-                self.data_outfile = accession_id + ".tsv.gz"
-            else:
-                self.data_outfile = append_to_path(
-                    self.data_infile, "-FORMATTED.tsv.gz"
-                )
-        elif self.config_dict.get("fileConfig", {}).get("outFileSuffix", None):
-            self.data_outfile = append_to_path(
-                    self.data_infile, self.config_dict["fileConfig"]["outFileSuffix"]
-                )
-        else:
-            self.data_outfile = append_to_path(
-                    self.data_infile, "-FORMATTED.tsv.gz"
-                )
+        self.data_outfile = default_data_outfile(self.data_infile, self.config_dict, format_data=self.format_data)
         return self.data_outfile
         
     def _set_config_outfile_name(self) -> str:
@@ -163,19 +186,15 @@ class Formatter:
     
     def suggest_header_mapping(self) ->dict:
         """
-        map the header based on the dict from headermap.py
+        map the header based on the dicts from headermap.py, looked up in their inverted index.
+        each standard field is only suggested for the first column that could be it
         """
         columns_out = dict()
         for field in self.columns_in:
-            if field.lower()  in header_mapper.keys():
+            if field.lower() in header_mapper.keys():
                  columns_out[field] = field.lower()
-            else:
-                for key, value_list in header_mapper.items():
-                    if field.lower() in value_list and key not in columns_out.values():
-                        columns_out[field] = key
-                        break
-                    else:
-                        columns_out[field] = field
+                 continue
+            columns_out[field] = next((key for key in header_candidates(field) if key not in columns_out.values()), field)
         return columns_out
     
     def define_columnconfig(self, col_renames):
@@ -218,7 +237,7 @@ class Formatter:
         return columnConfig
     
     def _get_delimiter(self, filepath: Path) -> str:
-        """Get delimiter from file path
+        """Get delimiter from the file content or, if it cannot be sniffed, from the file path
 
         Arguments:
             filepath -- Input file path
@@ -228,7 +247,10 @@ class Formatter:
         """
         if not isinstance(filepath, Path):
             filepath = Path(filepath)
-        if '.csv' in filepath.suffixes:
+        sniffed=sniff(filepath).delimiter if filepath.is_file() else None
+        if sniffed:
+            return sniffed
+        elif '.csv' in filepath.suffixes:
             return ','
         elif '.txt' in filepath.suffixes:
             return ' '
@@ -272,136 +294,474 @@ class Formatter:
         """
         formating the input sumstats by spliting the columns, rename, find and replace, as well as extract a regex pattern
         """
-        split_table=self.split(config=self.config_dict,data=self.data)
-        edit_table=self.edit(config=self.config_dict,data=split_table)
-        filled_table=edit_table.normalise_missing_values(na_value=self.na)
+        if self.workers > 1:
+            return self._parallel_formating()
+        return self.transform(config=self.config_dict, data=self.data, na_value=self.na)
+
+    @staticmethod
+    def transform(config, data, na_value=None):
+        """
+        apply the split, edit, missing value and header steps of the configure to a SumStatsTable.
+        with --metrics, reading, splitting and editing, and the p-value conversion are measured as stages
+        """
+        data.sumstats=MeasuredView(data.sumstats, "read")
+        split_table=Formatter.split(config=config,data=data)
+        edit_table=Formatter.edit(config=config,data=split_table)
+        filled_table=edit_table.normalise_missing_values(na_value=na_value)
         formatted_data=filled_table.map_header()
+        formatted_data.sumstats=MeasuredView(formatted_data.sumstats, "split and edit")
 
-        if self.config_dict["fileConfig"]["convertNegLog10Pvalue"]==True:
+        if config["fileConfig"]["convertNegLog10Pvalue"]==True:
             formatted_data=formatted_data.convert_neg_log10_pvalue()
+            formatted_data.sumstats=MeasuredView(formatted_data.sumstats, "p-value conversion")
         return formatted_data
-    
-    def split(self, config, data):
+
+    def _parallel_formating(self):
+        """
+        formating the input sumstats chunk by chunk in a pool of self.workers processes.
+        The chunks are written back in the input order by the single writer of to_file.
+        with --metrics, the workers are not measured: the "split and edit" stage is the time waiting for them
+        """
+        formatted_chunks=_FormattedChunks(
+            data=MeasuredView(self.data.sumstats, "read"),
+            transform=partial(_format_chunk, config=self.config_dict, na_value=self.na),
+            workers=self.workers,
+            chunksize=self.chunksize
+        )
+        return SumStatsTable.from_table(MeasuredView(formatted_chunks, "split and edit"))
+
+    @staticmethod
+    def split(config, data):
         """
         all formatting are acived by in-build function from petl
         1. seperator the column based on the separator or regex pattern (regex1)(regex2)....
         2. need to give new column names after spliting in a list
         """
-        split_config=config['columnConfig']['split']
-        for col in split_config:
+        for _, step in Formatter.split_steps(config):
+            data=step(data)
+        return data
+
+    @staticmethod
+    def split_steps(config):
+        """
+        the split configure as a list of (description, step), each step taking and returning a SumStatsTable
+        """
+        steps=[]
+        for col in config['columnConfig']['split']:
+            include_original=col['include_original'] if col['include_original'] else False
             if col["separator"]:
-                data=data.split_columns_by_separator(
-                     field=col['field'], 
-                     separator=col['separator'], 
-                     newfields=col['new_field'],
-                     include_original=col['include_original'] if col['include_original'] else False
-                )
+                steps.append((
+                    f"split {col['field']} on '{col['separator']}'",
+                    partial(SumStatsTable.split_columns_by_separator,
+                            field=col['field'],
+                            separator=col['separator'],
+                            newfields=col['new_field'],
+                            include_original=include_original)
+                ))
             elif col['capture']:
-                 data=data.split_capture(
-                     field=col['field'], 
-                     pattern=col['capture'], 
-                     newfields=col['new_field'],
-                     include_original=col['include_original'] if col['include_original'] else False
-                )
-            else:
-                 data=data
-        return data
-    
-    def edit(self, config, data):
+                steps.append((
+                    f"capture {col['field']} with '{col['capture']}'",
+                    partial(SumStatsTable.split_capture,
+                            field=col['field'],
+                            pattern=col['capture'],
+                            newfields=col['new_field'],
+                            include_original=include_original)
+                ))
+        return steps
+
+    @staticmethod
+    def edit(config, data):
         """
         all formatting are acived by in-build function from petl
         1. rename the headers
         2. find and replace anh string in the column value (not the header)
         3. extract a regex pattern
         """
-        edit_config=config['columnConfig']['edit']
-        edit_table=data
+        for _, step in Formatter.edit_steps(config):
+            data=step(data)
+        return data
+
+    @staticmethod
+    def edit_steps(config):
+        """
+        the edit configure as a list of (description, step), each step taking and returning a SumStatsTable.
+        the headers are renamed by the last step
+        """
+        steps=[]
         rename_dict={}
-        for col in edit_config:
+        for col in config['columnConfig']['edit']:
              if col['rename'] is not None:
                  rename_dict.update({col['field']:col['rename']})
              else:
                  rename_dict.update({col['field']:col['field']})
              if col['field'] is not None:
                   if col['extract'] is not None:
-                       edit_table=edit_table.extract(
-                           field=col['field'], 
-                           pattern=col['extract'],
-                           newfield=col['field']
-                       )
+                       steps.append((
+                           f"extract '{col['extract']}' from {col['field']}",
+                           partial(SumStatsTable.extract,
+                                   field=col['field'],
+                                   pattern=col['extract'],
+                                   newfield=col['field'])
+                       ))
                   if col['find'] is not None and col['replace'] is not None:
-                       edit_table=edit_table.find_and_replace(
-                           field=col['field'], 
-                           find=col['find'],
-                           replace=col['replace']
-                       )
-        edit_table=edit_table.rename_headers(rename_dict)
-        return edit_table
-    
+                       steps.append((
+                           f"replace '{col['find']}' with '{col['replace']}' in {col['field']}",
+                           partial(SumStatsTable.find_and_replace,
+                                   field=col['field'],
+                                   find=col['find'],
+                                   replace=col['replace'])
+                       ))
+        steps.append(("rename headers", partial(SumStatsTable.rename_headers, header_map=rename_dict)))
+        return steps
+
+    @staticmethod
+    def steps(config, na_value=None):
+        """
+        the whole configure as a list of (description, step), in the order transform applies them
+        """
+        steps=Formatter.split_steps(config) + Formatter.edit_steps(config)
+        steps.append(("normalise missing values", partial(SumStatsTable.normalise_missing_values, na_value=na_value)))
+        steps.append(("map header", SumStatsTable.map_header))
+        if config["fileConfig"]["convertNegLog10Pvalue"]==True:
+            steps.append(("convert -log10 p_value", SumStatsTable.convert_neg_log10_pvalue))
+        return steps
+
     def data_to_file(self) -> None:
         """
         if the --ss-out is available, this function will store the output file into a file
         """
         print(self.data_outfile)
-        self.formating().to_file(self.data_outfile)
+        return self.write(self.formating())
+
+    def write(self, data):
+        """
+        write a SumStatsTable to self.data_outfile, as BGZF with a tabix index if --bgzip.
+        if --sort, the rows are sorted by chromosome and base_pair_location within sort_memory MB
+        and is_sorted is set in the <data_outfile>-meta.yaml.
+        if --validate, the rows are validated as they are written and the verdict is kept in self.validation
+        """
+        if self.sort:
+            data=data.sort_by_position(memory_budget=self.sort_memory * 1024 * 1024)
+        if self.validate:
+            validator=StreamValidator(
+                self.data_outfile,
+                pval_zero=self.analysis_software is not None,
+                minimum_rows=self.minimum_rows,
+                chunksize=self.chunksize
+            )
+            data.sumstats=validator.tee(data.sumstats)
+        # the rows are read and formatted as they are written, so this stage includes the
+        # read, split and edit, and p-value conversion stages of the views it pulls them from
+        with stage("write"):
+            indexer=data.to_file(
+                self.data_outfile,
+                bgzip=self.bgzip,
+                compression_level=self.compression_level,
+                threads=self.workers
+            )
+        if self.validate:
+            self.validation=validation_result(validator=validator, valid=validator.valid, message=validator.message)
+        if indexer is not None and not indexer.is_sorted:
+            print(f"[yellow]Note: No tabix index written because the output is not sorted: {indexer.message}[/yellow]")
+        if self.sort:
+            self.write_metadata({"is_sorted": True})
+        return indexer
+
+    def write_metadata(self, metadata: dict) -> MetadataClient:
+        """
+        write the metadata of self.data_outfile to <data_outfile>-meta.yaml.
+        fields already in that file are kept, apart from the ones describing the data file which are recalculated,
+        and the given metadata is applied on top
+        """
+        metadata_outfile=Path(set_metadata_outfile_name(str(self.data_outfile), None))
+        meta=MetadataClient(in_file=metadata_outfile if metadata_outfile.exists() else None, out_file=metadata_outfile)
+        meta.from_file()
+        meta_dict=get_file_metadata(in_file=self.data_infile, out_file=self.data_outfile).dict()
+        if metadata_outfile.exists():
+            meta_dict.update({k: v for k, v in meta.as_dict().items()
+                              if v is not None and k not in ("data_file_name", "data_file_md5sum")})
+        meta_dict.update(metadata)
+        meta.update_metadata(meta_dict)
+        print(f"[green]Writing metadata --> {str(metadata_outfile)}[/green]")
+        meta.to_file()
+        return meta
+
+
+def default_data_outfile(data_infile, config_dict, format_data=False):
+    """
+    the outfile name of data_infile when none is given, see Formatter._set_data_outfile_name.
+    batch jobs formatting a file without an outfile write to this name
+    """
+    data_infile=Path(data_infile)
+    if format_data:
+        accession_id=parse_accession_id(filename=data_infile)
+        if accession_id:
+            return accession_id + ".tsv.gz"
+        return append_to_path(data_infile, "-FORMATTED.tsv.gz")
+    if (config_dict or {}).get("fileConfig", {}).get("outFileSuffix", None):
+        return append_to_path(data_infile, config_dict["fileConfig"]["outFileSuffix"])
+    return append_to_path(data_infile, "-FORMATTED.tsv.gz")
+
+
+class _FormattedChunks(etl.Table):
+    """
+    petl table formatting the rows of the input table in chunks in a process pool.
+    Iterating it yields the formatted header and then the formatted rows in input order,
+    holding no more than workers * 2 chunks in memory.
+    """
+    def __init__(self, data, transform, workers, chunksize):
+        self.data = data
+        self.transform = transform
+        self.workers = workers
+        self.chunksize = chunksize
+
+    def _chunks(self, header, rows):
+        while True:
+            chunk = [tuple(row) for row in islice(rows, self.chunksize)]
+            if not chunk:
+                break
+            yield header, chunk
+
+    def __iter__(self):
+        rows = iter(self.data)
+        for header in rows:
+            header = tuple(header)
+            break
+        else:
+            return
+        # the header is formatted on its own, so a table without rows still gets one
+        yield self.transform((header, []))[0]
+        for _, formatted in imap_ordered(self.transform, self._chunks(header, rows), workers=self.workers):
+            yield from formatted
+
+
+def _format_chunk(chunk, config, na_value):
+    """
+    worker function: format one (header, rows) chunk and return the formatted (header, rows)
+    """
+    header, rows = chunk
+    data = SumStatsTable.from_table(etl.wrap([header] + rows))
+    formatted = iter(Formatter.transform(config=config, data=data, na_value=na_value).sumstats)
+    return tuple(next(formatted)), [tuple(row) for row in formatted]
+
+
+def _apply_step(step, header, rows):
+    """
+    apply a configure step to the rows, in one go or, if that raises, row by row.
+    a row fails if the step raises on it, gives a row of a different length to the header,
+    or gives more empty (None) values than the row had.
+    returns the output header, the output rows that did not fail, and (index of row, error) for the rows that did
+    """
+    def run(rows):
+        out = iter(step(SumStatsTable.from_table(etl.wrap([header] + rows))).sumstats)
+        return tuple(next(out)), [tuple(row) for row in out]
+    try:
+        out_rows=[run(rows)]
+    except Exception:
+        out_rows=[]
+        for row in rows:
+            try:
+                out_rows.append(run([row]))
+            except Exception as exception:
+                out_rows.append(exception)
+    else:
+        out_rows=[(out_rows[0][0], [row]) for row in out_rows[0][1]]
+    out_header=next((out[0] for out in out_rows if not isinstance(out, Exception)), header)
+    passed=[]
+    failures=[]
+    for i, (row, out) in enumerate(zip(rows, out_rows)):
+        if isinstance(out, Exception):
+            failures.append((i, f"{type(out).__name__}: {out}"))
+            continue
+        out_row=out[1][0]
+        if len(out_row) != len(out_header):
+            failures.append((i, f"{len(out_row)} values for {len(out_header)} fields"))
+        elif sum(value is None for value in out_row) > sum(value is None for value in row):
+            failures.append((i, "empty value: " + ", ".join(f for f, v in zip(out_header, out_row) if v is None)))
+        else:
+            passed.append(out_row)
+    return out_header, passed, failures
+
+
 #----------------------------out of the class----------------------------------------------
-# LSF job submission by bsub package, this function activate unless the --batch_apply=true and --lsf
+# batch: the configure and resource estimates shared by the cluster and the local batch
+MB = 1024 * 1024
+JOB_BASE_MEMORY = 512
+GZIP_RATIO = 5
 
-def lsf_apply_config(config_infile, analysis_software, file_info, memory):
-    sub = bsub("gwas_ssf",
-               M="{}".format(str(memory)),
-               R="rusage[mem={}]".format(str(memory)),
-               N="")
+
+def load_batch_config(config_infile, analysis_software):
+    """
+    parse the configure once for all the files of a batch, from --config_in or the --analysis_software preset
+    """
+    if config_infile:
+        with open(config_infile, "r") as fh:
+            return json.load(fh)
+    return pre_defined_configure[analysis_software]
+
+
+def uncompressed_size(data_infile):
+    """
+    file size in bytes, multiplied by GZIP_RATIO for compressed files. 0 if the file cannot be found
+    """
+    data_infile=Path(data_infile)
+    if not data_infile.is_file():
+        return 0
+    size=data_infile.stat().st_size
+    return size * GZIP_RATIO if sniff_compression(data_infile) else size
+
+
+def pending_files(files_info, state, config):
+    """
+    drop the manifest rows of the files completed by a previous run with the same input, configure and options.
+    returns the pending rows and the input digest of each of them, by input file
+    """
+    pending=[]
+    digests={}
+    for file_info in files_info:
+        digest=input_digest(file_info[0])
+        if state.is_complete(file_info[0], digest, config):
+            continue
+        pending.append(file_info)
+        digests[str(Path(file_info[0]))]=digest
+    if len(pending) < len(files_info):
+        print(f"[green]Skipping {len(files_info) - len(pending)} files completed in {state.filename}[/green]")
+    return pending, digests
+
+
+def estimate_job_memory(sort=False, sort_memory=1024):
+    """
+    estimate the peak memory in MB needed to format one file.
+    the rows are streamed whatever the field separator or the size of the file, so this is flat
+    unless the rows are sorted
+    """
+    memory=JOB_BASE_MEMORY
+    if sort:
+        memory+=sort_memory
+    return memory
+
+
+# cluster batch: the manifest is split into task manifests of files with the same memory and time class,
+# and each task manifest is submitted as one job array. Array task i formats the file on line i.
+ARRAY_MAX_SIZE = 1000
+JOB_BASE_MINUTES = 30
+JOB_MINUTES_PER_GB = 30
+
+
+def estimate_job_minutes(data_infile):
+    """
+    estimate the run time in minutes needed to format one file, from its uncompressed size
+    """
+    return JOB_BASE_MINUTES + -(-uncompressed_size(data_infile) * JOB_MINUTES_PER_GB // 1024 ** 3)
+
+
+def memory_class(memory):
+    """
+    round a memory estimate in MB up to a power of two GB, so that files with a similar estimate share a job array
+    """
+    size=1024
+    while size < memory:
+        size*=2
+    return size
+
+
+def time_class(minutes):
+    """
+    round a time estimate in minutes up to JOB_BASE_MINUTES times a power of two,
+    so that files of a similar size share a job array
+    """
+    size=JOB_BASE_MINUTES
+    while size < minutes:
+        size*=2
+    return size
+
+
+def write_task_manifests(filename, files_info, sort=False, sort_memory=1024):
+    """
+    group the [infile, outfile] rows of the manifest by memory class and by time class, which follows the
+    size of the file, and write each group, in arrays of up to ARRAY_MAX_SIZE files,
+    to <manifest>-tasks-<memory>M-<minutes>min-<n>.tsv.
+    returns a list of (task manifest, number of tasks, memory in MB, time in minutes)
+    """
+    memory=memory_class(estimate_job_memory(sort, sort_memory))
+    groups={}
+    for file_info in files_info:
+        minutes=time_class(estimate_job_minutes(file_info[0]))
+        groups.setdefault((memory, minutes), []).append(file_info)
+    tasks=[]
+    for (memory, minutes), group in sorted(groups.items()):
+        for n, first in enumerate(range(0, len(group), ARRAY_MAX_SIZE)):
+            rows=group[first:first + ARRAY_MAX_SIZE]
+            task_manifest=append_to_path(Path(filename), f"-tasks-{memory}M-{minutes}min-{n}.tsv")
+            with open(task_manifest, "w") as fh:
+                for file_info in rows:
+                    fh.write("\t".join([str(file_info[0]), str(file_info[1]) if len(file_info) > 1 else ""]) + "\n")
+            tasks.append((task_manifest, len(rows), memory, minutes))
+    return tasks
+
+
+def task_command(config_infile, analysis_software, task_manifest, index_variable, options=""):
+    """
+    shell command of an array task: format the file on line $index_variable of the task manifest
+    """
     if config_infile:
-        command = f"gwas-ssf format {file_info[0]} --apply_config --config_in {config_infile} -o {file_info[1]}"
+        config=f"--config_in {config_infile}"
     elif analysis_software in pre_defined_configure.keys():
-        command = f"gwas-ssf format {file_info[0]} --apply_config --analysis_software {analysis_software} -o {file_info[1]}"
+        config=f"--analysis_software {analysis_software}"
     else:
         print(">>> Cannot find configure file or analysis software. Please check your --config_in or --analysis_software.")
         os.sys.exit(1)
-        
-    print(">>>> Submitting job to cluster, job id below")
+    return (f"infile=$(awk -F '\\t' -v i=${index_variable} 'NR == i {{print $1}}' \"{task_manifest}\")\n"
+            f"outfile=$(awk -F '\\t' -v i=${index_variable} 'NR == i {{print $2}}' \"{task_manifest}\")\n"
+            f"gwas-ssf format \"$infile\" --apply_config {config}{options} ${{outfile:+-o \"$outfile\"}}\n")
+
+
+# LSF job submission by bsub package, this function activate unless the --batch_apply=true and --lsf
+def lsf_apply_config(config_infile, analysis_software, task, options=""):
+    # bsub is only needed on an LSF cluster
+    from bsub import bsub
+    task_manifest, ntasks, memory, minutes = task
+    sub = bsub(f"gwas_ssf[1-{ntasks}]",
+               M=f"{memory}M",
+               R=f"rusage[mem={memory}M]",
+               W=minutes,
+               N="")
+    command = task_command(config_infile, analysis_software, task_manifest, "LSB_JOBINDEX", options)
+
+    print(f">>>> Submitting job array of {ntasks} files in {task_manifest} to cluster, job id below")
     print(sub(command).job_id)
     print(" Formatted files, md5sums and configs will appear in "
           "the same directory as the input file.")
 
 # slurm job submission, this function activate unless the --batch_apply=true and --slurm
-def slurm_apply_config(config_infile, analysis_software, file_info, memory):
-
-    # Define output and error file paths
-    output_file = "slurm-%j.out"  # %j will be replaced with the job ID
-    error_file = "slurm-%j.err"  # %j will be replaced with the job ID
-
-    # Get the current working directory
-    current_dir = os.getcwd()
-
-    # Set the SBATCH script path in the current directory
-    sbatch_script_path = os.path.join(current_dir, "temp_sbatch_script.sh")
-
+def write_sbatch_script(config_infile, analysis_software, task, options=""):
+    task_manifest, ntasks, memory, minutes = task
+    # %A will be replaced with the job ID and %a with the array task ID
+    sbatch_script_path = task_manifest.with_suffix(".sh")
     with open(sbatch_script_path, "w") as file:
         file.write("#!/bin/bash\n")
-        file.write(f"#SBATCH --mem={memory}\n")
-        file.write("#SBATCH --time=01:00:00\n")
-        file.write(f"#SBATCH --output={output_file}\n")
-        file.write(f"#SBATCH --error={error_file}\n")
-        if config_infile:
-            file.write(f"gwas-ssf format {file_info[0]} --apply_config --config_in {config_infile} -o {file_info[1]}\n")
-        elif analysis_software in pre_defined_configure.keys():
-            file.write(f"gwas-ssf format {file_info[0]} --apply_config --analysis_software {analysis_software} -o {file_info[1]}\n")
-        else:
-            print(">>> Cannot find configure file or analysis software. Please check your --config_in or --analysis_software.")
-            os.sys.exit(1)
+        file.write(f"#SBATCH --array=1-{ntasks}\n")
+        file.write(f"#SBATCH --mem={memory}M\n")
+        file.write(f"#SBATCH --time={minutes // 60:02d}:{minutes % 60:02d}:00\n")
+        file.write("#SBATCH --output=slurm-%A_%a.out\n")
+        file.write("#SBATCH --error=slurm-%A_%a.err\n")
+        file.write(task_command(config_infile, analysis_software, task_manifest, "SLURM_ARRAY_TASK_ID", options))
 
     # Make the script executable
     os.chmod(sbatch_script_path, 0o755)
+    return sbatch_script_path
+
+
+def slurm_apply_config(config_infile, analysis_software, task, options=""):
+    sbatch_script_path = write_sbatch_script(config_infile, analysis_software, task, options)
 
     # SLURM job submission command
-    sbatch_command = ["sbatch", sbatch_script_path]
+    sbatch_command = ["sbatch", str(sbatch_script_path)]
 
     # Print the sbatch_command
     print("Executing command:", ' '.join(sbatch_command))
 
-    print(">>>> Submitting job to SLURM, job id below")
+    print(f">>>> Submitting job array of {task[1]} files in {task[0]} to SLURM, job id below")
 
     # Executing the sbatch command
     result = subprocess.run(sbatch_command, capture_output=True, text=True)
@@ -423,7 +783,97 @@ def slurm_apply_config(config_infile, analysis_software, file_info, memory):
         "Formatted files, md5sums and configs will appear in the same directory as the input file."
     )
 
+
+def format_options(bgzip=False, compression_level=6, sort=False, sort_memory=1024, validate=False, minimum_rows=100_000):
+    """
+    format options passed on to the array tasks
+    """
+    options=""
+    if bgzip:
+        options+=f" --bgzip --compression_level {compression_level}"
+    if sort:
+        options+=f" --sort --sort_memory {sort_memory}"
+    if validate:
+        options+=f" --validate --min_rows {minimum_rows}"
+    return options
+
 # --------------------------cluster option finish---------------------------------------------------
+# local batch: the files of the manifest are formatted in a process pool, this function activate unless --batch_apply=true
+def total_memory():
+    """
+    physical memory of the machine in MB, 8192 if it is unknown
+    """
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // MB
+    except (AttributeError, ValueError, OSError):
+        return 8192
+
+
+def batch_apply_config(files_info, config_dict, analysis_software=None, workers=1, memory_budget=None,
+                       state=None, digests={}, config=None, **options):
+    """
+    format the [infile, outfile] rows of a manifest in a pool of workers processes.
+    the largest files are started first, so that the small ones fill in at the end,
+    and a file is only started while the memory estimated for the running files stays within memory_budget MB.
+    a file that fails, or whose output is invalid with validate=True, does not stop the others.
+    if a BatchState is given, the start and the result of each file are recorded in it,
+    with the input digests and the configure hash config.
+    returns a list of (infile, outfile, error message or None, seconds)
+    """
+    memory_budget=memory_budget if memory_budget else total_memory()
+    jobs=[(Path(file_info[0]), Path(file_info[1]) if len(file_info) > 1 and file_info[1] else None)
+          for file_info in files_info]
+    jobs.sort(key=lambda job: uncompressed_size(job[0]), reverse=True)
+    memory={job: estimate_job_memory(options.get("sort"), options.get("sort_memory", 1024)) for job in jobs}
+    results=[]
+    running={}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while jobs or running:
+            used=sum(running.values())
+            for job in list(jobs):
+                if len(running) >= workers:
+                    break
+                if running and used + memory[job] > memory_budget:
+                    continue
+                if state:
+                    state.start(job[0], job[1], digests.get(str(job[0])), config)
+                future=executor.submit(_apply_config_job, job, config_dict, analysis_software, options)
+                running[future]=memory[job]
+                used+=memory[job]
+                jobs.remove(job)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+                results.append(future.result())
+                if state:
+                    infile, outfile, error, seconds = results[-1]
+                    state.finish(infile, outfile, seconds, error)
+    return results
+
+
+def _apply_config_job(job, config_dict, analysis_software, options):
+    """
+    worker function: format one file of a batch
+    """
+    data_infile, data_outfile = job
+    start=time.perf_counter()
+    try:
+        formatter=Formatter(
+            data_infile=data_infile,
+            data_outfile=data_outfile,
+            config_dict=config_dict,
+            analysis_software=analysis_software,
+            **options
+        )
+        formatter.data_to_file()
+        data_outfile, error = formatter.data_outfile, None
+        if formatter.validate and not formatter.validation[0]:
+            error=f"Invalid output: {formatter.validation[1]}"
+    except Exception as exception:
+        error=f"{type(exception).__name__}: {exception}"
+    return data_infile, data_outfile, error, time.perf_counter() - start
+
+
 def format(
     filename: Path,
     data_outfile: Path = None,
@@ -440,6 +890,16 @@ def format(
     batch_apply: bool = None,
     lsf: bool = False,
     slurm: bool = False,
+    workers: int = 1,
+    chunksize: int = 100_000,
+    bgzip: bool = False,
+    compression_level: int = 6,
+    sort: bool = False,
+    sort_memory: int = 1024,
+    validate: bool = False,
+    minimum_rows: int = 100_000,
+    batch_memory: int = None,
+    test_rows: int = DEFAULT_SAMPLE_ROWS,
 ) -> None:
     if batch_apply:
         if not config_infile and analysis_software not in pre_defined_configure.keys():
@@ -448,15 +908,50 @@ def format(
 
         to_format_file=etl.fromcsv(filename,delimiter="\t")
         files_info=[list(row) for row in to_format_file]
-        if lsf:
-            for file_info in files_info:
-                lsf_apply_config(config_infile, analysis_software, file_info, "4G")
-        elif slurm:
-            for file_info in files_info:
-                slurm_apply_config(config_infile, analysis_software, file_info,"4G")
-        else:
-            for file_info in files_info:
-                subprocess.run(["gwas-ssf", "format", file_info[0], "--apply_config", "--config_in", config_infile, "-o", file_info[1]])
+        batch_config=load_batch_config(config_infile, analysis_software)
+        options={"bgzip": bgzip, "compression_level": compression_level, "sort": sort, "sort_memory": sort_memory}
+        if validate:
+            # only added when given, so that the configure hash of batches run without it is unchanged
+            options.update(validate=True, minimum_rows=minimum_rows)
+        with BatchState(filename) as state:
+            config=config_hash(batch_config, options)
+            files_info, digests = pending_files(files_info, state, config)
+            if lsf or slurm:
+                tasks=write_task_manifests(
+                    filename,
+                    files_info,
+                    sort=sort,
+                    sort_memory=sort_memory
+                )
+                # the files are marked started before the jobs are submitted, so that a job
+                # finishing quickly writes its output digest after the start and is found done
+                for file_info in files_info:
+                    outfile=file_info[1] if len(file_info) > 1 and file_info[1] else \
+                        default_data_outfile(file_info[0], batch_config)
+                    state.start(file_info[0], outfile, digests[str(Path(file_info[0]))], config)
+                for task in tasks:
+                    if lsf:
+                        lsf_apply_config(config_infile, analysis_software, task, format_options(**options))
+                    else:
+                        slurm_apply_config(config_infile, analysis_software, task, format_options(**options))
+                return tasks
+            results=batch_apply_config(
+                files_info,
+                config_dict=batch_config,
+                analysis_software=None if config_infile else analysis_software,
+                workers=workers,
+                memory_budget=batch_memory,
+                state=state,
+                digests=digests,
+                config=config,
+                chunksize=chunksize,
+                **options
+            )
+        failed=[(infile, error) for infile, _, error, _ in results if error]
+        print(f"[green]Formatted {len(results) - len(failed)} of {len(results)} files[/green]")
+        for infile, error in failed:
+            print(f"[red]Failed to format {infile}: {error}[/red]")
+        return results
     else:
         formatter = Formatter(
         data_infile=filename,
@@ -467,7 +962,15 @@ def format(
         format_data=minimal_to_standard,
         remove_comments=remove_comments,
         analysis_software=analysis_software,
-        delimiter=delimiter
+        delimiter=delimiter,
+        workers=workers,
+        chunksize=chunksize,
+        bgzip=bgzip,
+        compression_level=compression_level,
+        sort=sort,
+        sort_memory=sort_memory,
+        validate=validate,
+        minimum_rows=minimum_rows
     )
         if minimal_to_standard:
              exit_if_no_data(table=formatter.data.sumstats)
@@ -486,7 +989,9 @@ def format(
             transient=True,
         ) as progress:
                  progress.add_task(description="Processing...", total=None)
-                 formatter.data.to_file(outfile=formatter.data_outfile)   
+                 formatter.write(formatter.data)
+             if validate and not any([generate_config, apply_config, test_config]):
+                 return formatter.data_outfile, formatter.validation
                     
         if generate_config:
             if config_outfile:
@@ -507,10 +1012,18 @@ def format(
                  print(f"[yellow]Note: No data_outfile specified. Data will be saved in the same folder as the input [/yellow]")
                  formatter.data_to_file()
                  print(formatter.data.sumstats)
+            if validate:
+                 return formatter.data_outfile, formatter.validation
         elif test_config:
-            print(f"[green]Writing formatted data")
-            test_out=formatter.test_config()
+            print(f"[green]Testing the configure on {test_rows} rows sampled from across the file[/green]")
+            test_out=formatter.test_config(nrows=test_rows)
             print(test_out.sumstats)
+            for step, failures in formatter.config_failures.items():
+                print(f"[red]{step}: failed for {len(failures)} sampled rows[/red]")
+                for location, row, error in failures[:5]:
+                    print(f"  {location}: {error}\n    {row}")
+            if not formatter.config_failures:
+                print(f"[green]All {etl.nrows(test_out.sumstats)} sampled rows passed every step of the configure[/green]")
             return test_out
         
         if not any([minimal_to_standard, generate_config, apply_config, test_config]):
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+from gwas_sumstats_tools.read import Reader
+from gwas_sumstats_tools.utils import exit_if_no_data
+
+
+def index(filename: Path,
+          rsid: bool = False,
+          remove_comments: str = None,
+          delimiter: str = None) -> str:
+    """Driver function for building the sidecar indexes of a sumstats file
+
+    Arguments:
+        filename -- sumstats filename
+
+    Keyword Arguments:
+        rsid -- build the rsID index <filename>-rsid.idx (default: {False})
+
+    Returns:
+        message
+    """
+    reader = Reader(sumstats_file=filename,
+                    delimiter=delimiter,
+                    remove_comments=remove_comments)
+    exit_if_no_data(reader.data.sumstats)
+    messages = []
+    if rsid:
+        index_file, nindexed, nrows = reader.index_rsids()
+        messages.append(f"Indexed {nindexed} of {nrows} rows by rsID --> {index_file}")
+    return "\n".join(messages) or "Nothing to index, give --rsid"
@@ -0,0 +1,184 @@
+"""
+Completion state of a --batch_apply manifest, kept in a SQLite
+database <manifest>-state.sqlite next to the manifest.
+
+Each input file has a row with its status, a digest of the input,
+a hash of the configure and options it was formatted with, the
+md5sum of the output and timings. A file is complete if it was
+formatted successfully with the same input, configure and options,
+and its output is still the one that was written.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Union
+
+from gwas_sumstats_tools.utils import append_to_path, read_file_digest
+
+
+INPUT_SAMPLE_SIZE = 1024 * 1024
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    infile TEXT PRIMARY KEY,
+    outfile TEXT,
+    status TEXT NOT NULL,
+    input_digest TEXT,
+    config_hash TEXT,
+    output_md5sum TEXT,
+    started REAL,
+    finished REAL,
+    seconds REAL,
+    error TEXT
+)
+"""
+
+
+def input_digest(file: Union[Path, str]) -> Union[str, None]:
+    """Cheap digest of an input file: the md5 of its size, its
+    modification time and its first and last INPUT_SAMPLE_SIZE bytes.
+
+    Arguments:
+        file -- input file
+
+    Returns:
+        hex digest or None if the file does not exist
+    """
+    if not os.path.isfile(file):
+        return None
+    stat = os.stat(file)
+    md5 = hashlib.md5(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(file, "rb") as fh:
+        md5.update(fh.read(INPUT_SAMPLE_SIZE))
+        if stat.st_size > INPUT_SAMPLE_SIZE:
+            fh.seek(max(stat.st_size - INPUT_SAMPLE_SIZE, INPUT_SAMPLE_SIZE))
+            md5.update(fh.read())
+    return md5.hexdigest()
+
+
+def config_hash(config: dict, options: dict) -> str:
+    """md5 of the configure and the format options applied with it
+
+    Arguments:
+        config -- configure dict
+        options -- format options
+
+    Returns:
+        hex digest
+    """
+    return hashlib.md5(json.dumps([config, options], sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _key(infile: Union[Path, str]) -> str:
+    return str(Path(infile))
+
+
+class BatchState:
+    def __init__(self, manifest: Union[Path, str]) -> None:
+        self.filename = append_to_path(Path(manifest), "-state.sqlite")
+        self.connection = sqlite3.connect(self.filename)
+        with self.connection:
+            self.connection.execute(SCHEMA)
+
+    def __enter__(self) -> "BatchState":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def get(self, infile: Union[Path, str]) -> Union[dict, None]:
+        cursor = self.connection.execute("SELECT * FROM files WHERE infile = ?", (_key(infile),))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def is_complete(self,
+                    infile: Union[Path, str],
+                    digest: Union[str, None],
+                    config: str) -> bool:
+        """Was infile formatted successfully from the same input
+        and configure, into an output that has not changed since?
+
+        Arguments:
+            infile -- input file
+            digest -- current input_digest() of infile
+            config -- current config_hash()
+
+        Returns:
+            bool
+        """
+        row = self.get(infile)
+        if row is not None and row["status"] == STATUS_RUNNING:
+            row = self._recover(row)
+        if row is None or row["status"] != STATUS_DONE or digest is None:
+            return False
+        if row["input_digest"] != digest or row["config_hash"] != config:
+            return False
+        output_digest = read_file_digest(row["outfile"]) if row["outfile"] else None
+        return output_digest is not None and output_digest["md5sum"] == row["output_md5sum"]
+
+    def start(self,
+              infile: Union[Path, str],
+              outfile: Union[Path, str, None],
+              digest: Union[str, None],
+              config: str) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files (infile, outfile, status, input_digest, config_hash, started) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (_key(infile), str(outfile) if outfile else None, STATUS_RUNNING, digest, config, time.time())
+            )
+
+    def finish(self,
+               infile: Union[Path, str],
+               outfile: Union[Path, str, None],
+               seconds: float,
+               error: Union[str, None] = None) -> None:
+        """Record the result of formatting infile. The output md5sum
+        is taken from the digest written with the output.
+
+        Arguments:
+            infile -- input file
+            outfile -- output file
+            seconds -- time taken
+
+        Keyword Arguments:
+            error -- error message if formatting failed (default: {None})
+        """
+        output_digest = read_file_digest(outfile) if outfile and not error else None
+        with self.connection:
+            self.connection.execute(
+                "UPDATE files SET outfile = ?, status = ?, output_md5sum = ?, finished = ?, seconds = ?, error = ? "
+                "WHERE infile = ?",
+                (str(outfile) if outfile else None,
+                 STATUS_FAILED if error or output_digest is None else STATUS_DONE,
+                 output_digest["md5sum"] if output_digest else None,
+                 time.time(),
+                 seconds,
+                 error,
+                 _key(infile))
+            )
+
+    def _recover(self, row: dict) -> dict:
+        """A file left running, by a cluster job or an interrupted
+        run, is done if its output digest was written after it started.
+        """
+        output_digest = read_file_digest(row["outfile"]) if row["outfile"] else None
+        if output_digest is None or output_digest["mtime_ns"] < row["started"] * 1e9:
+            return row
+        with self.connection:
+            self.connection.execute(
+                "UPDATE files SET status = ?, output_md5sum = ?, finished = ? WHERE infile = ?",
+                (STATUS_DONE, output_digest["md5sum"], output_digest["mtime_ns"] / 1e9, row["infile"])
+            )
+        return self.get(row["infile"])
@@ -0,0 +1,240 @@
+"""
+Blocked GNU Zip Format (BGZF) https://samtools.github.io/hts-specs/SAMv1.pdf
+
+A BGZF file is a series of gzip members of at most 64 KB,
+so any gzip reader can read it, but it can also be accessed
+randomly through "virtual offsets": the compressed offset of
+a block shifted 16 bits left, OR'd with the offset inside the
+uncompressed block.
+"""
+
+import hashlib
+import re
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Union
+
+
+BGZF_BLOCK_SIZE = 0xff00
+BGZF_HEADER = struct.Struct("<4BI2BH2BHH")
+BGZF_MAX_BLOCK = 1 << 16
+BGZF_BLOCK_START = re.compile(rb"\x1f\x8b\x08\x04.{6}\x06\x00BC\x02\x00", re.DOTALL)
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def compress_block(data: bytes, compression_level: int = 6) -> bytes:
+    """Compress up to BGZF_BLOCK_SIZE bytes into a BGZF block
+
+    Arguments:
+        data -- uncompressed bytes
+
+    Keyword Arguments:
+        compression_level -- zlib compression level (default: {6})
+
+    Returns:
+        BGZF block bytes
+    """
+    compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    header = BGZF_HEADER.pack(31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, len(cdata) + 25)
+    trailer = struct.pack("<II", zlib.crc32(data), len(data))
+    return header + cdata + trailer
+
+
+def make_virtual_offset(block_offset: int, within_block_offset: int) -> int:
+    return (block_offset << 16) | within_block_offset
+
+
+def split_virtual_offset(virtual_offset: int) -> tuple[int, int]:
+    return virtual_offset >> 16, virtual_offset & 0xffff
+
+
+def find_block(fh, offset: int) -> Union[int, None]:
+    """Compressed offset of the first BGZF block at or after offset"""
+    while True:
+        fh.seek(offset)
+        data = fh.read(2 * BGZF_MAX_BLOCK)
+        if len(data) < 18:
+            return None
+        for match in BGZF_BLOCK_START.finditer(data):
+            if read_block(fh, offset + match.start()) is not None:
+                return offset + match.start()
+        offset += len(data) - 17
+
+
+def read_block(fh, offset: int) -> Union[bytes, None]:
+    """Decompressed data of the BGZF block at offset, None if there is no valid block there"""
+    fh.seek(offset)
+    header = fh.read(18)
+    if len(header) < 18 or BGZF_BLOCK_START.match(header) is None:
+        return None
+    block_size = struct.unpack("<H", header[16:18])[0] + 1
+    rest = fh.read(block_size - 18)
+    if len(rest) < block_size - 18 or block_size < 26:
+        return None
+    crc, isize = struct.unpack("<II", rest[-8:])
+    try:
+        data = zlib.decompress(rest[:-8], -15)
+    except zlib.error:
+        return None
+    if len(data) != isize or zlib.crc32(data) != crc:
+        return None
+    return data
+
+
+class BgzfWriter:
+    """Write a BGZF file, compressing blocks in a pool of threads.
+
+    Positions returned by tell() are (block number, offset within
+    the uncompressed block). Once the file is closed, block_offsets
+    maps every block number, and the one past the last block, to
+    its compressed offset, so positions can be converted into
+    virtual offsets with virtual_offset(). The md5sum of the
+    compressed file is computed as it is written.
+    """
+    def __init__(self,
+                 filename: Union[Path, str],
+                 compression_level: int = 6,
+                 threads: int = 1) -> None:
+        self.compression_level = compression_level
+        self.block_offsets = []
+        self.md5 = hashlib.md5()
+        self._fh = open(filename, "wb")
+        self._buffer = bytearray()
+        self._block_number = 0
+        self._offset = 0
+        self._threads = threads
+        self._executor = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+        self._pending = deque()
+
+    def __enter__(self) -> "BgzfWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        while len(self._buffer) >= BGZF_BLOCK_SIZE:
+            self._submit(bytes(self._buffer[:BGZF_BLOCK_SIZE]))
+            del self._buffer[:BGZF_BLOCK_SIZE]
+        return len(data)
+
+    def tell(self) -> tuple[int, int]:
+        return self._block_number, len(self._buffer)
+
+    def virtual_offset(self, position: tuple[int, int]) -> int:
+        block_number, within_block_offset = position
+        return make_virtual_offset(self.block_offsets[block_number], within_block_offset)
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer = bytearray()
+        while self._pending:
+            self._write_block(self._pending.popleft())
+        if self._executor:
+            self._executor.shutdown()
+        self.block_offsets.append(self._offset)
+        self.md5.update(BGZF_EOF)
+        self._fh.write(BGZF_EOF)
+        self._fh.close()
+
+    def _submit(self, data: bytes) -> None:
+        self._block_number += 1
+        if self._executor is None:
+            self._write_block(compress_block(data, self.compression_level))
+            return
+        self._pending.append(self._executor.submit(compress_block, data, self.compression_level))
+        if len(self._pending) > self._threads * 4:
+            self._write_block(self._pending.popleft())
+
+    def _write_block(self, block) -> None:
+        if not isinstance(block, bytes):
+            block = block.result()
+        self.block_offsets.append(self._offset)
+        self.md5.update(block)
+        self._fh.write(block)
+        self._offset += len(block)
+
+
+class BgzfReader:
+    """Read lines of a BGZF file from virtual offsets. Only the
+    blocks read through are decompressed. tell() gives the virtual
+    offset of the next byte to be read, taken as the start of the
+    next block once a block has been read to its end.
+    """
+    def __init__(self, filename: Union[Path, str]) -> None:
+        self._fh = open(filename, "rb")
+        self._block_offset = None
+        self._next_block_offset = 0
+        self._data = b""
+        self._within = 0
+
+    def __enter__(self) -> "BgzfReader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def seek(self, virtual_offset: int) -> None:
+        block_offset, within_block_offset = split_virtual_offset(virtual_offset)
+        if block_offset != self._block_offset:
+            self._load(block_offset)
+        self._within = within_block_offset
+
+    def tell(self) -> int:
+        if self._within >= len(self._data):
+            return make_virtual_offset(self._next_block_offset, 0)
+        return make_virtual_offset(self._block_offset, self._within)
+
+    def readline(self) -> bytes:
+        """Next line, with its line break, or b"" at the end of the file"""
+        parts = []
+        while True:
+            if self._within >= len(self._data) and not self._load(self._next_block_offset):
+                return b"".join(parts)
+            end = self._data.find(b"\n", self._within)
+            if end >= 0:
+                parts.append(self._data[self._within:end + 1])
+                self._within = end + 1
+                return b"".join(parts)
+            parts.append(self._data[self._within:])
+            self._within = len(self._data)
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def _load(self, block_offset: int) -> bool:
+        """Decompress the block at block_offset, False at the end of the file"""
+        self._fh.seek(block_offset)
+        header = self._fh.read(12)
+        if len(header) < 12:
+            self._block_offset, self._next_block_offset, self._data, self._within = block_offset, block_offset, b"", 0
+            return False
+        if header[:4] != b"\x1f\x8b\x08\x04":
+            raise ValueError(f"No BGZF block at offset {block_offset}")
+        extra = self._fh.read(struct.unpack("<H", header[10:12])[0])
+        block_size = None
+        position = 0
+        while position + 4 <= len(extra):
+            length = struct.unpack("<H", extra[position + 2:position + 4])[0]
+            if extra[position:position + 2] == b"BC":
+                block_size = struct.unpack("<H", extra[position + 4:position + 6])[0] + 1
+            position += 4 + length
+        if block_size is None:
+            raise ValueError(f"No BGZF block size at offset {block_offset}")
+        rest = self._fh.read(block_size - 12 - len(extra))
+        self._data = zlib.decompress(rest[:-8], -15)
+        self._block_offset = block_offset
+        self._next_block_offset = block_offset + block_size
+        self._within = 0
+        return True
@@ -0,0 +1,75 @@
+"""
+Count the rows of a delimited sumstats file without parsing it.
+
+The decompressed data is read in large chunks of whole lines and
+the line breaks in each chunk are counted, along with the comment
+and blank lines, which are not rows. BGZF and uncompressed files
+are split into partitions, see partition.py, that can be counted
+in separate processes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Union
+
+from gwas_sumstats_tools.interfaces.partition import Partition, partition, read_partition
+
+
+def _blank_lines(chunk: bytes) -> int:
+    # finding a single byte is much faster than a pair, so \r\n line
+    # breaks are only looked for in chunks with a \r
+    crlf = b"\r" in chunk and (b"\n\r\n" in chunk or chunk.startswith(b"\r\n"))
+    if not crlf and b"\n\n" not in chunk and not chunk.startswith(b"\n"):
+        return 0
+    return sum(1 for line in chunk.split(b"\n")[:chunk.count(b"\n")] if not line.strip())
+
+
+def count_partition(filename: Union[Path, str],
+                    part: Partition,
+                    removecomments: str = None) -> int:
+    """Lines of a partition that are neither blank nor comments
+
+    Arguments:
+        filename -- sumstats file
+        part -- Partition of the file
+
+    Keyword Arguments:
+        removecomments -- prefix of comment lines (default: {None})
+
+    Returns:
+        number of lines
+    """
+    comment = removecomments.encode() if removecomments else None
+    lines = 0
+    for chunk in read_partition(filename, part):
+        unterminated = chunk[chunk.rfind(b"\n") + 1:]
+        lines += chunk.count(b"\n") + bool(unterminated.strip()) - _blank_lines(chunk)
+        if comment:
+            lines -= chunk.count(b"\n" + comment) + chunk.startswith(comment)
+    return lines
+
+
+def count_lines(filename: Union[Path, str],
+                removecomments: str = None,
+                workers: int = 1) -> int:
+    """Lines of a delimited file that are neither blank nor comments,
+    the header included
+
+    Arguments:
+        filename -- sumstats file
+
+    Keyword Arguments:
+        removecomments -- prefix of comment lines (default: {None})
+        workers -- processes to count partitions of BGZF or uncompressed files in (default: {1})
+
+    Returns:
+        number of lines
+    """
+    parts = partition(filename, workers)
+    if len(parts) == 1:
+        return count_partition(filename, parts[0], removecomments)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(count_partition,
+                                [filename] * len(parts),
+                                parts,
+                                [removecomments] * len(parts)))
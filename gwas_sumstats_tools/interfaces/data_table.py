@@ -1,3 +1,7 @@
+import csv
+import gzip
+import os
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Union
 import pandas as pd
@@ -6,6 +10,16 @@ import numpy as np
 import petl as etl
 import pandas as pd
 
+from gwas_sumstats_tools.interfaces.bgzf import BgzfWriter
+from gwas_sumstats_tools.interfaces.count import count_lines
+from gwas_sumstats_tools.interfaces.delimited import RegexDelimitedView, project
+from gwas_sumstats_tools.interfaces.parquet import ColumnarView, count_rows, is_parquet, read_frames, write_parquet
+from gwas_sumstats_tools.interfaces.pvalue import NegLog10PvalueView
+from gwas_sumstats_tools.interfaces.sniff import DecompressingSource, PANDAS_COMPRESSION, sniff, sniff_columnar
+from gwas_sumstats_tools.interfaces.tabix import TabixIndexer
+from gwas_sumstats_tools.interfaces.sort import ExternalSortView, DEFAULT_MEMORY_BUDGET
+from gwas_sumstats_tools.utils import HashingWriter, write_file_digest
+
 
 """formatters
 
@@ -31,13 +45,45 @@ class SumStatsTable:
                        "effect_allele_frequency", "p_value")
     FIELDS_EFFECT = ("beta", "odds_ratio", "hazard_ratio")
     FIELDS_OPTIONAL = ("variant_id", "rsid", "info", "ci_upper", "ci_lower", "ref_allele")
+    NA_VALUES = ["", "#NA", "NA", "N/A", "NaN", "NR"]
 
-    def __init__(self, sumstats_file: Path, delimiter: str = None, removecomments: str = None) -> None:
+    def __init__(self,
+                 sumstats_file: Path,
+                 delimiter: str = None,
+                 removecomments: str = None,
+                 columns: list = None) -> None:
         self.filename = str(sumstats_file)
-        self.delimiter = delimiter if delimiter else self._get_delimiter(sumstats_file)
         self.removecomments = removecomments if removecomments else None
+        self.columns = tuple(columns) if columns else None
+        self.columnar = sniff_columnar(self.filename) if os.path.isfile(self.filename) else None
+        self.compression, sniffed_delimiter = (sniff(self.filename, comment=self.removecomments)
+                                               if os.path.isfile(self.filename) and not self.columnar
+                                               else (None, None))
+        self.delimiter = delimiter if delimiter else sniffed_delimiter or self._get_delimiter(sumstats_file)
         self.sumstats = self.from_file()
-        
+
+    @classmethod
+    def from_table(cls, table: etl.Table, delimiter: str = "\t") -> "SumStatsTable":
+        """Wrap an existing petl table, e.g. a chunk of rows
+        already held in memory, without reading a file.
+
+        Arguments:
+            table -- petl table
+
+        Keyword Arguments:
+            delimiter -- delimiter of the data (default: {"\\t"})
+
+        Returns:
+            SumStatsTable
+        """
+        sumstats_table = cls.__new__(cls)
+        sumstats_table.filename = None
+        sumstats_table.delimiter = delimiter
+        sumstats_table.removecomments = None
+        sumstats_table.columnar = None
+        sumstats_table.columns = None
+        sumstats_table.sumstats = table
+        return sumstats_table
 
     def reformat_header(self, header_map: dict = FIELD_MAP) -> etl.Table:
         """Reformats the headers according to the standard
@@ -69,10 +115,18 @@ class SumStatsTable:
     def from_file(self) -> Union[etl.Table, None]:
         """Try to read the file in to a Table.
         Files can be TAB seperated and optionally compressed
-        with (B)GZIP. There could be cases where an input file 
+        with (B)GZIP, bzip2, xz or zstd, detected from the content. A delimiter longer than one character is
+        a regex, and the file is split on it line by line. There could be cases where an input file 
         has been renamed but the data is something different 
         to that suggested by the name and extension. Most 
         cases should be covered by the exception clause.
+        Parquet and Arrow IPC (Feather) files, detected from the
+        content too, are read a record batch at a time.
+        If self.columns are given only those are read: Parquet and Arrow
+        files only read their column chunks, and lines delimited by a regex
+        are only split as far as the last of the columns. Lines with a one
+        character delimiter are parsed by the csv module, which handles
+        quoted fields, and cut to the columns.
 
         Arguments:
             infile -- Input file
@@ -81,13 +135,23 @@ class SumStatsTable:
             petl Table or None
         """
         try:
-            if len(self.delimiter) == 1:
-                self.sumstats = etl.fromcsv(self.filename, delimiter=self.delimiter,skipinitialspace=True)
+            if self.columnar:
+                self.sumstats = ColumnarView(self.filename, columns=self.columns)
+            elif len(self.delimiter) == 1:
+                self.sumstats = etl.fromcsv(DecompressingSource(self.filename, self.compression),
+                                            delimiter=self.delimiter,skipinitialspace=True)
                 if self.removecomments is not None:
                     self.sumstats = etl.skipcomments(self.sumstats,self.removecomments)
+                if self.columns:
+                    if self.is_table_content():
+                        project(etl.header(self.sumstats), self.columns)
+                    self.sumstats = etl.cut(self.sumstats, *self.columns)
             else:
-                df = pd.read_csv(self.filename ,sep=self.delimiter, comment=self.removecomments)
-                self.sumstats = etl.fromdataframe(df)
+                self.sumstats = RegexDelimitedView(self.filename,
+                                                   delimiter=self.delimiter,
+                                                   removecomments=self.removecomments,
+                                                   compression=self.compression,
+                                                   columns=self.columns)
             
             if not self.is_table_content():
                 return None
@@ -104,23 +168,124 @@ class SumStatsTable:
         """
         return etl.nrows(self.head_table(nrows=1)) > 0
     
-    def to_file(self, outfile: Path) -> None:
-        """Write table to TSV file
+    def to_file(self,
+                outfile: Path,
+                bgzip: bool = False,
+                compression_level: int = 6,
+                threads: int = 1) -> Union[TabixIndexer, None]:
+        """Write table to TSV file, or to Parquet if outfile ends with
+        .parquet. The md5sum and row count of the file are computed
+        while it is written and saved to the <outfile>-digest.json sidecar.
+
+        Arguments:
+            outfile -- Output file name
+
+        Keyword Arguments:
+            bgzip -- write BGZF instead of plain gzip/text (default: {False})
+            compression_level -- BGZF compression level (default: {6})
+            threads -- BGZF compression threads (default: {1})
+
+        Returns:
+            The tabix indexer if bgzip, else None. A <outfile>.tbi index is
+            written when the table is sorted by chromosome and base_pair_location.
+        """
+        if is_parquet(outfile):
+            # written under a temporary name so a failed write leaves no partial file
+            part_file = Path(outfile).with_name(Path(outfile).name + ".part")
+            try:
+                with open(part_file, "wb") as fh:
+                    writer = HashingWriter(fh)
+                    nrows = write_parquet(self.sumstats, writer)
+            except BaseException:
+                part_file.unlink(missing_ok=True)
+                raise
+            os.replace(part_file, outfile)
+            write_file_digest(outfile, md5sum=writer.hexdigest(), nrows=nrows)
+            return None
+        if not bgzip:
+            source = _HashingSource(outfile)
+            rows = _RowCounter(self.sumstats)
+            etl.totsv(rows, source=source)
+            write_file_digest(outfile, md5sum=source.md5sum, nrows=rows.nrows)
+            return None
+        return self._to_bgzf(outfile=outfile,
+                             compression_level=compression_level,
+                             threads=threads)
+
+    def _to_bgzf(self, outfile: Path, compression_level: int, threads: int) -> TabixIndexer:
+        """Write table to a BGZF compressed TSV file and, if the rows are
+        sorted by chromosome and base_pair_location, a tabix index next to it.
 
         Arguments:
             outfile -- Output file name
+            compression_level -- BGZF compression level
+            threads -- BGZF compression threads
+
+        Returns:
+            TabixIndexer
         """
-        self.sumstats.totsv(str(outfile))
+        indexer = TabixIndexer()
+        nrows = 0
+        with BgzfWriter(outfile, compression_level=compression_level, threads=threads) as writer:
+            sink = _EncodingSink(writer)
+            csv_writer = csv.writer(sink, delimiter="\t")
+            rows = iter(self.sumstats)
+            header = next(rows)
+            csv_writer.writerow(header)
+            if not {"chromosome", "base_pair_location"}.issubset(header):
+                indexer.is_sorted = False
+                indexer.message = "chromosome or base_pair_location field is missing"
+                for row in rows:
+                    csv_writer.writerow(row)
+                    nrows += 1
+            else:
+                chr_index = header.index("chromosome")
+                bp_index = header.index("base_pair_location")
+                indexer.col_seq, indexer.col_beg, indexer.col_end = chr_index + 1, bp_index + 1, bp_index + 1
+                for row in rows:
+                    start = writer.tell()
+                    csv_writer.writerow(row)
+                    nrows += 1
+                    if indexer.is_sorted:
+                        indexer.add(row[chr_index], row[bp_index], start, writer.tell())
+        write_file_digest(outfile, md5sum=writer.md5.hexdigest(), nrows=nrows)
+        index_file = Path(str(outfile) + ".tbi")
+        if indexer.is_sorted:
+            indexer.to_file(index_file, virtual_offset=writer.virtual_offset)
+        elif index_file.exists():
+            index_file.unlink()
+        return indexer
 
     def head_table(self, nrows: int = 10) -> etl.Table:
         return etl.head(self.sumstats, n=nrows)
     
+    def count_rows(self, workers: int = 1) -> int:
+        """Count the data rows, without the header, comments and
+        blank lines. The line breaks of delimited files are counted
+        without parsing the fields, Parquet files give their row count
+        in their metadata.
+
+        Keyword Arguments:
+            workers -- processes to count parts of BGZF or uncompressed files in (default: {1})
+
+        Returns:
+            number of rows
+        """
+        if not self.is_table_content():
+            return 0
+        if self.columnar:
+            return count_rows(self.filename)
+        if not self.filename or not os.path.isfile(self.filename):
+            return etl.nrows(self.sumstats)
+        return max(count_lines(self.filename, removecomments=self.removecomments, workers=workers) - 1, 0)
+
     def example_table(self, nrows: int = 5) -> etl.Table:
         self.sumstats = etl.head(self.sumstats, n=nrows)
         return self
 
     def _get_delimiter(self, filepath: Path) -> str:
-        """Get delimiter from file path
+        """Get delimiter from file path, for when it
+        cannot be sniffed from the content
 
         Arguments:
             filepath -- Input file path
@@ -160,8 +325,33 @@ class SumStatsTable:
             self.sumstats = etl.replaceall(self.sumstats, na_value, '#NA')   
         return self
     
+    def sort_by_position(self,
+                         memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                         tempdir: Path = None) -> "SumStatsTable":
+        """Sort by chromosome and base_pair_location with an external
+        merge sort, spilling sorted runs to tempdir whenever the buffered
+        rows reach memory_budget bytes.
+
+        Keyword Arguments:
+            memory_budget -- bytes of rows to hold in memory (default: {1 GB})
+            tempdir -- directory for the sorted runs (default: {None, the system temp dir})
+
+        Returns:
+            SumStatsTable
+        """
+        self.sumstats = ExternalSortView(self.sumstats,
+                                         memory_budget=memory_budget,
+                                         tempdir=tempdir)
+        return self
+
     def convert_neg_log10_pvalue(self) -> etl.Table:
-        self.sumstats = etl.convert(self.sumstats, 'p_value', lambda x: 10**(-float(x)))
+        """Convert -log10 p_value to p_value, written as mantissa and
+        exponent so that values under the float range do not become 0.
+
+        Returns:
+            SumStatsTable
+        """
+        self.sumstats = NegLog10PvalueView(self.sumstats, field='p_value')
         return self
 
     def _get_missing_headers(self) -> set:
@@ -223,8 +413,9 @@ class SumStatsTable:
         Returns:
             tuple of the headers
         """
-        if self.is_table_content():
-            return etl.header(self.sumstats)
+        if self.sumstats is not None:
+            for header in self.sumstats:
+                return tuple(header)
         return ()
 
     def effect_field(self) -> Union[str, None]:
@@ -298,14 +489,17 @@ class SumStatsTable:
     def as_pd_df(self,
                  nrows: int = None,
                  chunksize: int = None,
-                 skiprows: int = None) -> Union[pd.DataFrame, TextFileReader]:
+                 skiprows: int = None,
+                 usecols: list = None) -> Union[pd.DataFrame, TextFileReader]:
         """Sumstats table as a Pandas dataframe or dataframe
-        iterator (TextFileReader)
+        iterator (TextFileReader). Parquet and Arrow files keep
+        their column types, the p-value aside.
 
         Keyword Arguments:
             nrows -- Number of rows (default: {None, which means all rows})
             chunksize -- Number of rows to store in mem at once
             skiprows -- Number of rows to skip from start of file
+            usecols -- Only parse these columns (default: {None, which means all columns})
 
         Returns:
             Pandas dataframe or iter
@@ -316,14 +510,24 @@ class SumStatsTable:
             skip = list(range(1, skiprows + 1))
         else:
             skip = None
+        if self.is_table_content() and self.columnar:
+            frames = read_frames(self.filename,
+                                 chunksize=chunksize,
+                                 nrows=nrows,
+                                 skiprows=skiprows,
+                                 columns=usecols,
+                                 p_value_field=self.p_value_field() or "p_value")
+            return frames if chunksize else next(frames, pd.DataFrame(columns=usecols or self.header()))
         if self.is_table_content():
             df = pd.read_table(self.filename,
                                sep=self.delimiter,
+                               compression=PANDAS_COMPRESSION[self.compression],
                                chunksize=chunksize,
                                nrows=nrows,
-                               na_values=["", "#NA", "NA", "N/A", "NaN", "NR"],
+                               na_values=self.NA_VALUES,
                                dtype=str,
-                               skiprows=skip
+                               skiprows=skip,
+                               usecols=usecols
                                )
         return df
 
@@ -377,5 +581,51 @@ class SumStatsTable:
         petl.transform.conversions.convert()
         """
         return etl.convert(table,field,'replace',value,replace)
+
+
+class _HashingSource:
+    """petl write source computing the md5sum of the
+    file, gzipped if the name ends with .gz, as it is written.
+    """
+    def __init__(self, filename: Path) -> None:
+        self.filename = str(filename)
+        self.md5sum = None
+
+    @contextmanager
+    def open(self, mode: str):
+        with open(self.filename, "wb") as fh:
+            writer = HashingWriter(fh)
+            if self.filename.endswith(".gz"):
+                with gzip.GzipFile(filename=self.filename, mode="wb", fileobj=writer) as gz:
+                    yield gz
+            else:
+                yield writer
+        self.md5sum = writer.hexdigest()
+
+
+class _RowCounter:
+    """Iterate a table, counting the data rows"""
+    def __init__(self, table: etl.Table) -> None:
+        self.table = table
+        self.nrows = 0
+
+    def __iter__(self):
+        rows = iter(self.table)
+        for header in rows:
+            yield header
+            break
+        for row in rows:
+            self.nrows += 1
+            yield row
+
+
+class _EncodingSink:
+    """Text file interface for csv.writer on top of a binary writer"""
+    def __init__(self, writer, encoding: str = "utf-8") -> None:
+        self.writer = writer
+        self.encoding = encoding
+
+    def write(self, line: str) -> int:
+        return self.writer.write(line.encode(self.encoding))
     
     
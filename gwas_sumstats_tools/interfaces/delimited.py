@@ -0,0 +1,100 @@
+"""
+Streaming reader for files delimited by a regex or a string of
+more than one character, e.g. the runs of spaces in PLINK and GCTA
+output, which the csv module behind petl cannot split.
+
+Lines are read one at a time, so memory stays bounded whatever the
+size of the file, and the values are kept as strings like the rest
+of the petl tables.
+"""
+
+import io
+import re
+from pathlib import Path
+from typing import Callable, Iterator, Sequence, Union
+
+import petl as etl
+
+from gwas_sumstats_tools.interfaces.sniff import open_decompressed, sniff_compression
+
+
+WHITESPACE = r"\s+"
+
+
+def splitter(delimiter: str, maxsplit: int = -1) -> Callable[[str], list]:
+    """Function splitting a line on delimiter. A run of whitespace
+    also ignores leading and trailing whitespace, as pandas does.
+
+    Arguments:
+        delimiter -- regex, or string without regex special characters
+
+    Keyword Arguments:
+        maxsplit -- split at most this many times, leaving the rest of the
+                    line as the last value, -1 for no limit (default: {-1})
+
+    Returns:
+        function taking a line and returning its values
+    """
+    if delimiter == WHITESPACE:
+        return lambda line: line.split(None, maxsplit)
+    if re.escape(delimiter) == delimiter:
+        return lambda line: line.split(delimiter, maxsplit)
+    pattern = re.compile(delimiter)
+    return lambda line: pattern.split(line, max(maxsplit, 0))
+
+
+class RegexDelimitedView(etl.Table):
+    """petl view of a file delimited by a regex. Blank lines and
+    lines starting with removecomments are skipped. The compression
+    is sniffed from the file unless it is given.
+
+    If columns are given, only those are returned, in that order, and
+    each line is only split as far as the last of them, so fields after
+    it are never separated into values.
+    """
+    def __init__(self,
+                 filename: Union[Path, str],
+                 delimiter: str = WHITESPACE,
+                 removecomments: str = None,
+                 encoding: str = "utf-8",
+                 compression: Union[str, None] = "infer",
+                 columns: Sequence[str] = None) -> None:
+        self.filename = filename
+        self.delimiter = delimiter
+        self.removecomments = removecomments
+        self.encoding = encoding
+        self.compression = compression
+        self.columns = tuple(columns) if columns else None
+
+    def __iter__(self) -> Iterator[tuple]:
+        split = splitter(self.delimiter)
+        compression = sniff_compression(self.filename) if self.compression == "infer" else self.compression
+        with open_decompressed(self.filename, compression) as raw:
+            lines = (line.rstrip("\r\n") for line in io.TextIOWrapper(raw, encoding=self.encoding, newline=""))
+            lines = (line for line in lines
+                     if line.strip() and not (self.removecomments and line.startswith(self.removecomments)))
+            if not self.columns:
+                for line in lines:
+                    yield tuple(split(line))
+                return
+            header = next(lines, None)
+            if header is None:
+                return
+            indices = project(tuple(split(header)), self.columns)
+            yield self.columns
+            split = splitter(self.delimiter, maxsplit=max(indices) + 1)
+            for line in lines:
+                values = split(line)
+                yield tuple(values[i] if i < len(values) else None for i in indices)
+
+
+def project(header: tuple, columns: Sequence[str]) -> list:
+    """Indices of columns in header
+
+    Raises:
+        ValueError if a column is not in the header
+    """
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f"Columns not in the file: {missing}. The columns are: {list(header)}")
+    return [header.index(column) for column in columns]
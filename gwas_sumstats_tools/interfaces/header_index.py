@@ -0,0 +1,81 @@
+"""
+Inverted index from the header aliases of header_mapper and
+known_header_transformations to the standard fields.
+
+Aliases are normalised to lower case. An alias can belong to more
+than one field, e.g. 'id', so each alias maps to its candidate
+fields in header_mapper order, followed by the field given in
+known_header_transformations if it is one of the header_mapper
+fields. Headers not in the index are matched on their letters and
+digits only, and failing that on the closest such alias by edit
+distance.
+"""
+
+import difflib
+import re
+from functools import lru_cache
+
+from gwas_sumstats_tools.schema.headermap import header_mapper, known_header_transformations
+
+
+FUZZY_CUTOFF = 0.85
+_NON_ALPHANUMERIC = re.compile(r"[\W_]+")
+
+
+def normalise(header: str) -> str:
+    return str(header).strip().lower()
+
+
+def squash(header: str) -> str:
+    return _NON_ALPHANUMERIC.sub("", normalise(header))
+
+
+@lru_cache(maxsize=1)
+def alias_index() -> tuple[dict, dict]:
+    """Build the index once, on first use
+
+    Returns:
+        ({normalised alias: candidate fields}, {squashed alias: candidate fields})
+    """
+    index = {}
+    for field, aliases in header_mapper.items():
+        for alias in [field] + list(aliases):
+            candidates = index.setdefault(normalise(alias), [])
+            if field not in candidates:
+                candidates.append(field)
+    for alias, field in known_header_transformations.items():
+        if field not in header_mapper:
+            continue
+        candidates = index.setdefault(normalise(alias), [])
+        if field not in candidates:
+            candidates.append(field)
+    squashed = {}
+    for alias, candidates in index.items():
+        squashed_candidates = squashed.setdefault(squash(alias), [])
+        squashed_candidates.extend(c for c in candidates if c not in squashed_candidates)
+    return ({alias: tuple(c) for alias, c in index.items()},
+            {alias: tuple(c) for alias, c in squashed.items() if alias})
+
+
+@lru_cache(maxsize=4096)
+def header_candidates(header: str) -> tuple:
+    """Standard fields a header could be, most likely first
+
+    Arguments:
+        header -- header of an input file
+
+    Returns:
+        tuple of standard fields, empty if there is no match
+    """
+    index, squashed = alias_index()
+    candidates = index.get(normalise(header))
+    if candidates:
+        return candidates
+    key = squash(header)
+    if not key:
+        return ()
+    candidates = squashed.get(key)
+    if candidates:
+        return candidates
+    closest = difflib.get_close_matches(key, squashed.keys(), n=1, cutoff=FUZZY_CUTOFF)
+    return squashed[closest[0]] if closest else ()
@@ -0,0 +1,258 @@
+"""
+Peak memory of the stages of a command.
+
+Code marks its stages with stage("name"), e.g. reading a chunk,
+splitting the p-value or validating a chunk against the schema.
+While a MemoryMonitor is running, each stage records its calls,
+time, the peak of the memory traced by tracemalloc while it ran,
+how far that peak rose above the traced memory at its start, and
+the peak resident set size (RSS). When no monitor is running stages
+cost next to nothing.
+
+tracemalloc sees the allocations of Python objects and numpy arrays
+but not the buffers of C libraries, e.g. the pandas CSV parser or
+zlib, which the RSS includes. The RSS is sampled every few
+milliseconds in a background thread, from /proc, so it is only
+measured on Linux. Stages can be nested; the peaks of a stage
+include those of the stages inside it. Only the calling process is
+measured, not worker processes.
+
+The steps of a lazy petl pipeline run as the rows are pulled through
+it, so they are measured by wrapping each step in a MeasuredView.
+Pulling rows from a view also runs the steps before it, so the stage
+of a step includes the stages of the steps it reads from.
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Union
+
+import petl as etl
+from rich.console import Console
+from rich.table import Table
+
+
+RSS_INTERVAL = 0.01
+BATCH_ROWS = 10_000
+MB = 1024 * 1024
+_monitor = None
+
+
+def rss() -> Union[int, None]:
+    """Resident set size of this process in bytes, None if unknown"""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _Stage:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak_traced = 0
+        self.peak_increase = 0
+        self.peak_rss = None
+
+
+class _OpenStage:
+    def __init__(self, stage: _Stage, traced: int, start_rss: Union[int, None]) -> None:
+        self.stage = stage
+        self.start = time.perf_counter()
+        self.traced = traced
+        self.peak = traced
+        self.peak_rss = start_rss
+
+
+class MemoryMonitor:
+    """Measure the stages entered between start and stop. On stop the
+    metrics are written to outfile as JSON, if given, and printed to
+    stderr.
+
+    Keyword Arguments:
+        outfile -- JSON file for the metrics (default: {None})
+        interval -- seconds between RSS samples (default: {RSS_INTERVAL})
+    """
+    def __init__(self,
+                 outfile: Union[Path, str] = None,
+                 interval: float = RSS_INTERVAL) -> None:
+        self.outfile = Path(outfile) if outfile else None
+        self.interval = interval
+        self.stages = {}
+        self.open = []
+        self.peak_traced = 0
+        self.peak_rss = None
+        self.seconds = None
+        self.console = Console(stderr=True)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample_rss, name="rss-sampler", daemon=True)
+
+    def start(self) -> "MemoryMonitor":
+        global _monitor
+        self._start = time.perf_counter()
+        tracemalloc.start()
+        self._thread.start()
+        _monitor = self
+        return self
+
+    def stop(self) -> "MemoryMonitor":
+        global _monitor
+        _monitor = None
+        self.peak_traced = max(self.peak_traced, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        self._stopped.set()
+        self._thread.join()
+        self._update_rss(rss())
+        self.seconds = time.perf_counter() - self._start
+        if self.outfile:
+            self.outfile.write_text(json.dumps(self.to_dict(), indent=2) + "\n")
+        self.console.print(self.table())
+        if self.outfile:
+            self.console.print(f"[dim]Metrics written to {self.outfile}[/dim]")
+        return self
+
+    def enter(self, name: str) -> _OpenStage:
+        current, peak = tracemalloc.get_traced_memory()
+        # the peak is reset for the new stage, so the stages already
+        # open take theirs first
+        for opened in self.open:
+            opened.peak = max(opened.peak, peak)
+        self.peak_traced = max(self.peak_traced, peak)
+        tracemalloc.reset_peak()
+        opened = _OpenStage(stage=self.stages.setdefault(name, _Stage(name)),
+                            traced=current,
+                            start_rss=rss())
+        self.open.append(opened)
+        return opened
+
+    def exit(self, opened: _OpenStage) -> None:
+        peak = tracemalloc.get_traced_memory()[1]
+        self._update_rss(rss())
+        for other in self.open:
+            other.peak = max(other.peak, peak)
+        self.open.remove(opened)
+        stage = opened.stage
+        stage.calls += 1
+        stage.seconds += time.perf_counter() - opened.start
+        stage.peak_traced = max(stage.peak_traced, opened.peak)
+        stage.peak_increase = max(stage.peak_increase, opened.peak - opened.traced)
+        if opened.peak_rss is not None:
+            stage.peak_rss = max(stage.peak_rss or 0, opened.peak_rss)
+
+    def _update_rss(self, value: Union[int, None]) -> None:
+        if value is None:
+            return
+        self.peak_rss = max(self.peak_rss or 0, value)
+        for opened in list(self.open):
+            opened.peak_rss = max(opened.peak_rss or 0, value)
+
+    def _sample_rss(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self._update_rss(rss())
+
+    def to_dict(self) -> dict:
+        """The metrics as a JSON serialisable dict, memory in MB"""
+        return {"seconds": round(self.seconds, 3) if self.seconds is not None else None,
+                "peak_traced_mb": _mb(self.peak_traced),
+                "peak_rss_mb": _mb(self.peak_rss),
+                "stages": {stage.name: {"calls": stage.calls,
+                                        "seconds": round(stage.seconds, 3),
+                                        "peak_traced_mb": _mb(stage.peak_traced),
+                                        "peak_increase_mb": _mb(stage.peak_increase),
+                                        "peak_rss_mb": _mb(stage.peak_rss)}
+                           for stage in self.stages.values()}}
+
+    def table(self) -> Table:
+        metrics = self.to_dict()
+        table = Table(title=(f"Peak memory by stage (whole command: {metrics['peak_rss_mb']} MB RSS, "
+                             f"{metrics['peak_traced_mb']} MB traced)"),
+                      title_justify="left")
+        table.add_column("stage")
+        for column in ("calls", "seconds", "RSS MB", "traced MB", "rise MB"):
+            table.add_column(column, justify="right")
+        for name, stage in metrics["stages"].items():
+            table.add_row(name, str(stage["calls"]), f"{stage['seconds']:.2f}", str(stage["peak_rss_mb"]),
+                          str(stage["peak_traced_mb"]), str(stage["peak_increase_mb"]))
+        return table
+
+
+def _mb(size: Union[int, None]) -> Union[float, None]:
+    return round(size / MB, 1) if size is not None else None
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Measure the code in the with block as a stage of the running
+    MemoryMonitor, if there is one
+
+    Arguments:
+        name -- stage name, e.g. "read"
+    """
+    monitor = _monitor
+    if monitor is None:
+        yield
+        return
+    opened = monitor.enter(name)
+    try:
+        yield
+    finally:
+        monitor.exit(opened)
+
+
+def measured(iterable: Iterable, name: str) -> Iterator:
+    """Items of iterable, with getting each item measured as a stage
+
+    Arguments:
+        iterable -- e.g. an iterator of chunks read from a file
+        name -- stage name
+    """
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+class MeasuredView(etl.Table):
+    """Rows of a table, with getting them measured as a stage
+    batch rows at a time, so that the stage is not entered for
+    every row. Without a running MemoryMonitor the rows are passed
+    straight through.
+
+    Arguments:
+        table -- petl table, e.g. a step of a formatting pipeline
+        name -- stage name
+
+    Keyword Arguments:
+        batch -- rows measured at a time (default: {BATCH_ROWS})
+    """
+    def __init__(self, table: etl.Table, name: str, batch: int = BATCH_ROWS) -> None:
+        self.table = table
+        self.name = name
+        self.batch = batch
+
+    def __iter__(self) -> Iterator:
+        rows = iter(self.table)
+        if _monitor is None:
+            yield from rows
+            return
+        # the header is got on its own, as reading the header is all many callers do
+        batch_size = 1
+        while True:
+            with stage(self.name):
+                batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield from batch
+            batch_size = self.batch
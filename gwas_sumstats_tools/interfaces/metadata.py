@@ -24,6 +24,7 @@ from gwas_sumstats_tools.utils import (download_with_requests,
                                        parse_accession_id,
                                        parse_genome_assembly,
                                        get_md5sum,
+                                       read_file_digest,
                                        replace_dictionary_keys,
                                        split_fields_on_delimiter,
                                        update_dict_if_not_set,
@@ -444,7 +445,9 @@ def _parse_gwas_rest_samples_response(ancestry_response: Optional[bytes] = None,
     return formatted_list
 
 def get_file_metadata(in_file: Path, out_file: str) -> SumStatsMetadataFile:
-    """Get file related metadata
+    """Get file related metadata. The md5sum is taken from the
+    <out_file>-digest.json sidecar written with the file, if it
+    is still current, otherwise it is calculated from the file.
 
     Arguments:
         in_file -- sumstats in file
@@ -456,12 +459,13 @@ def get_file_metadata(in_file: Path, out_file: str) -> SumStatsMetadataFile:
     if not Path(out_file).exists():
         raise FileNotFoundError(f"Cannot compute md5sum: file not found: {out_file}")
     accession_id = parse_accession_id(filename=in_file)
+    digest = read_file_digest(out_file)
     return SumStatsMetadataFile.construct(
         gwas_id=accession_id,
         data_file_name=Path(out_file).name,
         file_type='GWAS-SSF v1.0',
         genome_assembly=GENOME_ASSEMBLY_MAPPINGS.get(parse_genome_assembly(filename=in_file), 'unknown'),
-        data_file_md5sum=get_md5sum(out_file),
+        data_file_md5sum=digest["md5sum"] if digest else get_md5sum(out_file),
         date_metadata_last_modified=date.today(),
         gwas_catalog_api=REST_API_STUDIES_URL + accession_id if accession_id else None,
     )
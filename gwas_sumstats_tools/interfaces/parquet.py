@@ -0,0 +1,373 @@
+"""
+Read and write sumstats tables as Parquet and Arrow IPC (Feather).
+
+Columns are typed after SumStatsSchema, so chromosome and
+base_pair_location are integers, the effect and its error floats and
+so on, and the missing values are nulls. p_value is kept as a string:
+a GWAS-SSF p-value can be below the smallest float64, e.g. 1e-400,
+and Parquet has no float128. Fields not in the schema are strings.
+
+Rows are streamed chunksize at a time, and a row group never holds
+more than one chromosome, so a reader can skip whole chromosomes on
+the row group statistics.
+
+Columnar input is read one record batch, at most a row group, at a
+time and only the columns asked for are read. The petl views give the
+values as strings, as for delimited text, while the pandas frames
+keep the column types, so validating a columnar file parses no text.
+pyarrow is an optional dependency, needed only here.
+"""
+
+import math
+import sys
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Sequence, Union
+
+import pandas as pd
+import petl as etl
+
+from gwas_sumstats_tools.interfaces.delimited import project
+from gwas_sumstats_tools.interfaces.sniff import sniff_columnar
+from gwas_sumstats_tools.schema.data_table import SumStatsSchema
+
+
+DEFAULT_ROW_GROUP_SIZE = 500_000
+DEFAULT_BATCH_SIZE = 65_536
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+COLUMNAR_EXTENSIONS = PARQUET_EXTENSIONS + (".arrow", ".feather", ".ipc")
+MISSING = "#NA"
+COMPRESSION = "zstd"
+NA_VALUES = ("", "#NA", "NA", "N/A", "NaN", "NR")
+EFFECT_FIELDS = ("beta", "odds_ratio", "hazard_ratio")
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet and Arrow files need the pyarrow package: pip install gwas-sumstats-tools[parquet]")
+    return pyarrow
+
+
+def is_parquet(filename: Union[Path, str]) -> bool:
+    return Path(filename).suffix.lower() in PARQUET_EXTENSIONS
+
+
+def field_types() -> dict:
+    """{field: 'int', 'float' or 'str'} from SumStatsSchema"""
+    types = {}
+    for effect_field in EFFECT_FIELDS:
+        schema = SumStatsSchema(effect_field=effect_field)
+        for field, column in {**schema.mandatory_fields(), **schema.optional_fields()}.items():
+            dtype = str(column.dtype).lower()
+            if field == "p_value" or dtype == "str":
+                types[field] = "str"
+            elif dtype.startswith("int"):
+                types[field] = "int"
+            else:
+                types[field] = "float"
+    return types
+
+
+def arrow_schema(header: tuple):
+    pa = require_pyarrow()
+    arrow_types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string()}
+    types = field_types()
+    return pa.schema([(field, arrow_types[types.get(field, "str")]) for field in header])
+
+
+def _column(values: list, field: str, arrow_type):
+    """Arrow array of the string values of a field, with NA_VALUES as nulls"""
+    pa = require_pyarrow()
+    series = pd.Series(values, dtype=object)
+    missing = series.isna() | series.isin(NA_VALUES)
+    if pa.types.is_string(arrow_type):
+        return pa.array(series.mask(missing, None).tolist(), type=arrow_type)
+    numbers = pd.to_numeric(series.mask(missing, None), errors="coerce")
+    invalid = numbers.isna() & ~missing
+    if pa.types.is_integer(arrow_type):
+        invalid |= numbers.notna() & (numbers % 1 != 0)
+    if invalid.any():
+        raise ValueError(f"Cannot write {series[invalid].iloc[0]!r} in {field} to a "
+                         f"{arrow_type} Parquet column, validate the table first")
+    if pa.types.is_integer(arrow_type):
+        numbers = numbers.astype("Int64")
+    return pa.array(numbers, type=arrow_type, from_pandas=True)
+
+
+def _row_groups(rows: Iterator, chr_index: Union[int, None], size: int) -> Iterator[list]:
+    """Lists of at most size rows, split where the chromosome changes
+    while the rows are grouped by chromosome. Once a chromosome comes
+    back after another, the rows are not grouped, and the lists are
+    only split at size rows, so interleaved chromosomes do not give
+    a row group per row.
+    """
+    if chr_index is None:
+        while True:
+            group = list(islice(rows, size))
+            if not group:
+                return
+            yield group
+    group = []
+    chromosome = None
+    seen = set()
+    grouped = True
+    for row in rows:
+        if grouped and row[chr_index] != chromosome:
+            if row[chr_index] in seen:
+                grouped = False
+            else:
+                seen.add(chromosome)
+                chromosome = row[chr_index]
+                if group:
+                    yield group
+                    group = []
+        if len(group) == size:
+            yield group
+            group = []
+        group.append(row)
+    if group:
+        yield group
+
+
+def write_parquet(table: etl.Table,
+                  sink,
+                  row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                  compression: str = COMPRESSION) -> int:
+    """Write a petl table to Parquet, one row group at a time.
+
+    Arguments:
+        table -- petl table of strings
+        sink -- file name or binary file object
+
+    Keyword Arguments:
+        row_group_size -- maximum rows in a row group (default: {500_000})
+        compression -- Parquet compression codec (default: {"zstd"})
+
+    Returns:
+        number of rows written
+    """
+    pa = require_pyarrow()
+    import pyarrow.parquet as pq
+    rows = iter(table)
+    header = tuple(next(rows))
+    schema = arrow_schema(header)
+    chr_index = header.index("chromosome") if "chromosome" in header else None
+    nrows = 0
+    with pq.ParquetWriter(sink, schema, compression=compression, write_statistics=True) as writer:
+        for group in _row_groups(rows, chr_index, row_group_size):
+            columns = [_column([row[i] if i < len(row) else None for row in group], field.name, field.type)
+                       for i, field in enumerate(schema)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema), row_group_size=len(group))
+            nrows += len(group)
+    return nrows
+
+
+def schema_of(filename: Union[Path, str]):
+    """Arrow schema of a Parquet or Arrow IPC file"""
+    require_pyarrow()
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+    columnar = sniff_columnar(filename)
+    if columnar == "parquet":
+        return pq.read_schema(filename)
+    if columnar == "arrow":
+        return _open_ipc(filename).schema
+    return feather.read_table(filename, memory_map=True).schema
+
+
+def _open_ipc(filename: Union[Path, str]):
+    pa = require_pyarrow()
+    return pa.ipc.open_file(pa.memory_map(str(filename)))
+
+
+def record_batches(filename: Union[Path, str],
+                   columns: Sequence[str] = None,
+                   batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator:
+    """Record batches of a Parquet or Arrow IPC file, holding only
+    columns, in that order, and at most batch_size rows each.
+
+    Arguments:
+        filename -- Parquet or Arrow IPC file
+
+    Keyword Arguments:
+        columns -- columns to read (default: {None, which means all columns})
+        batch_size -- maximum rows in a batch (default: {65_536})
+
+    Returns:
+        iterator of pyarrow RecordBatch
+    """
+    pa = require_pyarrow()
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+    columnar = sniff_columnar(filename)
+    if columnar == "parquet":
+        batches = pq.ParquetFile(filename).iter_batches(batch_size=batch_size,
+                                                        columns=list(columns) if columns else None)
+    elif columnar == "arrow":
+        reader = _open_ipc(filename)
+        batches = (batch.slice(offset, batch_size)
+                   for batch in (reader.get_batch(i) for i in range(reader.num_record_batches))
+                   for offset in range(0, max(batch.num_rows, 1), batch_size))
+    else:
+        batches = feather.read_table(filename,
+                                     columns=list(columns) if columns else None,
+                                     memory_map=True).to_batches(max_chunksize=batch_size)
+    for batch in batches:
+        if columns:
+            batch = pa.RecordBatch.from_arrays([batch.column(batch.schema.get_field_index(c)) for c in columns],
+                                               names=list(columns))
+        yield batch
+
+
+def _string_columns(data) -> list:
+    """Values of each column of a record batch or table as strings, nulls as MISSING"""
+    pa = require_pyarrow()
+    import pyarrow.compute as pc
+    columns = []
+    for column in data.columns:
+        try:
+            strings = pc.cast(column, pa.string())
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            strings = pa.array([None if value is None else str(value) for value in column.to_pylist()],
+                               type=pa.string())
+        columns.append(pc.fill_null(strings, MISSING).to_pylist())
+    return columns
+
+
+class ColumnarView(etl.Table):
+    """petl view of a Parquet or Arrow IPC file, with the values as
+    strings. Only columns are read, a record batch at a time.
+    """
+    def __init__(self,
+                 filename: Union[Path, str],
+                 columns: Sequence[str] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        self.filename = str(filename)
+        self.columns = tuple(columns) if columns else None
+        self.batch_size = batch_size
+
+    def __iter__(self) -> Iterator[tuple]:
+        names = tuple(schema_of(self.filename).names)
+        if self.columns:
+            project(names, self.columns)
+        yield self.columns or names
+        for batch in record_batches(self.filename, columns=self.columns, batch_size=self.batch_size):
+            yield from zip(*_string_columns(batch))
+
+
+def _to_frame(table, p_value_field: str = "p_value") -> pd.DataFrame:
+    """pandas frame of an Arrow table, keeping the column types. The
+    p-value stays a string, to be split into mantissa and exponent,
+    and NA_VALUES in string columns are missing, as for text input.
+    """
+    pa = require_pyarrow()
+    import pyarrow.compute as pc
+    if p_value_field in table.column_names:
+        index = table.column_names.index(p_value_field)
+        if not pa.types.is_string(table.schema.field(index).type):
+            table = table.set_column(index, p_value_field, pc.cast(table.column(index), pa.string()))
+    df = table.to_pandas()
+    for field in table.schema:
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            df[field.name] = df[field.name].mask(df[field.name].isin(NA_VALUES))
+    return df
+
+
+def read_frames(filename: Union[Path, str],
+                chunksize: int = None,
+                nrows: int = None,
+                skiprows: int = None,
+                columns: Sequence[str] = None,
+                p_value_field: str = "p_value") -> Iterator[pd.DataFrame]:
+    """pandas frames of chunksize rows of a Parquet or Arrow IPC file,
+    like pandas.read_table with chunksize, nrows and skiprows.
+
+    Arguments:
+        filename -- Parquet or Arrow IPC file
+
+    Keyword Arguments:
+        chunksize -- rows in a frame (default: {None, which means all rows in one frame})
+        nrows -- rows to read (default: {None, which means all rows})
+        skiprows -- data rows to skip from the start (default: {None})
+        columns -- columns to read (default: {None, which means all columns})
+        p_value_field -- field kept as a string (default: {"p_value"})
+
+    Returns:
+        iterator of dataframes
+    """
+    pa = require_pyarrow()
+    chunksize = chunksize or nrows or sys.maxsize
+    to_skip = skiprows or 0
+    remaining = nrows if nrows is not None else sys.maxsize
+    pending = []
+    npending = 0
+    schema = None
+    for batch in record_batches(filename, columns=columns):
+        schema = batch.schema
+        if to_skip:
+            skipped = min(to_skip, batch.num_rows)
+            batch = batch.slice(skipped)
+            to_skip -= skipped
+        batch = batch.slice(0, min(batch.num_rows, remaining))
+        remaining -= batch.num_rows
+        pending.append(batch)
+        npending += batch.num_rows
+        while npending >= chunksize:
+            table = pa.Table.from_batches(pending, schema=schema)
+            yield _to_frame(table.slice(0, chunksize), p_value_field)
+            pending = table.slice(chunksize).to_batches()
+            npending -= chunksize
+        if not remaining:
+            break
+    if npending:
+        yield _to_frame(pa.Table.from_batches(pending, schema=schema), p_value_field)
+
+
+def count_rows(filename: Union[Path, str]) -> int:
+    require_pyarrow()
+    import pyarrow.parquet as pq
+    if sniff_columnar(filename) == "parquet":
+        return pq.ParquetFile(filename).metadata.num_rows
+    return sum(batch.num_rows for batch in record_batches(filename))
+
+
+def sample_columnar(filename: Union[Path, str],
+                    nrows: int,
+                    windows: int) -> tuple[tuple, list, list]:
+    """About nrows rows from windows evenly spaced positions of a
+    Parquet or Arrow IPC file. Only the Parquet row groups holding
+    sampled rows are read.
+
+    Returns:
+        (header, rows, locations) as sample.sample_rows
+    """
+    pa = require_pyarrow()
+    import pyarrow.parquet as pq
+    total = count_rows(filename)
+    per_window = max(1, math.ceil(nrows / windows))
+    indices = sorted({i for window in range(windows)
+                      for i in range(total * window // windows,
+                                     min(total * window // windows + per_window, total))})
+    if sniff_columnar(filename) == "parquet":
+        parquet = pq.ParquetFile(filename)
+        starts = [0]
+        for group in range(parquet.metadata.num_row_groups):
+            starts.append(starts[-1] + parquet.metadata.row_group(group).num_rows)
+        groups = sorted({next(g for g in range(len(starts) - 1) if starts[g + 1] > i) for i in indices})
+        table = parquet.read_row_groups(groups) if groups else parquet.schema_arrow.empty_table()
+        offsets = {}
+        position = 0
+        for group in groups:
+            offsets[group] = position - starts[group]
+            position += starts[group + 1] - starts[group]
+        take = [i + offsets[next(g for g in groups if starts[g + 1] > i)] for i in indices]
+    else:
+        table = pa.Table.from_batches(list(record_batches(filename)), schema=schema_of(filename))
+        take = indices
+    sample = table.take(pa.array(take, type=pa.int64()))
+    return (tuple(sample.column_names),
+            list(zip(*_string_columns(sample))),
+            [f"row {i + 1}" for i in indices])
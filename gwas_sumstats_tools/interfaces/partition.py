@@ -0,0 +1,182 @@
+"""
+Split a delimited sumstats file into parts that can be read
+independently, e.g. in separate processes.
+
+BGZF files are split at block boundaries and uncompressed files at
+byte offsets. A part holds the lines that start in it, so a line
+running over the end of a part is read whole by that part and
+skipped by the next. Whether a line starts right at a boundary is
+decided from the byte before it, so no line is read twice or lost.
+Files with other compression cannot be read from an offset, so
+they are a single part.
+"""
+
+import os
+from pathlib import Path
+from typing import Iterator, NamedTuple, Union
+
+from gwas_sumstats_tools.interfaces.bgzf import find_block, read_block
+from gwas_sumstats_tools.interfaces.sniff import open_decompressed, sniff_compression
+
+
+READ_SIZE = 1 << 20
+CHUNK_BYTES = 32 * 1024 * 1024
+
+
+class Partition(NamedTuple):
+    start: int
+    end: Union[int, None]
+    line_start: bool
+    compression: Union[str, None]
+
+
+def partition(filename: Union[Path, str], parts: int) -> list:
+    """Split a file into at most parts partitions of about equal
+    compressed size
+
+    Arguments:
+        filename -- sumstats file
+        parts -- number of partitions wanted
+
+    Returns:
+        list of Partition(start, end, line_start, compression). start and
+        end are compressed block offsets for BGZF files and byte offsets
+        for uncompressed files, end is None for the last partition.
+        line_start is True if a line starts at start.
+    """
+    compression = sniff_compression(filename)
+    if parts <= 1 or compression not in ("bgzf", None):
+        return [Partition(0, None, True, compression)]
+    size = os.path.getsize(filename)
+    boundaries = [(0, True)]
+    with open(filename, "rb") as fh:
+        for part in range(1, parts):
+            offset = size * part // parts
+            if compression == "bgzf":
+                boundary = _bgzf_boundary(fh, offset)
+            else:
+                boundary = _byte_boundary(fh, offset)
+            if boundary is None:
+                break
+            if boundary[0] > boundaries[-1][0]:
+                boundaries.append(boundary)
+    ends = [start for start, _ in boundaries[1:]] + [None]
+    return [Partition(start, end, line_start, compression)
+            for (start, line_start), end in zip(boundaries, ends)]
+
+
+def _bgzf_boundary(fh, offset: int) -> Union[tuple, None]:
+    """(offset of the block after the first non-empty block at or after
+    offset, whether that block ends with a line break)
+    """
+    block = find_block(fh, offset)
+    while block is not None:
+        data = read_block(fh, block)
+        if data is None:
+            return None
+        block = fh.tell()
+        if data:
+            return block, data.endswith(b"\n")
+    return None
+
+
+def _byte_boundary(fh, offset: int) -> tuple:
+    fh.seek(offset - 1)
+    return offset, fh.read(1) == b"\n"
+
+
+def _blocks(fh, part: Partition) -> Iterator[tuple]:
+    """(offset, data) of the blocks or reads of a file from the start of part.
+    Reads of uncompressed files stop at the end of the part, so that no
+    read straddles it.
+    """
+    offset = part.start
+    if part.compression == "bgzf":
+        while True:
+            data = read_block(fh, offset)
+            if not data:
+                if data is None:
+                    return
+                offset = fh.tell()
+                continue
+            yield offset, data
+            offset = fh.tell()
+    fh.seek(offset)
+    while True:
+        size = READ_SIZE if part.end is None or offset >= part.end else min(READ_SIZE, part.end - offset)
+        data = fh.read(size)
+        if not data:
+            return
+        yield offset, data
+        offset += len(data)
+
+
+def read_partition(filename: Union[Path, str],
+                   part: Partition,
+                   chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """Decompressed data of the lines starting in a partition, in chunks
+    of whole lines of about chunk_bytes
+
+    Arguments:
+        filename -- sumstats file
+        part -- Partition of the file
+
+    Keyword Arguments:
+        chunk_bytes -- bytes in a chunk (default: {32 MB})
+
+    Returns:
+        iterator of bytes
+    """
+    if part.compression not in ("bgzf", None):
+        with open_decompressed(filename, part.compression) as fh:
+            yield from _whole_lines(iter(lambda: fh.read(READ_SIZE), b""), chunk_bytes)
+        return
+    with open(filename, "rb") as fh:
+        yield from _whole_lines(_clip(_blocks(fh, part), part), chunk_bytes)
+
+
+def _clip(blocks: Iterator[tuple], part: Partition) -> Iterator[bytes]:
+    """Data from the first line starting in part to the end of the last"""
+    skip = not part.line_start
+    ended = True
+    for offset, data in blocks:
+        if part.end is not None and offset >= part.end:
+            if skip or ended:
+                return
+            newline = data.find(b"\n")
+            if newline < 0:
+                yield data
+                continue
+            yield data[:newline + 1]
+            return
+        if skip:
+            newline = data.find(b"\n")
+            if newline < 0:
+                continue
+            data = data[newline + 1:]
+            skip = False
+            if not data:
+                continue
+        ended = data.endswith(b"\n")
+        yield data
+
+
+def _whole_lines(data: Iterator[bytes], chunk_bytes: int) -> Iterator[bytes]:
+    """Pieces of data joined into chunks that end at a line break,
+    cut in the last piece so that each byte is copied once
+    """
+    pieces = []
+    size = 0
+    for piece in data:
+        size += len(piece)
+        if size >= chunk_bytes:
+            cut = piece.rfind(b"\n") + 1
+            if cut:
+                pieces.append(piece[:cut])
+                yield b"".join(pieces)
+                pieces = [piece[cut:]]
+                size = len(piece) - cut
+                continue
+        pieces.append(piece)
+    if size:
+        yield b"".join(pieces)
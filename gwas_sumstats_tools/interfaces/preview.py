@@ -0,0 +1,128 @@
+"""
+Preview the header and first rows of a sumstats file from a single
+read of at most max_bytes from the start of the file.
+
+The bytes are read READ_SIZE at a time and decompressed as they come,
+stopping as soon as the header and the rows asked for are complete,
+so a preview costs one open and usually one read, which matters on
+network filesystems. The compression and the delimiter are detected
+from the same buffer.
+"""
+
+import bz2
+import csv
+import lzma
+import zlib
+from pathlib import Path
+from typing import NamedTuple, Union
+
+from gwas_sumstats_tools.interfaces.delimited import splitter
+from gwas_sumstats_tools.interfaces.sniff import columnar_of, compression_of, sniff_delimiter
+
+
+DEFAULT_PREVIEW_ROWS = 10
+DEFAULT_PREVIEW_BYTES = 4 * 1024 * 1024
+READ_SIZE = 64 * 1024
+
+
+class Preview(NamedTuple):
+    header: tuple
+    rows: list
+    delimiter: Union[str, None]
+    compression: Union[str, None]
+    columnar: Union[str, None]
+
+
+class _Decompressor:
+    """Incremental decompressor for the compression of the file.
+    gzip members follow one another in BGZF and concatenated gzip files.
+    """
+    def __init__(self, compression: Union[str, None]) -> None:
+        self.compression = compression
+        self._decompressor = self._new()
+
+    def _new(self):
+        if self.compression in ("gzip", "bgzf"):
+            return zlib.decompressobj(wbits=31)
+        if self.compression == "bz2":
+            return bz2.BZ2Decompressor()
+        if self.compression == "xz":
+            return lzma.LZMADecompressor()
+        if self.compression == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("Reading zstd compressed files needs the zstandard package: pip install zstandard")
+            return zstandard.ZstdDecompressor().decompressobj()
+        return None
+
+    def decompress(self, data: bytes) -> bytes:
+        if self._decompressor is None:
+            return data
+        out = [self._decompressor.decompress(data)]
+        while self.compression in ("gzip", "bgzf") and self._decompressor.unused_data:
+            rest = self._decompressor.unused_data
+            self._decompressor = self._new()
+            out.append(self._decompressor.decompress(rest))
+        return b"".join(out)
+
+
+def _split(line: str, delimiter: str) -> list:
+    if len(delimiter) == 1:
+        return next(csv.reader([line], delimiter=delimiter, skipinitialspace=True), [])
+    return splitter(delimiter)(line)
+
+
+def read_preview(filename: Union[Path, str],
+                 nrows: int = DEFAULT_PREVIEW_ROWS,
+                 delimiter: str = None,
+                 removecomments: str = None,
+                 max_bytes: int = DEFAULT_PREVIEW_BYTES) -> Preview:
+    """Header and first nrows rows of a delimited file.
+
+    Arguments:
+        filename -- sumstats file
+
+    Keyword Arguments:
+        nrows -- rows to preview (default: {10})
+        delimiter -- field delimiter, detected from the data if not given (default: {None})
+        removecomments -- prefix of comment lines to skip (default: {None})
+        max_bytes -- most bytes of the file to read (default: {4 MB})
+
+    Returns:
+        Preview(header, rows, delimiter, compression, columnar). header is ()
+        if no line was found. For Parquet and Arrow files only columnar is set.
+    """
+    lines = []
+    with open(filename, "rb") as fh:
+        chunk = fh.read(min(READ_SIZE, max_bytes))
+        columnar = columnar_of(chunk[:6])
+        if columnar:
+            return Preview((), [], None, None, columnar)
+        compression = compression_of(chunk[:18])
+        decompressor = _Decompressor(compression)
+        nread = len(chunk)
+        partial = b""
+        while chunk:
+            data = partial + decompressor.decompress(chunk)
+            *complete, partial = data.split(b"\n")
+            lines.extend(line for line in complete
+                         if line.strip() and not (removecomments and line.startswith(removecomments.encode())))
+            if len(lines) > nrows or nread >= max_bytes:
+                break
+            chunk = fh.read(min(READ_SIZE, max_bytes - nread))
+            nread += len(chunk)
+        else:
+            if partial.strip():
+                lines.append(partial)
+    text = [line.decode("utf-8", errors="replace").rstrip("\r") for line in lines[:nrows + 1]]
+    if delimiter is None:
+        delimiter = sniff_delimiter("\n".join(text), comment=removecomments)
+    if not text:
+        return Preview((), [], delimiter, compression, None)
+    split_on = delimiter or "\t"
+    return Preview(tuple(_split(text[0], split_on)),
+                   [tuple(_split(line, split_on)) for line in text[1:]],
+                   delimiter,
+                   compression,
+                   None)
@@ -0,0 +1,166 @@
+"""
+Profile a command and report where its time went.
+
+cProfile records every function call, which shows which functions
+are hot but adds a cost to each call, so the per-row functions of
+a chunk loop look slower than they are. The sampler instead looks at
+the stack of the profiled thread every few milliseconds, which costs
+little and shows the lines the time is spent on. Samples are written
+as folded stacks, one "frame;frame;frame count" line per stack, which
+flame graph tools such as speedscope and flamegraph.pl read.
+
+Only the calling thread of the calling process is profiled, so the
+work of worker processes, e.g. with --workers, is not seen.
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Union
+
+from rich.console import Console
+from rich.table import Table
+
+
+HOTSPOTS = 20
+SAMPLE_INTERVAL = 0.005
+
+
+def _location(filename: str, line: int, function: str) -> str:
+    """function (directory/file:line), with the path cut down to its last two parts"""
+    if filename.startswith("<") or filename == "~":
+        return function
+    short = os.path.join(*Path(filename).parts[-2:])
+    return f"{function} ({short}:{line})"
+
+
+class Sampler:
+    """Sample the stack of a thread in a background thread.
+
+    Arguments:
+        interval -- seconds between samples (default: {SAMPLE_INTERVAL})
+        thread_id -- thread to sample (default: {None, which means the calling thread})
+    """
+    def __init__(self,
+                 interval: float = SAMPLE_INTERVAL,
+                 thread_id: int = None) -> None:
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self.lines = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampler", daemon=True)
+
+    def start(self) -> "Sampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> "Sampler":
+        self._stopped.set()
+        self._thread.join()
+        return self
+
+    @property
+    def samples(self) -> int:
+        return sum(self.lines.values())
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.lines[(frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name)] += 1
+            stack = []
+            while frame is not None:
+                stack.append(_location(frame.f_code.co_filename, frame.f_code.co_firstlineno, frame.f_code.co_name))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def hot_lines(self, top: int = HOTSPOTS) -> list:
+        """(filename, line, function, samples) of the lines most often sampled"""
+        return [(*line, count) for line, count in self.lines.most_common(top)]
+
+    def to_folded(self, filename: Union[Path, str]) -> None:
+        with open(filename, "w") as fh:
+            for stack, count in self.stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    """Profile the calling thread with cProfile, and optionally the
+    sampler, between start and stop. On stop the cProfile stats are
+    written to outfile, the samples to <outfile>.folded, and the hot
+    spots are printed to stderr.
+
+    Arguments:
+        outfile -- file for the cProfile stats, readable with pstats or snakeviz
+
+    Keyword Arguments:
+        sample -- also run the sampler (default: {False})
+        interval -- seconds between samples (default: {SAMPLE_INTERVAL})
+        top -- number of hot spots printed (default: {HOTSPOTS})
+    """
+    def __init__(self,
+                 outfile: Union[Path, str],
+                 sample: bool = False,
+                 interval: float = SAMPLE_INTERVAL,
+                 top: int = HOTSPOTS) -> None:
+        self.outfile = Path(outfile)
+        self.top = top
+        self.profile = cProfile.Profile()
+        self.sampler = Sampler(interval=interval) if sample else None
+        self.console = Console(stderr=True)
+
+    def start(self) -> "Profiler":
+        if self.sampler:
+            self.sampler.start()
+        self.profile.enable()
+        return self
+
+    def stop(self) -> None:
+        self.profile.disable()
+        self.profile.dump_stats(self.outfile)
+        self.console.print(self.hot_functions_table())
+        if self.sampler:
+            self.sampler.stop()
+            self.sampler.to_folded(self.folded_file)
+            self.console.print(self.hot_lines_table())
+        self.console.print(f"[dim]Profile written to {self.outfile}"
+                           + (f" and {self.folded_file}" if self.sampler else "") + "[/dim]")
+
+    @property
+    def folded_file(self) -> Path:
+        return self.outfile.with_name(self.outfile.name + ".folded")
+
+    def hot_functions(self) -> list:
+        """(function location, calls, own seconds, total seconds) of the
+        functions with the most time in their own code
+        """
+        stats = pstats.Stats(self.profile).stats
+        ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top]
+        return [(_location(*function), calls, own, total)
+                for function, (_, calls, own, total, _) in ranked]
+
+    def hot_functions_table(self) -> Table:
+        table = Table(title="Hot spots (cProfile, by own time)", title_justify="left")
+        for column in ("own s", "total s", "calls"):
+            table.add_column(column, justify="right")
+        table.add_column("function")
+        for location, calls, own, total in self.hot_functions():
+            table.add_row(f"{own:.3f}", f"{total:.3f}", str(calls), location)
+        return table
+
+    def hot_lines_table(self) -> Table:
+        samples = self.sampler.samples
+        table = Table(title=f"Hot lines ({samples} samples every {self.sampler.interval * 1000:g} ms)",
+                      title_justify="left")
+        table.add_column("samples", justify="right")
+        table.add_column("%", justify="right")
+        table.add_column("line")
+        for filename, line, function, count in self.sampler.hot_lines(self.top):
+            table.add_row(str(count), f"{100 * count / samples:.1f}", _location(filename, line, function))
+        return table
@@ -0,0 +1,80 @@
+"""
+Convert -log10 p-values back to p-values without underflow.
+
+10 ** -x is 0.0 for any x above about 308 in floating point, so the
+p-value is instead written as a decimal mantissa and exponent:
+with k = ceil(x), p = 10 ** (k - x) * 10 ** -k, where the mantissa
+10 ** (k - x) is in [1, 10) whatever the size of x. The conversion
+is vectorized over chunks of rows with numpy, only the strings are
+formatted one at a time.
+"""
+
+from itertools import islice
+from typing import Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+import petl as etl
+
+
+DEFAULT_DIGITS = 6
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def neg_log10_to_pvalue(values: Sequence, digits: int = DEFAULT_DIGITS) -> list:
+    """p-values as mantissa/exponent strings, e.g. '3.16228e-413'
+    for 412.5. Values that are not numbers are returned unchanged.
+
+    Arguments:
+        values -- -log10 p-values
+
+    Keyword Arguments:
+        digits -- significant digits of the mantissa (default: {6})
+
+    Returns:
+        list of p-values
+    """
+    out = np.array(values, dtype=object)
+    x = pd.to_numeric(pd.Series(out, dtype=object), errors="coerce").to_numpy(dtype=float)
+    valid = np.isfinite(x)
+    if not valid.any():
+        return out.tolist()
+    x = x[valid]
+    exponent = np.ceil(x)
+    mantissa = np.round(10 ** (exponent - x), digits - 1)
+    carry = mantissa >= 10
+    mantissa[carry] = 1.0
+    exponent[carry] -= 1
+    # formatting the strings in a comprehension is faster than numpy.char
+    out[valid] = [f"{m:.{digits}g}e{-e}" for m, e in zip(mantissa.tolist(), exponent.astype(np.int64).tolist())]
+    return out.tolist()
+
+
+class NegLog10PvalueView(etl.Table):
+    """petl view converting the -log10 p-values of field to p-values,
+    chunksize rows at a time.
+    """
+    def __init__(self,
+                 source: etl.Table,
+                 field: str = "p_value",
+                 chunksize: int = DEFAULT_CHUNKSIZE,
+                 digits: int = DEFAULT_DIGITS) -> None:
+        self.source = source
+        self.field = field
+        self.chunksize = chunksize
+        self.digits = digits
+
+    def __iter__(self) -> Iterator[tuple]:
+        rows = iter(self.source)
+        header = tuple(next(rows))
+        yield header
+        index = header.index(self.field)
+        while True:
+            chunk = [list(row) for row in islice(rows, self.chunksize)]
+            if not chunk:
+                return
+            values = [row[index] if len(row) > index else None for row in chunk]
+            for row, value in zip(chunk, neg_log10_to_pvalue(values, digits=self.digits)):
+                if len(row) > index:
+                    row[index] = value
+                yield tuple(row)
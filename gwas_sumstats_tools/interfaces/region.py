@@ -0,0 +1,321 @@
+"""
+Read the rows of a sumstats file in a genomic region.
+
+A BGZF file with a tabix index, <file>.tbi, as written by format
+--bgzip --sort, is queried through the index, decompressing only
+the blocks holding the region. Otherwise a coordinate index is
+built on the first query and kept next to the file, in
+<file>-coords.json: the file is split into spans of about
+SPAN_BYTES of data, and for each span the range of base pair
+locations of each chromosome in it is kept, so the file need not
+be sorted. Spans overlapping the region are read from their
+offsets, virtual offsets for BGZF and byte offsets for
+uncompressed files.
+
+Files with other compression cannot be read from an offset, so
+they are scanned from the start.
+"""
+
+import gzip
+import json
+import os
+import re
+import struct
+from pathlib import Path
+from typing import Iterator, NamedTuple, Union
+
+import petl as etl
+
+from gwas_sumstats_tools.interfaces.bgzf import BgzfReader
+from gwas_sumstats_tools.interfaces.delimited import RegexDelimitedView, splitter
+from gwas_sumstats_tools.interfaces.sniff import sniff_compression
+from gwas_sumstats_tools.interfaces.tabix import TBI_MAGIC, TBI_PSEUDO_BIN, TBI_LINEAR_SHIFT
+from gwas_sumstats_tools.utils import append_to_path
+
+
+SPAN_BYTES = 1 << 20
+# the end of the range binned by tabix, and of regions without an end
+MAX_POSITION = 1 << 29
+_REGION = re.compile(r"^(?P<chromosome>[^:]+)(:(?P<start>[\d,]+)?(-(?P<end>[\d,]+)?)?)?$")
+
+
+class Region(NamedTuple):
+    chromosome: str
+    start: int
+    end: int
+
+    def __str__(self) -> str:
+        return f"{self.chromosome}:{self.start}-{self.end}"
+
+    def names(self) -> tuple:
+        """The chromosome as given and without a chr prefix"""
+        if self.chromosome.lower().startswith("chr"):
+            return self.chromosome, self.chromosome[3:]
+        return (self.chromosome,)
+
+    def contains(self, chromosome: str, position: Union[str, int]) -> bool:
+        try:
+            return chromosome in self.names() and self.start <= int(position) <= self.end
+        except ValueError:
+            return False
+
+
+def parse_region(region: str) -> Region:
+    """Region from chr:start-end, 1-based and inclusive. The start and
+    end may be left out, e.g. 7 or 7:27000000-, and may contain commas.
+
+    Arguments:
+        region -- region string
+
+    Returns:
+        Region
+    """
+    match = _REGION.match(region.strip())
+    if match is None:
+        raise ValueError(f"Region '{region}' is not chromosome:start-end")
+    start = int(match["start"].replace(",", "")) if match["start"] else 1
+    end = int(match["end"].replace(",", "")) if match["end"] else MAX_POSITION
+    if end < start:
+        raise ValueError(f"Region '{region}' ends before it starts")
+    return Region(match["chromosome"], max(start, 1), end)
+
+
+def reg2bins(beg: int, end: int) -> list:
+    """UCSC bins overlapping a 0-based, half-open interval"""
+    end -= 1
+    bins = [0]
+    for shift, offset in ((26, 1), (23, 9), (20, 73), (17, 585), (14, 4681)):
+        bins.extend(range(offset + (beg >> shift), offset + (end >> shift) + 1))
+    return bins
+
+
+class TabixIndex:
+    """Tabix index read from a .tbi file"""
+    def __init__(self, filename: Union[Path, str]) -> None:
+        with gzip.open(filename, "rb") as fh:
+            data = fh.read()
+        if data[:4] != TBI_MAGIC:
+            raise ValueError(f"{filename} is not a tabix index")
+        (n_ref, self.format, self.col_seq, self.col_beg, self.col_end,
+         meta, self.skip_lines, l_nm) = struct.unpack_from("<8i", data, 4)
+        self.meta_char = chr(meta)
+        position = 36
+        self.names = [name.decode() for name in data[position:position + l_nm].split(b"\0")[:n_ref]]
+        position += l_nm
+        self.bins = []
+        self.linear = []
+        for _ in range(n_ref):
+            bins = {}
+            (n_bin,) = struct.unpack_from("<i", data, position)
+            position += 4
+            for _ in range(n_bin):
+                bin_number, n_chunk = struct.unpack_from("<Ii", data, position)
+                position += 8
+                chunks = struct.unpack_from(f"<{2 * n_chunk}Q", data, position)
+                position += 16 * n_chunk
+                if bin_number != TBI_PSEUDO_BIN:
+                    bins[bin_number] = list(zip(chunks[::2], chunks[1::2]))
+            (n_intv,) = struct.unpack_from("<i", data, position)
+            position += 4
+            self.linear.append(struct.unpack_from(f"<{n_intv}Q", data, position))
+            position += 8 * n_intv
+            self.bins.append(bins)
+
+    def chunks(self, region: Region) -> list:
+        """Merged (start, end) virtual offsets of the chunks that may hold the region"""
+        name = next((name for name in region.names() if name in self.names), None)
+        if name is None:
+            return []
+        reference = self.names.index(name)
+        beg = region.start - 1
+        linear = self.linear[reference]
+        min_offset = linear[min(beg >> TBI_LINEAR_SHIFT, len(linear) - 1)] if linear else 0
+        chunks = sorted(chunk for bin_number in reg2bins(beg, region.end)
+                        for chunk in self.bins[reference].get(bin_number, ())
+                        if chunk[1] > min_offset)
+        merged = []
+        for start, end in chunks:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return [tuple(chunk) for chunk in merged]
+
+
+def coordinate_index_path(filename: Union[Path, str]) -> Path:
+    return append_to_path(Path(filename), "-coords.json")
+
+
+def _open_seekable(filename: Union[Path, str], compression: Union[str, None]):
+    """Line reader with seek and tell on (virtual) offsets"""
+    return BgzfReader(filename) if compression == "bgzf" else open(filename, "rb")
+
+
+def _fields(line: bytes, split) -> list:
+    return split(line.decode("utf-8", errors="replace").rstrip("\r\n"))
+
+
+def build_coordinate_index(filename: Union[Path, str],
+                           chr_index: int,
+                           bp_index: int,
+                           delimiter: str = "\t",
+                           removecomments: str = None,
+                           span_bytes: int = SPAN_BYTES) -> dict:
+    """Scan a BGZF or uncompressed file once and write its coordinate
+    index to <file>-coords.json.
+
+    Arguments:
+        filename -- sumstats file
+        chr_index -- index of the chromosome field
+        bp_index -- index of the base_pair_location field
+
+    Keyword Arguments:
+        delimiter -- field delimiter (default: {"\t"})
+        removecomments -- prefix of comment lines (default: {None})
+        span_bytes -- approximate data bytes in a span (default: {SPAN_BYTES})
+
+    Returns:
+        the index, {"size", "mtime_ns", "spans": [[offset, {chromosome: [min, max]}]], "end"}
+    """
+    split = splitter(delimiter)
+    comment = removecomments.encode() if removecomments else None
+    stat = os.stat(filename)
+    spans = []
+    with _open_seekable(filename, sniff_compression(filename)) as fh:
+        header_seen = False
+        span_size = span_bytes
+        while True:
+            offset = fh.tell()
+            line = fh.readline()
+            if not line:
+                break
+            if not line.strip() or (comment and line.startswith(comment)):
+                continue
+            if not header_seen:
+                header_seen = True
+                continue
+            if span_size >= span_bytes:
+                spans.append([offset, {}])
+                span_size = 0
+            span_size += len(line)
+            fields = _fields(line, split)
+            try:
+                chromosome, position = fields[chr_index], int(fields[bp_index])
+            except (IndexError, ValueError):
+                continue
+            ranges = spans[-1][1]
+            if chromosome in ranges:
+                low, high = ranges[chromosome]
+                ranges[chromosome] = [min(low, position), max(high, position)]
+            else:
+                ranges[chromosome] = [position, position]
+        end = fh.tell()
+    index = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "spans": spans, "end": end}
+    with open(coordinate_index_path(filename), "w") as fh:
+        json.dump(index, fh)
+    return index
+
+
+def load_coordinate_index(filename: Union[Path, str]) -> Union[dict, None]:
+    """The coordinate index of a file, None if there is none or the file has changed since"""
+    index_file = coordinate_index_path(filename)
+    if not index_file.exists():
+        return None
+    with open(index_file) as fh:
+        index = json.load(fh)
+    stat = os.stat(filename)
+    if index.get("size") != stat.st_size or index.get("mtime_ns") != stat.st_mtime_ns:
+        return None
+    return index
+
+
+def coordinate_index_chunks(index: dict, region: Region) -> list:
+    """(start, end) offsets of the spans that may hold the region"""
+    ends = [span[0] for span in index["spans"][1:]] + [index["end"]]
+    chunks = []
+    for (start, ranges), end in zip(index["spans"], ends):
+        if any(name in ranges and ranges[name][0] <= region.end and ranges[name][1] >= region.start
+               for name in region.names()):
+            if chunks and chunks[-1][1] == start:
+                chunks[-1][1] = end
+            else:
+                chunks.append([start, end])
+    return [tuple(chunk) for chunk in chunks]
+
+
+class RegionView(etl.Table):
+    """petl view of the header and the rows of a sumstats file in a
+    region. The tabix index is used if there is one, then the
+    coordinate index, which is built if need be. self.method says
+    which was used once the view has been iterated.
+    """
+    def __init__(self,
+                 filename: Union[Path, str],
+                 region: Union[Region, str],
+                 header: tuple,
+                 delimiter: str = "\t",
+                 removecomments: str = None) -> None:
+        self.filename = str(filename)
+        self.region = parse_region(region) if isinstance(region, str) else region
+        self.header = tuple(header)
+        self.delimiter = delimiter
+        self.removecomments = removecomments
+        self.method = None
+
+    def __iter__(self) -> Iterator[tuple]:
+        yield self.header
+        if "chromosome" not in self.header or "base_pair_location" not in self.header:
+            raise ValueError("A region needs the chromosome and base_pair_location fields")
+        chr_index = self.header.index("chromosome")
+        bp_index = self.header.index("base_pair_location")
+        compression = sniff_compression(self.filename)
+        tabix_file = Path(self.filename + ".tbi")
+        if compression == "bgzf" and tabix_file.exists():
+            self.method = "tabix index"
+            index = TabixIndex(tabix_file)
+            chunks = index.chunks(self.region)
+            chr_index, bp_index = index.col_seq - 1, index.col_beg - 1
+        elif compression in ("bgzf", None):
+            index = load_coordinate_index(self.filename)
+            self.method = "coordinate index"
+            if index is None:
+                self.method = "new coordinate index"
+                index = build_coordinate_index(self.filename, chr_index, bp_index,
+                                               delimiter=self.delimiter,
+                                               removecomments=self.removecomments)
+            chunks = coordinate_index_chunks(index, self.region)
+        else:
+            self.method = "full scan"
+            yield from self._scan(chr_index, bp_index)
+            return
+        yield from self._read_chunks(chunks, compression, chr_index, bp_index)
+
+    def _matches(self, fields: list, chr_index: int, bp_index: int) -> bool:
+        return len(fields) > max(chr_index, bp_index) and \
+            self.region.contains(fields[chr_index], fields[bp_index])
+
+    def _read_chunks(self, chunks: list, compression: Union[str, None],
+                     chr_index: int, bp_index: int) -> Iterator[tuple]:
+        split = splitter(self.delimiter)
+        comment = self.removecomments.encode() if self.removecomments else None
+        with _open_seekable(self.filename, compression) as fh:
+            for start, end in chunks:
+                fh.seek(start)
+                while fh.tell() < end:
+                    line = fh.readline()
+                    if not line:
+                        break
+                    if comment and line.startswith(comment):
+                        continue
+                    fields = _fields(line, split)
+                    if self._matches(fields, chr_index, bp_index):
+                        yield tuple(fields)
+
+    def _scan(self, chr_index: int, bp_index: int) -> Iterator[tuple]:
+        rows = iter(RegexDelimitedView(self.filename,
+                                       delimiter=self.delimiter,
+                                       removecomments=self.removecomments))
+        next(rows, None)
+        for row in rows:
+            if self._matches(row, chr_index, bp_index):
+                yield row
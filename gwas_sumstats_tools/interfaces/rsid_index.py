@@ -0,0 +1,177 @@
+"""
+rsID index of a sumstats file, kept next to it in <file>-rsid.idx.
+
+The index is a binary table of (rsid number, offset) records sorted
+by rsid number, after a fixed header holding the size and
+modification time of the indexed file. Offsets are BGZF virtual
+offsets, the compressed offset of the block and the offset of the
+row within the block, or byte offsets for uncompressed files. The
+table is memory-mapped and searched with binary search, so looking
+up a few hundred rsIDs reads a few pages of the index and one or two
+blocks of the file per row.
+
+Files with other compression cannot be read from an offset, so they
+cannot be indexed.
+"""
+
+import os
+import re
+import struct
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+import petl as etl
+
+from gwas_sumstats_tools.interfaces.bgzf import BgzfReader
+from gwas_sumstats_tools.interfaces.delimited import splitter
+from gwas_sumstats_tools.interfaces.sniff import sniff_compression
+from gwas_sumstats_tools.utils import append_to_path
+
+
+RSID_INDEX_MAGIC = b"GSSRSID1"
+RSID_INDEX_HEADER = struct.Struct("<8sQQQ")
+RECORD = np.dtype([("rsid", "<u8"), ("offset", "<u8")])
+RSID_FIELDS = ("rsid", "variant_id")
+_RSID = re.compile(r"^rs(\d+)$", re.IGNORECASE)
+
+
+def rsid_number(rsid: str) -> Union[int, None]:
+    """123 for rs123, None if the value is not an rsID"""
+    match = _RSID.match(str(rsid).strip())
+    return int(match[1]) if match else None
+
+
+def rsid_index_path(filename: Union[Path, str]) -> Path:
+    return append_to_path(Path(filename), "-rsid.idx")
+
+
+def rsid_field(header: tuple) -> str:
+    field = next((field for field in RSID_FIELDS if field in header), None)
+    if field is None:
+        raise ValueError(f"No rsID field, one of {RSID_FIELDS}, in the header")
+    return field
+
+
+def _open_seekable(filename: Union[Path, str]):
+    compression = sniff_compression(filename)
+    if compression == "bgzf":
+        return BgzfReader(filename)
+    if compression is None:
+        return open(filename, "rb")
+    raise ValueError(f"{filename} is {compression} compressed and cannot be read from an offset, "
+                     "write it with format --bgzip to index it")
+
+
+def build_rsid_index(filename: Union[Path, str],
+                     header: tuple,
+                     delimiter: str = "\t",
+                     removecomments: str = None) -> tuple[Path, int, int]:
+    """Scan a BGZF or uncompressed file once and write its rsID index
+
+    Arguments:
+        filename -- sumstats file
+        header -- header of the file
+
+    Keyword Arguments:
+        delimiter -- field delimiter (default: {"\t"})
+        removecomments -- prefix of comment lines (default: {None})
+
+    Returns:
+        (index file, rows indexed, rows in the file)
+    """
+    index = header.index(rsid_field(header))
+    split = splitter(delimiter)
+    comment = removecomments.encode() if removecomments else None
+    stat = os.stat(filename)
+    rsids = array("Q")
+    offsets = array("Q")
+    nrows = -1
+    with _open_seekable(filename) as fh:
+        while True:
+            offset = fh.tell()
+            line = fh.readline()
+            if not line:
+                break
+            if not line.strip() or (comment and line.startswith(comment)):
+                continue
+            nrows += 1
+            if not nrows:
+                continue
+            fields = split(line.decode("utf-8", errors="replace").rstrip("\r\n"))
+            number = rsid_number(fields[index]) if len(fields) > index else None
+            if number is not None:
+                rsids.append(number)
+                offsets.append(offset)
+    records = np.empty(len(rsids), dtype=RECORD)
+    records["rsid"] = np.frombuffer(rsids, dtype="<u8") if rsids else []
+    records["offset"] = np.frombuffer(offsets, dtype="<u8") if offsets else []
+    records = records[np.argsort(records["rsid"], kind="stable")]
+    index_file = rsid_index_path(filename)
+    with open(index_file, "wb") as fh:
+        fh.write(RSID_INDEX_HEADER.pack(RSID_INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(records)))
+        fh.write(records.tobytes())
+    return index_file, len(records), max(nrows, 0)
+
+
+def load_rsid_index(filename: Union[Path, str]) -> Union[np.ndarray, None]:
+    """Memory-mapped records of the rsID index of a file,
+    None if there is none or the file has changed since
+    """
+    index_file = rsid_index_path(filename)
+    if not index_file.exists():
+        return None
+    with open(index_file, "rb") as fh:
+        magic, size, mtime_ns, count = RSID_INDEX_HEADER.unpack(fh.read(RSID_INDEX_HEADER.size))
+    stat = os.stat(filename)
+    if magic != RSID_INDEX_MAGIC or size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+        return None
+    if not count:
+        return np.empty(0, dtype=RECORD)
+    return np.memmap(index_file, dtype=RECORD, mode="r", offset=RSID_INDEX_HEADER.size, shape=(count,))
+
+
+def lookup_offsets(records: np.ndarray, rsids: Iterable[str]) -> list:
+    """Offsets of the rows of rsids, in file order"""
+    numbers = np.array(sorted({n for n in map(rsid_number, rsids) if n is not None}), dtype="<u8")
+    keys = records["rsid"]
+    starts = np.searchsorted(keys, numbers, side="left")
+    ends = np.searchsorted(keys, numbers, side="right")
+    return sorted(int(offset) for start, end in zip(starts, ends)
+                  for offset in records["offset"][start:end])
+
+
+class RsidView(etl.Table):
+    """petl view of the header and the rows of a sumstats file with
+    the given rsIDs, in file order. The rsID index is built first if
+    there is none, or if it is out of date.
+    """
+    def __init__(self,
+                 filename: Union[Path, str],
+                 rsids: Iterable[str],
+                 header: tuple,
+                 delimiter: str = "\t",
+                 removecomments: str = None) -> None:
+        self.filename = str(filename)
+        self.rsids = set(rsids)
+        self.header = tuple(header)
+        self.delimiter = delimiter
+        self.removecomments = removecomments
+
+    def __iter__(self) -> Iterator[tuple]:
+        yield self.header
+        index = self.header.index(rsid_field(self.header))
+        records = load_rsid_index(self.filename)
+        if records is None:
+            build_rsid_index(self.filename, self.header,
+                             delimiter=self.delimiter, removecomments=self.removecomments)
+            records = load_rsid_index(self.filename)
+        wanted = {rsid_number(rsid) for rsid in self.rsids} - {None}
+        split = splitter(self.delimiter)
+        with _open_seekable(self.filename) as fh:
+            for offset in lookup_offsets(records, self.rsids):
+                fh.seek(offset)
+                fields = split(fh.readline().decode("utf-8", errors="replace").rstrip("\r\n"))
+                if len(fields) > index and rsid_number(fields[index]) in wanted:
+                    yield tuple(fields)
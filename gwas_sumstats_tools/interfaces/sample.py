@@ -0,0 +1,177 @@
+"""
+Sample rows from across a sumstats file without reading all of it.
+
+Uncompressed files are sampled by seeking to evenly spaced byte
+offsets and reading a window of lines after the first line break.
+BGZF files are sampled the same way, seeking to the first BGZF
+block after each offset. Other compressed files cannot be seeked
+into, so their first rows are taken instead. Parquet and Arrow files
+are sampled by row number.
+"""
+
+import csv
+import math
+import os
+from pathlib import Path
+from typing import Callable, Iterator, Union
+
+from gwas_sumstats_tools.interfaces.bgzf import find_block, read_block
+from gwas_sumstats_tools.interfaces.delimited import splitter
+from gwas_sumstats_tools.interfaces.parquet import sample_columnar
+from gwas_sumstats_tools.interfaces.sniff import open_decompressed, sniff_columnar, sniff_compression
+
+
+DEFAULT_SAMPLE_ROWS = 2000
+DEFAULT_SAMPLE_WINDOWS = 100
+
+
+def sample_rows(filename: Union[Path, str],
+                delimiter: str = "\t",
+                nrows: int = DEFAULT_SAMPLE_ROWS,
+                windows: int = DEFAULT_SAMPLE_WINDOWS,
+                removecomments: str = None) -> tuple[tuple, list, list]:
+    """Sample about nrows rows from windows evenly spaced positions
+    of the file. Windows do not overlap, so a small file is read whole.
+
+    Arguments:
+        filename -- sumstats file
+
+    Keyword Arguments:
+        delimiter -- field delimiter, a regex if longer than one character (default: {"\t"})
+        nrows -- rows to sample (default: {2000})
+        windows -- number of positions to sample from (default: {100})
+        removecomments -- prefix of comment lines to skip (default: {None})
+
+    Returns:
+        (header, rows, locations) where locations[i] describes where rows[i] is in the file
+    """
+    if sniff_columnar(filename):
+        return sample_columnar(filename, nrows=nrows, windows=windows)
+    per_window = max(1, math.ceil(nrows / windows))
+    compression = sniff_compression(filename)
+    if compression == "bgzf":
+        lines = _sample_bgzf(filename, per_window, windows, removecomments)
+    elif compression:
+        lines = _head(open_decompressed(filename, compression), nrows, removecomments)
+    else:
+        lines = _sample_uncompressed(filename, per_window, windows, removecomments)
+    split = _splitter(delimiter)
+    header = None
+    rows = []
+    locations = []
+    for location, line in lines:
+        fields = split(line.decode("utf-8", errors="replace").rstrip("\r\n"))
+        if header is None:
+            header = tuple(fields)
+            continue
+        rows.append(tuple(fields))
+        locations.append(location)
+    return header or (), rows, locations
+
+
+def _splitter(delimiter: str) -> Callable[[str], list]:
+    """Function splitting a line as SumStatsTable reads it: with the csv
+    module for a one character delimiter, else as RegexDelimitedView"""
+    if len(delimiter) == 1:
+        return lambda line: next(csv.reader([line], delimiter=delimiter, skipinitialspace=True), [])
+    return splitter(delimiter)
+
+
+def _is_comment(line: bytes, removecomments: Union[str, None]) -> bool:
+    return bool(removecomments) and line.startswith(removecomments.encode())
+
+
+def _head(opened, nrows: int, removecomments: str) -> Iterator[tuple[str, bytes]]:
+    """Header and first nrows lines of an opened file"""
+    with opened as fh:
+        row = 0
+        for line in fh:
+            if _is_comment(line, removecomments) or not line.strip():
+                continue
+            yield f"row {row}" if row else "header", line
+            row += 1
+            if row > nrows:
+                return
+
+
+def _sample_uncompressed(filename: Union[Path, str],
+                         per_window: int,
+                         windows: int,
+                         removecomments: str) -> Iterator[tuple[str, bytes]]:
+    size = os.path.getsize(filename)
+    with open(filename, "rb") as fh:
+        line = fh.readline()
+        while line and (_is_comment(line, removecomments) or not line.strip()):
+            line = fh.readline()
+        yield "header", line
+        data_start = position = fh.tell()
+        for window in range(windows):
+            offset = data_start + (size - data_start) * window // windows
+            if offset <= position:
+                fh.seek(position)
+            else:
+                # the byte before the offset tells whether the offset is at a line start
+                fh.seek(offset - 1)
+                fh.readline()
+            taken = 0
+            while taken < per_window:
+                start = fh.tell()
+                line = fh.readline()
+                if not line:
+                    return
+                if _is_comment(line, removecomments) or not line.strip():
+                    continue
+                yield f"byte {start}", line
+                taken += 1
+            position = fh.tell()
+
+
+def _sample_bgzf(filename: Union[Path, str],
+                 per_window: int,
+                 windows: int,
+                 removecomments: str) -> Iterator[tuple[str, bytes]]:
+    size = os.path.getsize(filename)
+    with open(filename, "rb") as fh:
+        position = 0
+        for window in range(windows):
+            offset = max(size * window // windows, position)
+            block = find_block(fh, offset)
+            if block is None:
+                return
+            lines = _block_lines(fh, block)
+            if window == 0:
+                for block_offset, line in lines:
+                    if not (_is_comment(line, removecomments) or not line.strip()):
+                        yield "header", line
+                        break
+            else:
+                # the first line after a seek may be partial
+                next(lines, None)
+            taken = 0
+            for block_offset, line in lines:
+                if _is_comment(line, removecomments) or not line.strip():
+                    continue
+                yield f"block {block_offset}", line
+                taken += 1
+                if taken == per_window:
+                    break
+            position = fh.tell()
+
+
+def _block_lines(fh, offset: int) -> Iterator[tuple[int, bytes]]:
+    """Lines of the BGZF blocks from offset, with the offset of the block each line starts in"""
+    partial = b""
+    partial_offset = offset
+    while True:
+        data = read_block(fh, offset)
+        if data is None:
+            if partial:
+                yield partial_offset, partial
+            return
+        next_offset = fh.tell()
+        lines = (partial + data).split(b"\n")
+        partial = lines.pop()
+        for line in lines:
+            yield partial_offset, line + b"\n"
+            partial_offset = offset
+        offset = next_offset
@@ -0,0 +1,166 @@
+"""
+Detect the compression and the delimiter of a sumstats file from
+its content, rather than from its name.
+
+The compression is read from the magic bytes at the start of the
+file and the delimiter from the first few KB of decompressed data.
+Results are cached by file name, size and modification time, so a
+file is only sniffed once however many tables are opened on it.
+"""
+
+import bz2
+import csv
+import gzip
+import io
+import lzma
+import os
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Union
+
+
+SNIFF_SIZE = 64 * 1024
+SNIFF_LINES = 50
+WHITESPACE = r"\s+"
+DELIMITERS = ("\t", ",", ";", "|")
+MAGIC = ((b"\x1f\x8b", "gzip"),
+         (b"BZh", "bz2"),
+         (b"\xfd7zXZ\x00", "xz"),
+         (b"\x28\xb5\x2f\xfd", "zstd"))
+COLUMNAR_MAGIC = ((b"PAR1", "parquet"),
+                  (b"ARROW1", "arrow"),
+                  (b"FEA1", "feather"))
+PANDAS_COMPRESSION = {"bgzf": "gzip", "gzip": "gzip", "bz2": "bz2", "xz": "xz", "zstd": "zstd", None: None}
+
+
+class Sniffed(NamedTuple):
+    compression: Union[str, None]
+    delimiter: Union[str, None]
+
+
+def sniff(filename: Union[Path, str], comment: str = None) -> Sniffed:
+    """Compression and delimiter of a file
+
+    Arguments:
+        filename -- file to sniff
+
+    Keyword Arguments:
+        comment -- prefix of comment lines to ignore (default: {None})
+
+    Returns:
+        Sniffed(compression, delimiter). compression is one of bgzf, gzip,
+        bz2, xz, zstd or None for uncompressed. delimiter is None if no
+        delimiter splits the lines consistently.
+    """
+    stat = os.stat(filename)
+    return _sniff(str(filename), stat.st_size, stat.st_mtime_ns, comment)
+
+
+@lru_cache(maxsize=256)
+def _sniff(filename: str, size: int, mtime_ns: int, comment: Union[str, None]) -> Sniffed:
+    compression = sniff_compression(filename)
+    try:
+        with open_decompressed(filename, compression) as fh:
+            sample = fh.read(SNIFF_SIZE)
+    except (OSError, EOFError, ImportError, lzma.LZMAError):
+        return Sniffed(compression, None)
+    return Sniffed(compression, sniff_delimiter(sample.decode("utf-8", errors="replace"), comment))
+
+
+def sniff_compression(filename: Union[Path, str]) -> Union[str, None]:
+    with open(filename, "rb") as fh:
+        return compression_of(fh.read(18))
+
+
+def compression_of(head: bytes) -> Union[str, None]:
+    """Compression given the first 18 bytes of a file"""
+    for magic, compression in MAGIC:
+        if head.startswith(magic):
+            if compression == "gzip" and len(head) >= 18 and head[3] & 4 and head[12:14] == b"BC":
+                return "bgzf"
+            return compression
+    return None
+
+
+def sniff_columnar(filename: Union[Path, str]) -> Union[str, None]:
+    """Columnar format of a file: parquet, arrow (IPC file, also
+    known as Feather V2), feather (V1) or None for anything else.
+    """
+    with open(filename, "rb") as fh:
+        return columnar_of(fh.read(6))
+
+
+def columnar_of(head: bytes) -> Union[str, None]:
+    for magic, columnar in COLUMNAR_MAGIC:
+        if head.startswith(magic):
+            return columnar
+    return None
+
+
+def sniff_delimiter(sample: str, comment: str = None) -> Union[str, None]:
+    """Delimiter splitting every complete line of the sample into the
+    same number (more than one) of values. Tab, comma, semicolon and
+    pipe are tried in turn, then whitespace: a single space if the
+    values are separated by exactly one space, else a run of whitespace.
+
+    Arguments:
+        sample -- start of the decompressed file
+
+    Keyword Arguments:
+        comment -- prefix of comment lines to ignore (default: {None})
+
+    Returns:
+        delimiter or None
+    """
+    lines = sample.splitlines()
+    if len(sample) >= SNIFF_SIZE and lines:
+        lines.pop()
+    lines = [line for line in lines
+             if line.strip() and not (comment and line.startswith(comment))][:SNIFF_LINES]
+    if not lines:
+        return None
+    for delimiter in DELIMITERS:
+        counts = {len(next(csv.reader([line], delimiter=delimiter))) for line in lines}
+        if len(counts) == 1 and counts.pop() > 1:
+            return delimiter
+    counts = {len(line.split()) for line in lines}
+    if len(counts) == 1 and counts.pop() > 1:
+        if all(line == line.strip() and len(line.split(" ")) == len(line.split()) for line in lines):
+            return " "
+        return WHITESPACE
+    return None
+
+
+@contextmanager
+def open_decompressed(filename: Union[Path, str], compression: Union[str, None]):
+    """Binary file object of the decompressed data"""
+    if compression in ("gzip", "bgzf"):
+        fh = gzip.open(filename, "rb")
+    elif compression == "bz2":
+        fh = bz2.open(filename, "rb")
+    elif compression == "xz":
+        fh = lzma.open(filename, "rb")
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading zstd compressed files needs the zstandard package: pip install zstandard")
+        raw = open(filename, "rb")
+        fh = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+    else:
+        fh = open(filename, "rb")
+    with fh:
+        yield fh
+
+
+class DecompressingSource:
+    """petl read source for a file of any sniffed compression"""
+    def __init__(self, filename: Union[Path, str], compression: Union[str, None]) -> None:
+        self.filename = str(filename)
+        self.compression = compression
+
+    @contextmanager
+    def open(self, mode: str):
+        with open_decompressed(self.filename, self.compression) as fh:
+            yield fh
@@ -0,0 +1,129 @@
+"""
+External merge sort of a petl table by chromosome and
+base_pair_location under a fixed memory budget.
+
+Rows are buffered until their estimated size reaches the budget,
+then sorted and spilled to a binary run file (a stream of pickled
+(key, row) records) in a temporary directory. The runs are k-way
+merged with heapq.merge, which is stable, so rows with the same
+position keep their input order.
+"""
+
+import heapq
+import os
+import pickle
+import sys
+import tempfile
+from itertools import count
+from operator import itemgetter
+from pathlib import Path
+from typing import Iterator, Union
+
+import petl as etl
+
+
+DEFAULT_MEMORY_BUDGET = 1024 * 1024 * 1024
+RUN_FAN_IN = 128
+CHROMOSOME_RANKS = {"X": 23, "Y": 24, "MT": 25, "M": 25}
+UNKNOWN_CHROMOSOME_RANK = 1000
+
+
+def position_key(chromosome, base_pair_location) -> tuple:
+    """Sort key for a row position. Chromosomes sort numerically,
+    then X, Y and MT, then any other name; rows with a base pair
+    location that is not an integer sort last on their chromosome.
+
+    Arguments:
+        chromosome -- chromosome value
+        base_pair_location -- base pair location value
+
+    Returns:
+        (chromosome rank, chromosome, position)
+    """
+    chromosome = str(chromosome)
+    name = chromosome[3:] if chromosome[:3].lower() == "chr" else chromosome
+    if name.isdigit():
+        rank = int(name)
+    else:
+        rank = CHROMOSOME_RANKS.get(name.upper(), UNKNOWN_CHROMOSOME_RANK)
+    try:
+        position = int(base_pair_location)
+    except (TypeError, ValueError):
+        position = sys.maxsize
+    return rank, chromosome, position
+
+
+def _row_size(row: tuple) -> int:
+    return sys.getsizeof(row) + sum(map(sys.getsizeof, row))
+
+
+class ExternalSortView(etl.Table):
+    """petl view of a table sorted by chromosome and base_pair_location.
+    The sort runs each time the view is iterated past the header.
+    """
+    def __init__(self,
+                 source: etl.Table,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 tempdir: Union[Path, str, None] = None) -> None:
+        self.source = source
+        self.memory_budget = memory_budget
+        self.tempdir = tempdir
+
+    def __iter__(self) -> Iterator[tuple]:
+        rows = iter(self.source)
+        header = tuple(next(rows))
+        yield header
+        chr_index = header.index("chromosome")
+        bp_index = header.index("base_pair_location")
+        with tempfile.TemporaryDirectory(prefix="gwas-ssf-sort-", dir=self.tempdir) as run_dir:
+            run_names = count()
+            runs = []
+            buffer = []
+            buffer_size = 0
+            for row in rows:
+                row = tuple(row)
+                buffer.append((position_key(row[chr_index], row[bp_index]), row))
+                buffer_size += _row_size(row)
+                if buffer_size >= self.memory_budget:
+                    runs.append(_spill(buffer, run_dir, next(run_names)))
+                    buffer = []
+                    buffer_size = 0
+            if not runs:
+                buffer.sort(key=itemgetter(0))
+                yield from (row for _, row in buffer)
+                return
+            if buffer:
+                runs.append(_spill(buffer, run_dir, next(run_names)))
+            del buffer
+            while len(runs) > RUN_FAN_IN:
+                merged = _write_run(_merge(runs[:RUN_FAN_IN]), run_dir, next(run_names))
+                for run in runs[:RUN_FAN_IN]:
+                    os.remove(run)
+                runs = [merged] + runs[RUN_FAN_IN:]
+            yield from (row for _, row in _merge(runs))
+
+
+def _spill(buffer: list, run_dir: str, name: int) -> str:
+    buffer.sort(key=itemgetter(0))
+    return _write_run(buffer, run_dir, name)
+
+
+def _write_run(records, run_dir: str, name: int) -> str:
+    path = os.path.join(run_dir, f"run{name}.bin")
+    with open(path, "wb") as fh:
+        for record in records:
+            pickle.dump(record, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_run(path: str) -> Iterator[tuple]:
+    with open(path, "rb") as fh:
+        while True:
+            try:
+                yield pickle.load(fh)
+            except EOFError:
+                return
+
+
+def _merge(runs: list) -> Iterator[tuple]:
+    return heapq.merge(*[_read_run(run) for run in runs], key=itemgetter(0))
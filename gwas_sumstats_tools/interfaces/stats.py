@@ -0,0 +1,243 @@
+"""
+Summary statistics of a sumstats table: rows per chromosome, the
+minimum p-value, counts of significant hits, lambda GC and the
+minor allele frequency spectrum.
+
+A chunk of the table is summarised into a SumStats of counts and
+histograms, which merge by addition, so chunks can be summarised in
+any order, in separate processes, and merged at the end. Lambda GC
+is the median chi-squared statistic over its expected median, with
+the median p-value taken from a histogram of P_BINS bins,
+interpolating within the bin it falls in.
+"""
+
+import io
+import math
+from collections import Counter
+from pathlib import Path
+from statistics import NormalDist
+from typing import Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+from gwas_sumstats_tools.interfaces.partition import Partition, read_partition
+
+
+P_BINS = 1 << 16
+CHI2_MEDIAN = 0.454936423119572
+SIGNIFICANCE_THRESHOLDS = (5e-8, 1e-5)
+MAF_BINS = (0, 0.001, 0.01, 0.05, 0.1, 0.2, 0.3, 0.4, 0.5)
+NEG_LOG10_P_FIELD = "neg_log_10_p_value"
+STATS_FIELDS = ("chromosome", "p_value", NEG_LOG10_P_FIELD, "effect_allele_frequency")
+_MANTISSA_EXPONENT = r"^\s*([0-9.]+)[eE]([-+]?[0-9]+)\s*$"
+
+
+def log10_p(values: pd.Series, neg_log10: bool = False) -> np.ndarray:
+    """log10 of p-values, NaN where missing. p-values too small for a
+    float, e.g. 1e-400, are taken from their mantissa and exponent.
+    """
+    numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+    if neg_log10:
+        return -numbers
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logs = np.log10(numbers)
+    underflow = numbers == 0
+    if underflow.any() and values.dtype == object:
+        parts = values[underflow].str.extract(_MANTISSA_EXPONENT)
+        with np.errstate(divide="ignore"):
+            small = (np.log10(pd.to_numeric(parts[0], errors="coerce").to_numpy(dtype=float))
+                     + pd.to_numeric(parts[1], errors="coerce").to_numpy(dtype=float))
+        logs[underflow] = np.where(np.isnan(small), -np.inf, small)
+    return logs
+
+
+def _format_p(log10: float) -> str:
+    if log10 == -math.inf:
+        return "0"
+    if log10 > -300:
+        return f"{10 ** log10:.6g}"
+    exponent = math.floor(log10)
+    return f"{10 ** (log10 - exponent):.6g}e{exponent}"
+
+
+def _chromosome_order(chromosome: str) -> tuple:
+    return (0, int(chromosome), "") if chromosome.isdigit() else (1, 0, chromosome)
+
+
+class SumStats:
+    """Mergeable summary of the chromosome, p-value and effect allele
+    frequency fields of a sumstats table.
+    """
+    def __init__(self,
+                 p_value_field: str = "p_value",
+                 thresholds: Iterable[float] = SIGNIFICANCE_THRESHOLDS) -> None:
+        self.p_value_field = p_value_field
+        self.thresholds = tuple(thresholds)
+        self.nrows = 0
+        self.chromosomes = Counter()
+        self.p_seen = False
+        self.p_valid = 0
+        self.min_log10_p = math.inf
+        self.significant = np.zeros(len(self.thresholds), dtype=np.int64)
+        self.p_histogram = np.zeros(P_BINS, dtype=np.int64)
+        self.eaf_valid = 0
+        self.eaf_seen = False
+        self.maf_histogram = np.zeros(len(MAF_BINS) - 1, dtype=np.int64)
+
+    def update(self, df: pd.DataFrame) -> "SumStats":
+        """Add the rows of a dataframe with the fields as columns
+
+        Arguments:
+            df -- chunk of the sumstats table
+
+        Returns:
+            self
+        """
+        self.nrows += len(df)
+        if "chromosome" in df:
+            counts = df["chromosome"].fillna("#NA").astype(str).value_counts()
+            self.chromosomes.update(dict(zip(counts.index, counts.to_numpy().tolist())))
+        if self.p_value_field in df:
+            self.p_seen = True
+            logs = log10_p(df[self.p_value_field], neg_log10=self.p_value_field == NEG_LOG10_P_FIELD)
+            logs = logs[logs <= 0]
+            self.p_valid += len(logs)
+            if len(logs):
+                self.min_log10_p = min(self.min_log10_p, float(logs.min()))
+                self.significant += np.array([np.count_nonzero(logs < math.log10(threshold))
+                                              for threshold in self.thresholds], dtype=np.int64)
+                bins = np.minimum((np.power(10.0, logs) * P_BINS).astype(np.int64), P_BINS - 1)
+                self.p_histogram += np.bincount(bins, minlength=P_BINS)
+        if "effect_allele_frequency" in df:
+            self.eaf_seen = True
+            frequencies = pd.to_numeric(df["effect_allele_frequency"], errors="coerce").to_numpy(dtype=float)
+            frequencies = frequencies[(frequencies >= 0) & (frequencies <= 1)]
+            self.eaf_valid += len(frequencies)
+            self.maf_histogram += np.histogram(np.minimum(frequencies, 1 - frequencies), bins=MAF_BINS)[0]
+        return self
+
+    def merge(self, other: "SumStats") -> "SumStats":
+        """Add the counts of another summary of the same fields
+
+        Arguments:
+            other -- SumStats of other rows
+
+        Returns:
+            self
+        """
+        if (other.p_value_field, other.thresholds) != (self.p_value_field, self.thresholds):
+            raise ValueError("Cannot merge summaries of different p-value fields or thresholds")
+        self.nrows += other.nrows
+        self.chromosomes.update(other.chromosomes)
+        self.p_seen = self.p_seen or other.p_seen
+        self.p_valid += other.p_valid
+        self.min_log10_p = min(self.min_log10_p, other.min_log10_p)
+        self.significant += other.significant
+        self.p_histogram += other.p_histogram
+        self.eaf_valid += other.eaf_valid
+        self.eaf_seen = self.eaf_seen or other.eaf_seen
+        self.maf_histogram += other.maf_histogram
+        return self
+
+    def median_p(self) -> Union[float, None]:
+        if not self.p_valid:
+            return None
+        cumulative = np.cumsum(self.p_histogram)
+        half = self.p_valid / 2
+        index = int(np.searchsorted(cumulative, half))
+        below = int(cumulative[index - 1]) if index else 0
+        return (index + (half - below) / int(self.p_histogram[index])) / P_BINS
+
+    def lambda_gc(self) -> Union[float, None]:
+        median = self.median_p()
+        if median is None:
+            return None
+        if median <= 0:
+            return math.inf
+        return NormalDist().inv_cdf(1 - median / 2) ** 2 / CHI2_MEDIAN
+
+    def to_dict(self) -> dict:
+        """The summary as a JSON serialisable dict"""
+        summary = {"rows": self.nrows,
+                   "chromosomes": {chromosome: self.chromosomes[chromosome]
+                                   for chromosome in sorted(self.chromosomes, key=_chromosome_order)}}
+        if self.p_seen:
+            lambda_gc = self.lambda_gc()
+            summary[self.p_value_field] = {
+                "values": self.p_valid,
+                "missing": self.nrows - self.p_valid,
+                "minimum_p_value": _format_p(self.min_log10_p) if self.p_valid else None,
+                "significant": {f"p < {threshold:g}": int(count)
+                                for threshold, count in zip(self.thresholds, self.significant)},
+                "lambda_gc": round(lambda_gc, 4) if lambda_gc is not None else None}
+        if self.eaf_seen:
+            summary["effect_allele_frequency"] = {
+                "values": self.eaf_valid,
+                "missing": self.nrows - self.eaf_valid,
+                "minor_allele_frequency": {f"{low:g}-{high:g}": int(count)
+                                           for low, high, count
+                                           in zip(MAF_BINS, MAF_BINS[1:], self.maf_histogram)}}
+        return summary
+
+
+def stats_fields(header: tuple) -> list:
+    """Fields of the header that are summarised"""
+    return [field for field in header if field in STATS_FIELDS]
+
+
+def partition_stats(filename: Union[Path, str],
+                    part: Partition,
+                    header: tuple,
+                    delimiter: str = "\t",
+                    removecomments: str = None,
+                    p_value_field: str = "p_value",
+                    thresholds: Iterable[float] = SIGNIFICANCE_THRESHOLDS,
+                    na_values: Iterable[str] = ("", "#NA")) -> SumStats:
+    """Summary of the rows of a partition of a delimited file
+
+    Arguments:
+        filename -- sumstats file
+        part -- Partition of the file
+        header -- header of the file
+
+    Keyword Arguments:
+        delimiter -- field delimiter, a regex if longer than one character (default: {"\t"})
+        removecomments -- prefix of comment lines (default: {None})
+        p_value_field -- p-value field (default: {"p_value"})
+        thresholds -- p-value thresholds of significance (default: {SIGNIFICANCE_THRESHOLDS})
+        na_values -- values read as missing (default: {("", "#NA")})
+
+    Returns:
+        SumStats
+    """
+    summary = SumStats(p_value_field=p_value_field, thresholds=thresholds)
+    usecols = stats_fields(header)
+    comment = removecomments.encode() if removecomments else None
+    header_pending = part.start == 0
+    for chunk in read_partition(filename, part):
+        if comment and (chunk.startswith(comment) or b"\n" + comment in chunk):
+            chunk = b"".join(line for line in chunk.splitlines(keepends=True) if not line.startswith(comment))
+        if header_pending:
+            chunk, header_pending = _drop_header(chunk)
+        if not chunk.strip():
+            continue
+        df = pd.read_csv(io.BytesIO(chunk),
+                         sep=delimiter,
+                         header=None,
+                         names=list(header),
+                         usecols=usecols,
+                         dtype=str,
+                         na_values=list(na_values),
+                         engine="c" if len(delimiter) == 1 else "python")
+        summary.update(df)
+    return summary
+
+
+def _drop_header(chunk: bytes) -> tuple:
+    """Chunk without its first non-blank line, and whether it is still to come"""
+    lines = chunk.split(b"\n")
+    for index, line in enumerate(lines):
+        if line.strip():
+            return b"\n".join(lines[index + 1:]), False
+    return b"", True
@@ -0,0 +1,165 @@
+"""
+Tabix (.tbi) index https://samtools.github.io/hts-specs/tabix.pdf
+
+The index is built while the rows of a BGZF file are written.
+Offsets are collected as BgzfWriter positions and converted to
+virtual offsets once the file is closed and the compressed
+offsets of all the blocks are known.
+"""
+
+import struct
+from pathlib import Path
+from typing import Callable, Union
+
+from gwas_sumstats_tools.interfaces.bgzf import BgzfWriter
+
+
+TBI_MAGIC = b"TBI\1"
+TBI_PSEUDO_BIN = 37450
+TBI_LINEAR_SHIFT = 14
+
+
+def reg2bin(beg: int, end: int) -> int:
+    """UCSC bin of a 0-based, half-open interval
+
+    Arguments:
+        beg -- start
+        end -- end
+
+    Returns:
+        bin number
+    """
+    end -= 1
+    if beg >> 14 == end >> 14:
+        return ((1 << 15) - 1) // 7 + (beg >> 14)
+    if beg >> 17 == end >> 17:
+        return ((1 << 12) - 1) // 7 + (beg >> 17)
+    if beg >> 20 == end >> 20:
+        return ((1 << 9) - 1) // 7 + (beg >> 20)
+    if beg >> 23 == end >> 23:
+        return ((1 << 6) - 1) // 7 + (beg >> 23)
+    if beg >> 26 == end >> 26:
+        return ((1 << 3) - 1) // 7 + (beg >> 26)
+    return 0
+
+
+class _Reference:
+    def __init__(self, start: tuple) -> None:
+        self.bins = {}
+        self.linear = []
+        self.first = start
+        self.last = start
+        self.n_mapped = 0
+
+
+class TabixIndexer:
+    """Build a generic tabix index for a coordinate sorted,
+    BGZF compressed, delimited file with a header line.
+
+    Rows are added in file order with add(). If a row is out of
+    order or has no usable coordinates, the index is abandoned
+    and the reason is kept in self.message.
+    """
+    def __init__(self,
+                 col_seq: int = 1,
+                 col_beg: int = 2,
+                 col_end: int = 2,
+                 meta_char: str = "#",
+                 skip_lines: int = 1) -> None:
+        self.col_seq = col_seq
+        self.col_beg = col_beg
+        self.col_end = col_end
+        self.meta_char = meta_char
+        self.skip_lines = skip_lines
+        self.names = []
+        self.references = []
+        self.is_sorted = True
+        self.message = None
+        self._last_pos = 0
+
+    def add(self, chromosome: str, position: Union[str, int], start: tuple, end: tuple) -> bool:
+        """Add a row to the index
+
+        Arguments:
+            chromosome -- chromosome value of the row
+            position -- 1-based base pair location of the row
+            start -- writer position at the start of the row
+            end -- writer position at the end of the row
+
+        Returns:
+            False once the index has been abandoned
+        """
+        if not self.is_sorted:
+            return False
+        try:
+            position = int(position)
+        except (TypeError, ValueError):
+            return self._abandon(f"base_pair_location '{position}' is not an integer")
+        if position < 1:
+            return self._abandon(f"base_pair_location '{position}' is not positive")
+        chromosome = str(chromosome)
+        if not self.names or chromosome != self.names[-1]:
+            if chromosome in self.names:
+                return self._abandon(f"chromosome {chromosome} is not contiguous")
+            self.names.append(chromosome)
+            self.references.append(_Reference(start))
+            self._last_pos = 0
+        elif position < self._last_pos:
+            return self._abandon(f"chromosome {chromosome} is not sorted by base_pair_location")
+        self._last_pos = position
+        reference = self.references[-1]
+        beg, stop = position - 1, position
+        chunks = reference.bins.setdefault(reg2bin(beg, stop), [])
+        if chunks and chunks[-1][1] == start:
+            chunks[-1][1] = end
+        else:
+            chunks.append([start, end])
+        window = beg >> TBI_LINEAR_SHIFT
+        if window >= len(reference.linear):
+            reference.linear.extend([None] * (window + 1 - len(reference.linear)))
+        if reference.linear[window] is None:
+            reference.linear[window] = start
+        reference.last = end
+        reference.n_mapped += 1
+        return True
+
+    def to_file(self, filename: Union[Path, str], virtual_offset: Callable) -> None:
+        """Write the BGZF compressed index
+
+        Arguments:
+            filename -- index file name, usually <data file>.tbi
+            virtual_offset -- converts an add() position to a virtual offset
+        """
+        with BgzfWriter(filename) as writer:
+            writer.write(self._serialise(virtual_offset))
+
+    def _serialise(self, virtual_offset: Callable) -> bytes:
+        names = b"".join(name.encode() + b"\0" for name in self.names)
+        out = [TBI_MAGIC,
+               struct.pack("<8i", len(self.names), 0, self.col_seq, self.col_beg,
+                           self.col_end, ord(self.meta_char), self.skip_lines, len(names)),
+               names]
+        for reference in self.references:
+            out.append(struct.pack("<i", len(reference.bins) + 1))
+            for bin_number in sorted(reference.bins):
+                chunks = reference.bins[bin_number]
+                out.append(struct.pack("<Ii", bin_number, len(chunks)))
+                for beg, end in chunks:
+                    out.append(struct.pack("<QQ", virtual_offset(beg), virtual_offset(end)))
+            out.append(struct.pack("<Ii", TBI_PSEUDO_BIN, 2))
+            out.append(struct.pack("<QQQQ", virtual_offset(reference.first),
+                                   virtual_offset(reference.last), reference.n_mapped, 0))
+            out.append(struct.pack("<i", len(reference.linear)))
+            previous = 0
+            for offset in reference.linear:
+                previous = virtual_offset(offset) if offset is not None else previous
+                out.append(struct.pack("<Q", previous))
+        out.append(struct.pack("<Q", 0))
+        return b"".join(out)
+
+    def _abandon(self, message: str) -> bool:
+        self.is_sorted = False
+        self.message = message
+        self.names = []
+        self.references = []
+        return False
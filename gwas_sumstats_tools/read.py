@@ -1,13 +1,19 @@
 from pathlib import Path
-from typing import Union
+from typing import TYPE_CHECKING, Union
 import yaml
 import petl as etl
 
-from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
-from gwas_sumstats_tools.interfaces.metadata import (MetadataClient,
-                                                     SumStatsMetadata)
+from gwas_sumstats_tools.interfaces.delimited import project
+from gwas_sumstats_tools.interfaces.preview import DEFAULT_PREVIEW_ROWS, read_preview
 from gwas_sumstats_tools.utils import exit_if_no_data
 
+# The data table (pandas), the metadata (pydantic) and the indexes
+# (numpy) are imported where they are used, so that previewing a file
+# or reading its header does not load them.
+if TYPE_CHECKING:
+    from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+    from gwas_sumstats_tools.interfaces.metadata import MetadataClient, SumStatsMetadata
+
 
 class Reader():
     """Class for reading summary statistics data tables
@@ -17,7 +23,8 @@ class Reader():
                  sumstats_file: Path = None,
                  delimiter: str = None,
                  remove_comments: str = None,
-                 metadata_file: Path = None) -> None:
+                 metadata_file: Path = None,
+                 columns: list = None) -> None:
         if not metadata_file and isinstance(sumstats_file, Path):
             metadata_file = sumstats_file.with_suffix(sumstats_file.suffix + "-meta.yaml")
 
@@ -25,11 +32,51 @@ class Reader():
         
         self.removecomments = remove_comments if remove_comments else None
 
-        self.data = SumStatsTable(sumstats_file=sumstats_file, delimiter=self.delimiter, removecomments=self.removecomments) if sumstats_file else None
-        
-        self.meta = MetadataClient(in_file=metadata_file) if metadata_file else None
+        self.sumstats_file = sumstats_file
+        self.columns = list(columns) if columns else None
+        self._data = None
+        self._columns_data = None
+
+        self.metadata_file = metadata_file
+        self._meta = None
+
+    @property
+    def meta(self) -> Union["MetadataClient", None]:
+        """The metadata client, only created when first needed"""
+        if self._meta is None and self.metadata_file:
+            from gwas_sumstats_tools.interfaces.metadata import MetadataClient
+            self._meta = MetadataClient(in_file=self.metadata_file)
+        return self._meta
+
+    @property
+    def data(self) -> Union["SumStatsTable", None]:
+        """The sumstats table, only opened when first needed"""
+        if self._data is None and self.sumstats_file:
+            from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+            self._data = SumStatsTable(sumstats_file=self.sumstats_file, delimiter=self.delimiter, removecomments=self.removecomments)
+        return self._data
+
+    @property
+    def columns_data(self) -> Union["SumStatsTable", None]:
+        """The sumstats table reading only self.columns, if given, for
+        reading rows straight from the file. The indexes need the whole
+        header, so they use self.data.
 
-    def file_header(self) -> Union[SumStatsTable.header, None]:
+        Raises:
+            ValueError if a column is not in the file
+        """
+        if not self.columns or not self.data:
+            return self.data
+        if self._columns_data is None:
+            from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+            project(self.data.header(), self.columns)
+            self._columns_data = SumStatsTable(sumstats_file=self.sumstats_file,
+                                               delimiter=self.data.delimiter,
+                                               removecomments=self.removecomments,
+                                               columns=self.columns)
+        return self._columns_data
+
+    def file_header(self) -> Union[tuple, None]:
         """Get the file header
 
         Returns:
@@ -40,7 +87,7 @@ class Reader():
         else:
             return None
 
-    def metadata_model(self, **kwargs) -> Union[SumStatsMetadata, None]:
+    def metadata_model(self, **kwargs) -> Union["SumStatsMetadata", None]:
         """Get the metadata model
 
         Keyword Arguments:
@@ -76,16 +123,127 @@ class Reader():
         return metadata_dict
 
     def head(self, **kwargs) -> Union[etl.Table, None]:
-        """Head of data file
+        """Head of data file, only self.columns if given
 
         Returns:
             etl.Table
         """
         if self.data:
-            return self.data.head_table(**kwargs)
+            return self.columns_data.head_table(**kwargs)
         else:
             return None
 
+    def preview(self, nrows: int = DEFAULT_PREVIEW_ROWS) -> Union[etl.Table, None]:
+        """Header and first rows of the data file, from a single bounded
+        read of the start of the file, see read_preview. Parquet and Arrow
+        files, and files with no delimiter found, are read as a table.
+
+        Keyword Arguments:
+            nrows -- Number of rows (default: {10})
+
+        Returns:
+            etl.Table or None if there is no data
+        """
+        if not self.sumstats_file:
+            return None
+        preview = read_preview(self.sumstats_file,
+                               nrows=nrows,
+                               delimiter=self.delimiter,
+                               removecomments=self.removecomments)
+        if preview.columnar or preview.delimiter is None:
+            return self.head(nrows=nrows) if self.data.sumstats is not None else None
+        if not preview.header:
+            return None
+        return self._project(etl.wrap([preview.header] + preview.rows))
+
+    def region(self, region: str) -> Union[etl.Table, None]:
+        """Rows of the data file in a region, read through the tabix
+        index or the coordinate index of the file, see RegionView.
+        Parquet and Arrow files are filtered as they are read.
+
+        Arguments:
+            region -- chromosome:start-end, 1-based and inclusive
+
+        Returns:
+            etl.Table
+        """
+        if not self.data:
+            return None
+        from gwas_sumstats_tools.interfaces.region import RegionView, parse_region
+        region = parse_region(region)
+        if not {"chromosome", "base_pair_location"}.issubset(self.data.header()):
+            raise ValueError("A region needs the chromosome and base_pair_location fields")
+        if self.data.columnar:
+            return etl.select(self.data.sumstats,
+                              lambda row: region.contains(row["chromosome"], row["base_pair_location"]))
+        return self._project(RegionView(self.data.filename,
+                                        region=region,
+                                        header=self.data.header(),
+                                        delimiter=self.data.delimiter,
+                                        removecomments=self.data.removecomments))
+
+    def rsids(self, rsids: list) -> Union[etl.Table, None]:
+        """Rows of the data file with the given rsIDs, read through
+        the rsID index of the file, see RsidView. Parquet and Arrow
+        files are filtered as they are read.
+
+        Arguments:
+            rsids -- rsIDs, e.g. ['rs123']
+
+        Returns:
+            etl.Table
+        """
+        if not self.data:
+            return None
+        from gwas_sumstats_tools.interfaces.rsid_index import RsidView, rsid_field
+        field = rsid_field(self.data.header())
+        if self.data.columnar:
+            wanted = {rsid.lower() for rsid in rsids}
+            return etl.select(self.data.sumstats, lambda row: row[field].lower() in wanted)
+        return self._project(RsidView(self.data.filename,
+                                      rsids=rsids,
+                                      header=self.data.header(),
+                                      delimiter=self.data.delimiter,
+                                      removecomments=self.data.removecomments))
+
+    def _project(self, table: etl.Table) -> etl.Table:
+        """Only self.columns of table, if given"""
+        if not self.columns:
+            return table
+        project(etl.header(table), self.columns)
+        return etl.cut(table, *self.columns)
+
+    def count_rows(self, workers: int = 1) -> Union[int, None]:
+        """Count the data rows of the file without parsing them
+
+        Keyword Arguments:
+            workers -- processes to count parts of BGZF or uncompressed files in (default: {1})
+
+        Returns:
+            number of rows
+        """
+        if not self.data:
+            return None
+        return self.data.count_rows(workers=workers)
+
+    def index_rsids(self) -> tuple[Path, int, int]:
+        """Build the rsID index of the data file
+
+        Returns:
+            (index file, rows indexed, rows in the file)
+        """
+        from gwas_sumstats_tools.interfaces.rsid_index import build_rsid_index
+        return build_rsid_index(self.data.filename,
+                                header=self.data.header(),
+                                delimiter=self.data.delimiter,
+                                removecomments=self.data.removecomments)
+
+
+def read_rsid_file(rsid_file: Path) -> list:
+    """rsIDs listed one per line, or as the first field of each line"""
+    with open(rsid_file) as fh:
+        return [line.split()[0] for line in fh if line.strip()]
+
 
 def read(filename: Path,
          metadata_infile: Path = None,
@@ -93,7 +251,12 @@ def read(filename: Path,
          get_all_metadata: bool = False,
          get_metadata: list = None,
          remove_comments: str = None,
-         delimiter: str = None):
+         delimiter: str = None,
+         region: str = None,
+         rsids: list = None,
+         columns: list = None,
+         count: bool = False,
+         workers: int = 1):
     """Driver function for the Reader class
 
     Arguments:
@@ -104,6 +267,11 @@ def read(filename: Path,
         get_header -- return the header (default: {False})
         get_all_metadata -- return all the metadata  (default: {False})
         get_metadata -- return the metadata fields specified in this list (default: {None})
+        region -- return the rows in this region, chromosome:start-end (default: {None})
+        rsids -- return the rows with these rsIDs (default: {None})
+        columns -- only return these columns of the data (default: {None, which means all columns})
+        count -- return the number of data rows (default: {False})
+        workers -- processes to count the rows of BGZF or uncompressed files in (default: {1})
 
     Returns:
         _description_
@@ -111,17 +279,31 @@ def read(filename: Path,
     reader = Reader(sumstats_file=filename,
                     delimiter=delimiter,
                     remove_comments=remove_comments,
-                    metadata_file=metadata_infile)
+                    metadata_file=metadata_infile,
+                    columns=columns)
+    if count:
+        exit_if_no_data(reader.data.sumstats)
+        message = "[bold]\n#-------- SUMSTATS ROW COUNT --------#\n[/bold]"
+        return (reader.count_rows(workers=workers), message)
+    if get_header or not any([get_all_metadata, get_metadata, region, rsids]):
+        # served from one bounded read of the start of the file
+        preview = reader.preview()
+        exit_if_no_data(preview)
+        if get_header:
+            message = "[bold]\n#-------- SUMSTATS HEADERS --------#\n[/bold]"
+            return (etl.header(preview), message)
+        message = "[bold]\n#-------- SUMSTATS DATA PREVIEW --------#\n[/bold]"
+        return (preview, message)
     exit_if_no_data(reader.data.sumstats)
-    if get_header:
-        message = "[bold]\n#-------- SUMSTATS HEADERS --------#\n[/bold]"
-        return (reader.file_header(), message)
     if get_all_metadata:
         message = "[bold]\n#-------- SUMSTATS METADATA --------#\n[/bold]"
         return (yaml.dump(reader.metadata_dict()), message)
     if get_metadata:
         message = "[bold]\n#-------- SUMSTATS METADATA --------#\n[/bold]"
         return (yaml.dump(reader.metadata_dict(include=get_metadata)), message)
-    if not any([get_header, get_all_metadata, get_metadata]):
-        message = "[bold]\n#-------- SUMSTATS DATA PREVIEW --------#\n[/bold]"
-        return (reader.head(), message)
+    if region:
+        message = f"[bold]\n#-------- SUMSTATS DATA IN {region} --------#\n[/bold]"
+        return (reader.region(region), message)
+    if rsids:
+        message = f"[bold]\n#-------- SUMSTATS DATA FOR {len(rsids)} RSIDS --------#\n[/bold]"
+        return (reader.rsids(rsids), message)
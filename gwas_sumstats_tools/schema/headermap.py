@@ -1,4 +1,3 @@
-"""
 known_header_transformations = {
 
     #rsid
@@ -101,8 +100,8 @@ known_header_transformations = {
     'bcac_icogs1_or': 'odds_ratio',
     'OR': 'odds_ratio',
     # or range
-    'L95': 'ci_upper',
-    'U95': 'ci_lower',
+    'L95': 'ci_lower',
+    'U95': 'ci_upper',
     'orlower': 'ci_lower',
     'orupper': 'ci_upper',
     'l95': 'ci_lower',
@@ -264,7 +263,6 @@ known_header_transformations = {
     # info
     'info': 'info',   
 }
-"""
 
 header_mapper = {
 
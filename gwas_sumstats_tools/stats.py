@@ -0,0 +1,62 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from pathlib import Path
+
+from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+from gwas_sumstats_tools.interfaces.partition import partition
+from gwas_sumstats_tools.interfaces.stats import (NEG_LOG10_P_FIELD,
+                                                  SIGNIFICANCE_THRESHOLDS,
+                                                  SumStats,
+                                                  partition_stats,
+                                                  stats_fields)
+from gwas_sumstats_tools.utils import exit_if_no_data
+
+
+def stats(filename: Path,
+          workers: int = 1,
+          thresholds: tuple = SIGNIFICANCE_THRESHOLDS,
+          remove_comments: str = None,
+          delimiter: str = None,
+          chunksize: int = 1_000_000) -> dict:
+    """Driver function for summarising a sumstats file in one pass
+
+    Arguments:
+        filename -- sumstats filename
+
+    Keyword Arguments:
+        workers -- processes to summarise parts of BGZF or uncompressed files in (default: {1})
+        thresholds -- p-value thresholds of significance (default: {(5e-8, 1e-5)})
+        remove_comments -- prefix of comment lines (default: {None})
+        delimiter -- field delimiter, detected if not given (default: {None})
+        chunksize -- rows in memory at once for Parquet and Arrow files (default: {1_000_000})
+
+    Returns:
+        summary dict
+    """
+    delimiter = delimiter.encode().decode('unicode_escape') if delimiter else None
+    table = SumStatsTable(sumstats_file=filename, delimiter=delimiter, removecomments=remove_comments)
+    exit_if_no_data(table.sumstats)
+    header = table.header()
+    p_value_field = NEG_LOG10_P_FIELD if NEG_LOG10_P_FIELD in header and "p_value" not in header else "p_value"
+    if table.columnar:
+        summary = SumStats(p_value_field=p_value_field, thresholds=thresholds)
+        for df in table.as_pd_df(chunksize=chunksize, usecols=stats_fields(header)):
+            summary.update(df)
+        return summary.to_dict()
+    parts = partition(filename, workers)
+    options = dict(header=header,
+                   delimiter=table.delimiter,
+                   removecomments=remove_comments,
+                   p_value_field=p_value_field,
+                   thresholds=thresholds,
+                   na_values=table.NA_VALUES)
+    if len(parts) == 1:
+        return partition_stats(filename, parts[0], **options).to_dict()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        summaries = list(executor.map(_partition_stats, [(filename, part, options) for part in parts]))
+    return reduce(SumStats.merge, summaries).to_dict()
+
+
+def _partition_stats(args: tuple) -> SumStats:
+    filename, part, options = args
+    return partition_stats(filename, part, **options)
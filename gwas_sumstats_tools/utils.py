@@ -1,13 +1,16 @@
+import io
+import os
 import re
+import json
 import hashlib
-import requests
 import logging
-from typing import Any, Optional, Union
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
 from pathlib import Path
 import typer
 import petl as etl
 from rich import print
-from requests.adapters import HTTPAdapter, Retry
 import importlib.metadata
 
 
@@ -64,6 +67,10 @@ def download_with_requests(url,
     Return:
         Content from URL if status code is 200 or None
     """
+    # requests is only needed here, and is slow to import
+    import requests
+    from requests.adapters import HTTPAdapter, Retry
+
     if headers is None:
         headers = {}
 
@@ -103,6 +110,111 @@ def get_md5sum(file: Path) -> str:
     return hash_md5.hexdigest()
 
 
+class HashingWriter(io.RawIOBase):
+    """Binary writer computing the md5sum of
+    the bytes written through it to fh.
+    """
+    def __init__(self, fh) -> None:
+        self.fh = fh
+        self.md5 = hashlib.md5()
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self.md5.update(data)
+        self.position += len(data)
+        return self.fh.write(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def hexdigest(self) -> str:
+        return self.md5.hexdigest()
+
+
+def file_digest_path(file: Path) -> Path:
+    return append_to_path(Path(file), "-digest.json")
+
+
+def write_file_digest(file: Path, md5sum: str, nrows: int) -> Path:
+    """Write the md5sum and row count of a file, computed while it was
+    written, to the sidecar <file>-digest.json. The size and modification
+    time of the file are stored too, so a stale sidecar can be detected.
+
+    Arguments:
+        file -- data file
+        md5sum -- md5sum of the data file
+        nrows -- number of data rows, excluding the header
+
+    Returns:
+        sidecar path
+    """
+    stat = os.stat(file)
+    digest_file = file_digest_path(file)
+    with open(digest_file, "w") as fh:
+        json.dump({"md5sum": md5sum,
+                   "nrows": nrows,
+                   "size": stat.st_size,
+                   "mtime_ns": stat.st_mtime_ns}, fh, indent=4)
+    return digest_file
+
+
+def read_file_digest(file: Path) -> Union[dict, None]:
+    """Read the <file>-digest.json sidecar
+
+    Arguments:
+        file -- data file
+
+    Returns:
+        dict with md5sum and nrows, or None if there is no sidecar or
+        the file has changed since the sidecar was written
+    """
+    digest_file = file_digest_path(file)
+    if not digest_file.exists():
+        return None
+    with open(digest_file, "r") as fh:
+        digest = json.load(fh)
+    stat = os.stat(file)
+    if digest.get("size") != stat.st_size or digest.get("mtime_ns") != stat.st_mtime_ns:
+        return None
+    return digest
+
+
+def imap_ordered(func: Callable,
+                 iterable: Iterable,
+                 workers: int,
+                 max_pending: Optional[int] = None) -> Iterator:
+    """Map func over iterable in a process pool, yielding the
+    results in input order. At most max_pending items are in flight
+    at once, so memory stays bounded however long the input is.
+
+    Arguments:
+        func -- picklable callable taking a single item
+        iterable -- items to map over
+        workers -- number of worker processes
+
+    Keyword Arguments:
+        max_pending -- items in flight (default: {None, which means workers * 2})
+
+    Yields:
+        func(item) for each item, in the order of iterable
+    """
+    max_pending = max_pending if max_pending else workers * 2
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for item in iterable:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
 def header_dict_from_args(args: list) -> dict:
     """Generate a dict from cli args split on ":"
 
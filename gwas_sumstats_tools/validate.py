@@ -7,7 +7,9 @@ from rich import print
 
 from gwas_sumstats_tools.schema.data_table import SumStatsSchema
 from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+from gwas_sumstats_tools.interfaces.memory import measured, stage
 from gwas_sumstats_tools.interfaces.metadata import init_metadata_from_file
+from gwas_sumstats_tools.interfaces.parquet import COLUMNAR_EXTENSIONS
 
 
 class Validator(SumStatsTable):
@@ -37,6 +39,14 @@ class Validator(SumStatsTable):
                                 pval_zero=self.pval_zero)
         return schema
 
+    def schema_columns(self) -> list:
+        """Columns of the file that the schema checks, in file order.
+        The schema is not strict, so other columns need not be read.
+        """
+        schema = self.schema()
+        checked = set(schema.mandatory_fields()) | set(schema.optional_fields())
+        return [field for field in self.header() if field in checked]
+
     def validate(self) -> tuple[bool, str]:
         """Validate sumstats data.
         First validate a sample of 100,000 records,
@@ -57,13 +67,15 @@ class Validator(SumStatsTable):
         if self.valid:
             print("--> [green]Ok[/green]")
             print(f"Validating the chromosomes...")
-            self.valid, message = self._validate_chromosomes()
+            with stage("read"):
+                self.valid, message = self._validate_chromosomes()
             print(f"    [dim][grey](note: {message})[/grey][/dim]") 
         if self.valid:
             print("--> [green]Ok[/green]")
             nrows = max(self.sample_size, self.minimum_rows)
             print("Validating minimum row count...")
-            sample_df = self.as_pd_df(nrows=nrows)
+            with stage("read"):
+                sample_df = self.as_pd_df(nrows=nrows, usecols=self.schema_columns())
             self.valid, message = self._minrow_check(df=sample_df)
         if self.valid:
             print("--> [green]Ok[/green]")
@@ -74,10 +86,11 @@ class Validator(SumStatsTable):
             print("Validating the rest of the file...")
             try:
                 df_iter = self.as_pd_df(chunksize=self.chunksize,
-                                        skiprows=nrows)
+                                        skiprows=nrows,
+                                        usecols=self.schema_columns())
 
                 offset = nrows + 2  # +2 for header and 0-indexing
-                for df in df_iter:
+                for df in measured(df_iter, "read"):
                     df = df.reset_index(drop=True)
                     df.index += offset
                     self.valid, message = self._validate_df(df)
@@ -93,16 +106,18 @@ class Validator(SumStatsTable):
         """Write the error df to a CSV file
         """
         errors_out = self.filename + ".err.csv.gz"
-        self.errors_table.tocsv(errors_out)
+        with stage("write"):
+            self.errors_table.tocsv(errors_out)
 
     def _validate_file_ext(self) -> tuple[bool, Union[str, None]]:
         message = None
         file_ext = "".join(Path(self.filename).suffixes)
-        valid = file_ext.endswith(tuple(SumStatsSchema.FILE_EXTENSIONS))
+        # columnar copies of a sumstats file are validated on their content
+        valid = file_ext.endswith(tuple(SumStatsSchema.FILE_EXTENSIONS) + COLUMNAR_EXTENSIONS)
         if not valid:
             self.primary_error_type = "file_ext"
             message = (f"Extension, '{file_ext}', "
-                       f"not in valid set: {SumStatsSchema.FILE_EXTENSIONS}.")
+                       f"not in valid set: {SumStatsSchema.FILE_EXTENSIONS | set(COLUMNAR_EXTENSIONS)}.")
         return valid, message
 
     def _validate_field_order(self) -> tuple[bool, Union[str, None]]:
@@ -132,23 +147,32 @@ class Validator(SumStatsTable):
         else:
             table=etl.convert(self.sumstats,'chromosome', str)
             chr_column=etl.values(table,'chromosome')
-            
-            unique_chr = set(chr_column)
-            autosomes_chromosomes=set(map(str, range(1, 23)))
-            optional_chromosomes = set(map(str, range(23, 26)))
-            
-            missing_autosomes = sorted(autosomes_chromosomes - unique_chr, key=int)
-            missing_optional = sorted(optional_chromosomes - unique_chr, key=int)
-            
-            if unique_chr == {"23"}:
-                return True, "This file only contains chromosome X."
-            if missing_autosomes:
-                self.primary_error_type = "missing_chromsomes"
-                return False, f"Chromosome column missing values: {missing_autosomes}"
-            if missing_optional:
-                return True, f"All autosomes exist. Optional chromosomes {missing_optional} do not exist."
-            
-            return True, "All chromosomes, including X, Y, and MT, exist."
+            return self._check_chromosomes(set(chr_column))
+
+    def _check_chromosomes(self, unique_chr: set) -> tuple[bool, str]:
+        """Check a set of chromosome values contains all the autosomes.
+
+        Arguments:
+            unique_chr -- set of the chromosome values as strings
+
+        Returns:
+            tuple[bool, str]: Validation status and error message.
+        """
+        autosomes_chromosomes=set(map(str, range(1, 23)))
+        optional_chromosomes = set(map(str, range(23, 26)))
+        
+        missing_autosomes = sorted(autosomes_chromosomes - unique_chr, key=int)
+        missing_optional = sorted(optional_chromosomes - unique_chr, key=int)
+        
+        if unique_chr == {"23"}:
+            return True, "This file only contains chromosome X."
+        if missing_autosomes:
+            self.primary_error_type = "missing_chromsomes"
+            return False, f"Chromosome column missing values: {missing_autosomes}"
+        if missing_optional:
+            return True, f"All autosomes exist. Optional chromosomes {missing_optional} do not exist."
+        
+        return True, "All chromosomes, including X, Y, and MT, exist."
     
     def _validate_df(self,
                      dataframe: pd.DataFrame,
@@ -164,23 +188,26 @@ class Validator(SumStatsTable):
             Validation status, message
         """
         try:
-            dataframe = self.pval_to_mantissa_and_exponent(dataframe)
-            self.schema().schema().validate(dataframe, lazy=True)
+            with stage("p-value split"):
+                dataframe = self.pval_to_mantissa_and_exponent(dataframe)
+            with stage("schema validation"):
+                self.schema().schema().validate(dataframe, lazy=True)
             valid = True
             message = "Data table is valid."
             self.errors_table = None
             self.primary_error_type = None
         except errors.SchemaErrors as err:
-            failure_cases = err.failure_cases
-            if len(failure_cases) > 0:
-                # Sort primarily by error type (schema context), then by row index and column
-                failure_cases = failure_cases.sort_values(
-                    by=["schema_context", "index", "column"],
-                    kind="mergesort"
-                )
-                self.errors_table = etl.fromdataframe(failure_cases)
-            else:
-                self.errors_table = None
+            with stage("error collection"):
+                failure_cases = err.failure_cases
+                if len(failure_cases) > 0:
+                    # Sort primarily by error type (schema context), then by row index and column
+                    failure_cases = failure_cases.sort_values(
+                        by=["schema_context", "index", "column"],
+                        kind="mergesort"
+                    )
+                    self.errors_table = etl.fromdataframe(failure_cases)
+                else:
+                    self.errors_table = None
             valid = False
         return valid, message
 
@@ -237,6 +264,135 @@ class Validator(SumStatsTable):
                     self.primary_error_type = 'p_val'
 
 
+class StreamValidator(Validator):
+    """Validate the rows of a sumstats file while it is being
+    written, e.g. by format --validate, instead of reading the
+    file back afterwards. The same checks as Validator.validate
+    are run and reported with the same priority.
+
+    Wrap the table to be written with tee(); the verdict is
+    available from self.valid and self.message once the
+    wrapped table has been iterated to the end.
+    """
+    def __init__(self,
+                 sumstats_file: Path,
+                 pval_zero: bool = False,
+                 minimum_rows: int = 100_000,
+                 sample_size: int = 100_000,
+                 chunksize: int = 1_000_000) -> None:
+        # The file does not exist yet, so SumStatsTable.__init__ is not called.
+        self.filename = str(sumstats_file)
+        self.delimiter = "\t"
+        self.removecomments = None
+        self.columnar = None
+        self.sumstats = None
+        self.pval_zero = pval_zero
+        self.errors_table = None
+        self.minimum_rows = minimum_rows
+        self.sample_size = sample_size
+        self.chunksize = chunksize
+        self.primary_error_type = None
+        self.valid = None
+        self.message = None
+        self._header = ()
+
+    def header(self) -> tuple:
+        return self._header
+
+    def tee(self, table: etl.Table) -> etl.Table:
+        """Wrap a table so its rows are validated as they are iterated
+
+        Arguments:
+            table -- petl table to be written
+
+        Returns:
+            petl table yielding the same rows
+        """
+        return _ValidatingView(source=table, validator=self)
+
+    def start(self, header: tuple) -> None:
+        self._header = tuple(header)
+        self.nrows = 0
+        self.errors_table = None
+        self.primary_error_type = None
+        self._buffer = []
+        self._chromosomes = set()
+        self._df_valid = True
+        self._df_message = None
+        self._df_errors = None
+        self.valid, self.message = self._validate_file_ext()
+        if self.valid:
+            self.valid, self.message = self._validate_field_order()
+        if self.valid and "chromosome" not in self._header:
+            self.valid, self.message = False, "Chromosome column is missing from the input file."
+        self._chr_index = self._header.index("chromosome") if self.valid else None
+
+    def add_row(self, row: tuple) -> None:
+        self.nrows += 1
+        if not self.valid:
+            return
+        self._chromosomes.add(str(row[self._chr_index]))
+        if self._df_valid:
+            self._buffer.append(row)
+            if len(self._buffer) >= self._next_chunk_size():
+                self._validate_buffer()
+
+    def finish(self) -> tuple[bool, str]:
+        """Validate what is left and give the verdict
+
+        Returns:
+            Validation status, message
+        """
+        if self.valid:
+            if self._df_valid and self._buffer:
+                self._validate_buffer()
+            self.valid, self.message = self._check_chromosomes(self._chromosomes)
+        if self.valid:
+            # _minrow_check only needs the length of what it is given
+            self.valid, self.message = self._minrow_check(df=range(self.nrows))
+        if self.valid:
+            self.valid, self.message = self._df_valid, self._df_message
+            self.errors_table = self._df_errors
+        self._evaluate_errors()
+        return self.valid, self.message
+
+    def _next_chunk_size(self) -> int:
+        sample_rows = max(self.sample_size, self.minimum_rows)
+        return sample_rows if self.nrows <= sample_rows else self.chunksize
+
+    def _validate_buffer(self) -> None:
+        """Validate the buffered rows as a dataframe. As in Validator.validate,
+        the first sample is indexed from 0 and later chunks by row + 2.
+        """
+        sample_rows = max(self.sample_size, self.minimum_rows)
+        first_row = self.nrows - len(self._buffer)
+        df = pd.DataFrame.from_records(self._buffer, columns=self._header)[self.schema_columns()].astype(str)
+        df = df.mask(df.isin(self.NA_VALUES))
+        if first_row >= sample_rows:
+            df.index += first_row + 2
+        self._buffer = []
+        self._df_valid, self._df_message = self._validate_df(df)
+        self._df_errors = self.errors_table
+        self.errors_table = None
+        self.primary_error_type = None
+
+
+class _ValidatingView(etl.Table):
+    def __init__(self, source: etl.Table, validator: StreamValidator) -> None:
+        self.source = source
+        self.validator = validator
+
+    def __iter__(self):
+        rows = iter(self.source)
+        header = next(rows)
+        self.validator.start(header)
+        yield header
+        for row in rows:
+            self.validator.add_row(row)
+            yield row
+        self.validator.finish()
+
+
 def validate(filename: Path,
              errors_file: bool = False,
              pval_zero: bool = False,
@@ -261,8 +417,6 @@ def validate(filename: Path,
     Returns:
         Valid status: bool, message: str, error preview: etl.Table|none, error type: str|None
     """
-    error_preview = None
-    primary_error_type = None
     if infer_from_metadata:
         ssm = init_metadata_from_file(filename=filename)
         if ssm:
@@ -276,11 +430,40 @@ def validate(filename: Path,
                           sumstats_file=filename,
                           chunksize=chunksize)
     valid, message = validator.validate()
+    return validation_result(validator=validator,
+                             valid=valid,
+                             message=message,
+                             errors_file=errors_file)
+
+
+def validation_result(validator: Validator,
+                      valid: bool,
+                      message: str,
+                      errors_file: bool = False) -> tuple[bool,
+                                                          str,
+                                                          Union[etl.Table, None],
+                                                          Union[str, None]
+                                                          ]:
+    """Summarise the outcome of a validator
+
+    Arguments:
+        validator -- Validator that has been run
+        valid -- validation status
+        message -- validation message
+
+    Keyword Arguments:
+        errors_file -- create error file csv (default: {False})
+
+    Returns:
+        Valid status: bool, message: str, error preview: etl.Table|none, error type: str|None
+    """
+    error_preview = None
+    primary_error_type = None
     if not valid:
         if validator.errors_table:
             error_preview = validator.errors_table.head(10)
         if errors_file and validator.errors_table:
-            message += f"\n[green]Writing errors --> {filename}.err.csv.gz[/green]"
+            message += f"\n[green]Writing errors --> {validator.filename}.err.csv.gz[/green]"
             validator.write_errors_to_file()
         primary_error_type = validator.primary_error_type
     return valid, message, error_preview, primary_error_type
@@ -0,0 +1,37 @@
+import time
+
+from gwas_sumstats_tools.interfaces.batch_state import BatchState, config_hash, input_digest
+from gwas_sumstats_tools.utils import write_file_digest
+
+
+def test_file_is_complete_until_input_config_or_output_change(tmp_path):
+    infile = tmp_path / "in.tsv"
+    outfile = tmp_path / "out.tsv"
+    infile.write_text("a\tb\n1\t2\n")
+    config = config_hash({"fileConfig": {}}, {"sort": False})
+    with BatchState(tmp_path / "manifest.tsv") as state:
+        state.start(infile, outfile, input_digest(infile), config)
+        assert not state.is_complete(infile, input_digest(infile), config)
+        outfile.write_text("a\tb\n1\t2\n")
+        write_file_digest(outfile, "abc", 1)
+        state.finish(infile, outfile, seconds=1.0)
+        assert state.get(infile)["status"] == "done"
+        assert state.is_complete(infile, input_digest(infile), config)
+        assert not state.is_complete(infile, input_digest(infile), config_hash({}, {"sort": True}))
+        infile.write_text("a\tb\n1\t3\n")
+        assert not state.is_complete(infile, input_digest(infile), config)
+    assert (tmp_path / "manifest.tsv-state.sqlite").exists()
+
+
+def test_running_file_is_recovered_from_output_digest(tmp_path):
+    infile = tmp_path / "in.tsv"
+    outfile = tmp_path / "out.tsv"
+    infile.write_text("a\n1\n")
+    with BatchState(tmp_path / "manifest.tsv") as state:
+        state.start(infile, outfile, input_digest(infile), "config")
+    time.sleep(0.01)
+    outfile.write_text("a\n1\n")
+    write_file_digest(outfile, "abc", 1)
+    with BatchState(tmp_path / "manifest.tsv") as state:
+        assert state.is_complete(infile, input_digest(infile), "config")
+        assert state.get(infile)["output_md5sum"] == "abc"
@@ -0,0 +1,46 @@
+import gzip
+
+import petl as etl
+
+from gwas_sumstats_tools.interfaces.bgzf import BgzfWriter, BGZF_EOF, BGZF_BLOCK_SIZE
+from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+from gwas_sumstats_tools.interfaces.tabix import TBI_MAGIC, reg2bin
+
+
+HEADER = ("chromosome", "base_pair_location", "p_value")
+
+
+def test_bgzf_writer_is_readable_by_gzip(tmp_path):
+    outfile = tmp_path / "test.txt.gz"
+    data = b"".join(b"line %d\n" % i for i in range(50_000))
+    with BgzfWriter(outfile, threads=3) as writer:
+        writer.write(data)
+    assert len(writer.block_offsets) == len(data) // BGZF_BLOCK_SIZE + 2
+    assert outfile.read_bytes().endswith(BGZF_EOF)
+    assert gzip.open(outfile).read() == data
+
+
+def test_reg2bin():
+    assert reg2bin(0, 1) == 4681
+    assert reg2bin(0, 1 << 15) == 585
+    assert reg2bin(0, 1 << 29) == 0
+
+
+def test_to_file_bgzip_writes_tabix_index_when_sorted(tmp_path):
+    outfile = tmp_path / "sorted.tsv.gz"
+    rows = [HEADER] + [(str(c), str(p), "0.5") for c in (1, 2) for p in range(1, 2000, 7)]
+    table = SumStatsTable.from_table(etl.wrap(rows))
+    indexer = table.to_file(outfile, bgzip=True, threads=2)
+    assert indexer.is_sorted
+    assert indexer.names == ["1", "2"]
+    assert gzip.open(str(outfile) + ".tbi").read(4) == TBI_MAGIC
+    assert etl.fromtsv(str(outfile)).nrows() == len(rows) - 1
+
+
+def test_to_file_bgzip_skips_index_when_not_sorted(tmp_path):
+    outfile = tmp_path / "unsorted.tsv.gz"
+    rows = [HEADER, ("1", "10", "0.5"), ("2", "5", "0.5"), ("1", "20", "0.5")]
+    indexer = SumStatsTable.from_table(etl.wrap(rows)).to_file(outfile, bgzip=True)
+    assert not indexer.is_sorted
+    assert "not contiguous" in indexer.message
+    assert not (tmp_path / "unsorted.tsv.gz.tbi").exists()
@@ -0,0 +1,40 @@
+import gzip
+
+import petl as etl
+import pytest
+
+from gwas_sumstats_tools.interfaces.bgzf import BgzfWriter
+from gwas_sumstats_tools.interfaces.count import count_lines
+from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+
+
+HEADER = ("chromosome", "base_pair_location", "p_value")
+ROWS = [("1", str(position), "0.5") for position in range(50_000)]
+
+
+@pytest.mark.parametrize("data, removecomments, expected", [
+    (b"a\nb\nc\n", None, 3),
+    (b"a\nb\nc", None, 3),
+    (b"a\n\nb\n\n\nc\n\n", None, 3),
+    (b"a\r\n\r\nb\r\n", None, 2),
+    (b"#x\na\n#y\nb\n#z", "#", 2),
+    (b"", None, 0),
+])
+def test_count_lines_skips_blank_and_comment_lines(tmp_path, data, removecomments, expected):
+    filename = tmp_path / "in.tsv"
+    filename.write_bytes(data)
+    assert count_lines(filename, removecomments=removecomments) == expected
+
+
+def test_count_rows_of_compressed_files(tmp_path):
+    data = "".join("\t".join(row) + "\n" for row in [HEADER] + ROWS).encode()
+    bgzf_file = tmp_path / "in.tsv.gz"
+    with BgzfWriter(bgzf_file) as writer:
+        writer.write(data)
+    gzip_file = tmp_path / "in.gzip.tsv.gz"
+    with gzip.open(gzip_file, "wb") as fh:
+        fh.write(data)
+    assert SumStatsTable(bgzf_file).count_rows() == len(ROWS)
+    assert SumStatsTable(bgzf_file).count_rows(workers=3) == len(ROWS)
+    assert SumStatsTable(gzip_file).count_rows(workers=3) == len(ROWS)
+    assert SumStatsTable.from_table(etl.wrap([HEADER] + ROWS[:10])).count_rows() == 10
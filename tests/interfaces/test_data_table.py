@@ -1,3 +1,6 @@
+import gzip
+
+import petl as etl
 import pytest
 
 from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
@@ -32,4 +35,47 @@ def test_p_value_field(mocker):
     headers = ("a", "b", "c", "d", "e", "f", "g", "h")
     mocker.patch("gwas_sumstats_tools.interfaces.data_table.SumStatsTable.header",
                  return_value=headers)
-    assert SumStatsTable("test.tsv").p_value_field() == headers[7]
\ No newline at end of file
+    assert SumStatsTable("test.tsv").p_value_field() == headers[7]
+
+
+def test_read_whitespace_delimited_file(tmp_path):
+    infile = tmp_path / "plink.assoc.gz"
+    with gzip.open(infile, "wt") as fh:
+        fh.write("## comment\n CHR   SNP   BP   P\n   1   rs1  100   0.5\n\n  10  rs2   20  1e-8 \n")
+    table = SumStatsTable(infile, delimiter=r"\s+", removecomments="##")
+    assert list(table.sumstats) == [("CHR", "SNP", "BP", "P"),
+                                    ("1", "rs1", "100", "0.5"),
+                                    ("10", "rs2", "20", "1e-8")]
+
+
+def test_read_multi_character_delimited_file(tmp_path):
+    infile = tmp_path / "test.txt"
+    infile.write_text("a::b\n1::2\n")
+    assert list(SumStatsTable(infile, delimiter="::").sumstats) == [("a", "b"), ("1", "2")]
+
+
+def test_read_projected_columns(tmp_path):
+    infile = tmp_path / "test.tsv"
+    infile.write_text("a\tb\tc\td\n1\t2\t3\t4\n5\t6\n")
+    table = SumStatsTable(infile, columns=["c", "a"])
+    assert list(table.sumstats) == [("c", "a"), ("3", "1"), (None, "5")]
+    with pytest.raises(ValueError, match="Columns not in the file"):
+        list(SumStatsTable(infile, columns=["x"]).sumstats)
+    df = SumStatsTable(infile).as_pd_df(usecols=["b"])
+    assert list(df.columns) == ["b"]
+
+
+def test_read_projected_columns_of_quoted_csv(tmp_path):
+    infile = tmp_path / "test.csv"
+    infile.write_text('chromosome,base_pair_location,p_value,note\n1,100,0.5,"a,b"\n')
+    table = SumStatsTable(infile, columns=["chromosome", "note"])
+    assert list(table.sumstats) == [("chromosome", "note"), ("1", "a,b")]
+    regex = tmp_path / "test.txt"
+    regex.write_text("a::b::c\n1::2::3\n")
+    assert list(SumStatsTable(regex, delimiter="::", columns=["c", "a"]).sumstats) == [("c", "a"), ("3", "1")]
+
+
+def test_write_empty_table(tmp_path):
+    outfile = tmp_path / "empty.tsv"
+    SumStatsTable.from_table(etl.wrap([])).to_file(outfile)
+    assert outfile.read_text() == ""
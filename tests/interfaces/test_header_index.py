@@ -0,0 +1,14 @@
+from gwas_sumstats_tools.interfaces.header_index import header_candidates
+
+
+def test_header_candidates():
+    assert header_candidates("SNP") == ("variant_id",)
+    assert header_candidates("id") == ("rsid", "variant_id")
+    assert header_candidates("L95") == ("ci_lower",)
+
+
+def test_header_candidates_fuzzy_fallback():
+    assert header_candidates("P-value") == ("p_value",)
+    assert header_candidates("Effect.Allele") == ("effect_allele",)
+    assert header_candidates("pvalue_x") == ("p_value",)
+    assert header_candidates("nonsense") == ()
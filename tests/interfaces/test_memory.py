@@ -0,0 +1,44 @@
+import petl as etl
+
+from gwas_sumstats_tools.interfaces.memory import MemoryMonitor, MeasuredView, measured, stage
+
+
+def test_stages_are_no_ops_without_a_monitor():
+    with stage("read"):
+        pass
+    assert list(measured(range(3), "read")) == [0, 1, 2]
+    table = etl.wrap([("a",), (1,), (2,)])
+    assert list(MeasuredView(table, "read")) == list(table)
+
+
+def test_monitor_measures_nested_stages(tmp_path):
+    outfile = tmp_path / "metrics.json"
+    monitor = MemoryMonitor(outfile=outfile).start()
+    with stage("outer"):
+        kept = bytearray(10 * 1024 * 1024)
+        with stage("inner"):
+            temporary = bytearray(30 * 1024 * 1024)
+            del temporary
+    chunks = list(measured(iter([1, 2, 3]), "read"))
+    monitor.stop()
+    metrics = monitor.to_dict()
+    assert chunks == [1, 2, 3]
+    assert outfile.exists()
+    stages = metrics["stages"]
+    assert stages["read"]["calls"] == 4
+    assert stages["outer"]["calls"] == stages["inner"]["calls"] == 1
+    assert 30 <= stages["inner"]["peak_increase_mb"] < 35
+    # the peak of the inner stage is also a peak of the outer one
+    assert stages["outer"]["peak_increase_mb"] >= 40
+    assert metrics["peak_traced_mb"] >= stages["outer"]["peak_traced_mb"]
+    del kept
+
+
+def test_measured_view_measures_rows_in_batches():
+    table = etl.wrap([("a",)] + [(i,) for i in range(25)])
+    monitor = MemoryMonitor().start()
+    rows = [row for row in MeasuredView(table, "read", batch=10)]
+    monitor.stop()
+    assert rows == list(table)
+    # the header on its own, three batches of rows and the empty batch at the end
+    assert monitor.to_dict()["stages"]["read"]["calls"] == 5
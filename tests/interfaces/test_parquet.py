@@ -0,0 +1,128 @@
+import json
+
+import petl as etl
+import pytest
+
+from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+from gwas_sumstats_tools.interfaces.parquet import ColumnarView, read_frames, write_parquet
+from gwas_sumstats_tools.interfaces.sample import sample_rows
+from gwas_sumstats_tools.utils import get_md5sum
+from gwas_sumstats_tools.validate import Validator
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+HEADER = ("chromosome", "base_pair_location", "effect_allele", "other_allele", "beta",
+          "standard_error", "effect_allele_frequency", "p_value", "rsid", "extra")
+ROWS = [("1", "100", "A", "G", "0.1", "0.01", "0.3", "1e-400", "rs1", "x"),
+        ("1", "200", "A", "G", "#NA", "0.01", "0.3", "0.5", "#NA", "y"),
+        ("1", "300", "C", "G", "0.3", "0.01", "0.3", "0.5", "rs2", "z"),
+        ("2", "50", "T", "C", "-0.2", "0.02", "0.1", "3.2e-5", "rs3", "w")]
+
+
+def test_write_parquet_types_columns_and_splits_row_groups_on_chromosome(tmp_path):
+    outfile = tmp_path / "out.parquet"
+    assert write_parquet(etl.wrap([HEADER] + ROWS), str(outfile), row_group_size=2) == 4
+    parquet = pq.ParquetFile(outfile)
+    schema = {field.name: str(field.type) for field in parquet.schema_arrow}
+    assert schema["chromosome"] == schema["base_pair_location"] == "int64"
+    assert schema["beta"] == "double"
+    assert schema["p_value"] == schema["extra"] == "string"
+    row_groups = [parquet.metadata.row_group(i) for i in range(parquet.metadata.num_row_groups)]
+    assert [group.num_rows for group in row_groups] == [2, 1, 1]
+    assert [(group.column(0).statistics.min, group.column(0).statistics.max) for group in row_groups] == \
+        [(1, 1), (1, 1), (2, 2)]
+    data = parquet.read().to_pydict()
+    assert data["beta"] == [0.1, None, 0.3, -0.2]
+    assert data["rsid"] == ["rs1", None, "rs2", "rs3"]
+    assert data["p_value"][0] == "1e-400"
+
+
+def test_write_parquet_does_not_split_interleaved_chromosomes(tmp_path):
+    outfile = tmp_path / "out.parquet"
+    rows = [(str(i % 2 + 1), str(i)) + ROWS[0][2:] for i in range(10)]
+    assert write_parquet(etl.wrap([HEADER] + rows), str(outfile), row_group_size=4) == 10
+    metadata = pq.ParquetFile(outfile).metadata
+    # a group for the first row of chromosome 1, then groups of row_group_size rows once 1 comes back
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [1, 4, 4, 1]
+
+
+def test_write_parquet_rejects_values_of_the_wrong_type(tmp_path):
+    rows = [("X",) + ROWS[0][1:]]
+    with pytest.raises(ValueError, match="'X' in chromosome"):
+        write_parquet(etl.wrap([HEADER] + rows), str(tmp_path / "out.parquet"))
+
+
+def test_to_file_writes_parquet_and_digest(tmp_path):
+    infile = tmp_path / "in.tsv"
+    etl.totsv(etl.wrap([HEADER] + ROWS), str(infile))
+    outfile = tmp_path / "out.parquet"
+    assert SumStatsTable(infile).to_file(outfile) is None
+    digest = json.loads((tmp_path / "out.parquet-digest.json").read_text())
+    assert digest["md5sum"] == get_md5sum(outfile)
+    assert digest["nrows"] == 4
+    assert SumStatsTable(outfile).count_rows() == 4
+
+
+def test_to_file_leaves_no_parquet_when_the_write_fails(tmp_path):
+    infile = tmp_path / "in.tsv"
+    etl.totsv(etl.wrap([HEADER] + ROWS + [("X",) + ROWS[0][1:]]), str(infile))
+    outfile = tmp_path / "out.parquet"
+    with pytest.raises(ValueError, match="'X' in chromosome"):
+        SumStatsTable(infile).to_file(outfile)
+    assert list(tmp_path.iterdir()) == [infile]
+
+
+@pytest.fixture
+def parquet_file(tmp_path):
+    outfile = tmp_path / "in.parquet"
+    write_parquet(etl.wrap([HEADER] + ROWS), str(outfile), row_group_size=2)
+    return outfile
+
+
+def test_columnar_view_reads_strings_and_projects_columns(parquet_file):
+    assert list(ColumnarView(parquet_file)) == [HEADER] + [
+        ("1", "100", "A", "G", "0.1", "0.01", "0.3", "1e-400", "rs1", "x"),
+        ("1", "200", "A", "G", "#NA", "0.01", "0.3", "0.5", "#NA", "y"),
+        ("1", "300", "C", "G", "0.3", "0.01", "0.3", "0.5", "rs2", "z"),
+        ("2", "50", "T", "C", "-0.2", "0.02", "0.1", "3.2e-5", "rs3", "w")]
+    assert list(ColumnarView(parquet_file, columns=["rsid", "chromosome"], batch_size=1)) == \
+        [("rsid", "chromosome"), ("rs1", "1"), ("#NA", "1"), ("rs2", "1"), ("rs3", "2")]
+
+
+def test_sumstats_table_reads_arrow_ipc(parquet_file, tmp_path):
+    feather = pytest.importorskip("pyarrow.feather")
+    arrow_file = tmp_path / "in.arrow"
+    feather.write_feather(pq.read_table(parquet_file), str(arrow_file), chunksize=3)
+    table = SumStatsTable(arrow_file)
+    assert table.columnar == "arrow"
+    assert table.header() == HEADER
+    assert list(etl.values(table.sumstats, "base_pair_location")) == ["100", "200", "300", "50"]
+
+
+def test_read_frames_keeps_types_and_chunks(parquet_file):
+    df = SumStatsTable(parquet_file).as_pd_df(nrows=3)
+    assert len(df) == 3
+    assert str(df["chromosome"].dtype) == "int64"
+    assert str(df["beta"].dtype) == "float64"
+    assert list(df["p_value"]) == ["1e-400", "0.5", "0.5"]
+    frames = list(read_frames(parquet_file, chunksize=3, skiprows=1))
+    assert [len(frame) for frame in frames] == [3]
+    assert list(frames[0]["base_pair_location"]) == [200, 300, 50]
+
+
+def test_sample_rows_of_parquet(parquet_file):
+    header, rows, locations = sample_rows(parquet_file, nrows=2, windows=2)
+    assert header == HEADER
+    assert [row[1] for row in rows] == ["100", "300"]
+    assert locations == ["row 1", "row 3"]
+
+
+def test_validate_parquet_copy(tmp_path):
+    rows = [(str(chromosome), "100", "A", "G", "0.1", "0.01", "0.3", "1e-400", "1_100_A_G", "rs1")
+            for chromosome in range(1, 23)]
+    header = HEADER[:8] + ("variant_id", "rsid")
+    outfile = tmp_path / "copy.parquet"
+    write_parquet(etl.wrap([header] + rows), str(outfile))
+    validator = Validator(outfile, minimum_rows=10, sample_size=10, chunksize=5)
+    assert validator.validate() == (True, "Data table is valid.")
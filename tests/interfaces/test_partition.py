@@ -0,0 +1,30 @@
+import gzip
+
+from gwas_sumstats_tools.interfaces.bgzf import BgzfWriter
+from gwas_sumstats_tools.interfaces.partition import partition, read_partition
+
+
+LINES = [b"x" * length + b"\n" for length in (3, 80, 70_000, 5, 200_000, 1) * 20]
+
+
+def test_partitions_hold_each_line_once(tmp_path):
+    data = b"".join(LINES)
+    plain = tmp_path / "in.tsv"
+    plain.write_bytes(data)
+    compressed = tmp_path / "in.tsv.gz"
+    with BgzfWriter(compressed) as writer:
+        writer.write(data)
+    for filename in (plain, compressed):
+        for parts in (1, 3, 40):
+            partitions = partition(filename, parts)
+            assert len(partitions) <= parts
+            assert b"".join(chunk for part in partitions
+                            for chunk in read_partition(filename, part, chunk_bytes=1000)) == data
+
+
+def test_other_compression_is_one_partition(tmp_path):
+    filename = tmp_path / "in.tsv.gz"
+    with gzip.open(filename, "wb") as fh:
+        fh.write(b"".join(LINES))
+    assert len(partition(filename, 4)) == 1
+    assert b"".join(read_partition(filename, partition(filename, 4)[0])) == b"".join(LINES)
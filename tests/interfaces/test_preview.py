@@ -0,0 +1,41 @@
+import bz2
+import gzip
+
+import petl as etl
+
+from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+from gwas_sumstats_tools.interfaces.preview import read_preview
+
+
+HEADER = ("chromosome", "base_pair_location", "p_value")
+ROWS = [(str(c), str(p), "0.5") for c in (1, 2) for p in range(1, 50_000, 3)]
+TEXT = "".join("\t".join(row) + "\n" for row in [HEADER] + ROWS).encode()
+
+
+def test_preview_of_plain_and_compressed_files(tmp_path):
+    (tmp_path / "plain.tsv").write_bytes(b"# comment\n" + TEXT)
+    (tmp_path / "plain.tsv.gz").write_bytes(gzip.compress(TEXT))
+    (tmp_path / "plain.tsv.bz2").write_bytes(bz2.compress(TEXT))
+    SumStatsTable.from_table(etl.wrap([HEADER] + ROWS)).to_file(tmp_path / "bgzf.tsv.gz", bgzip=True)
+    for name, compression in (("plain.tsv", None), ("plain.tsv.gz", "gzip"),
+                              ("plain.tsv.bz2", "bz2"), ("bgzf.tsv.gz", "bgzf")):
+        preview = read_preview(tmp_path / name, nrows=3, removecomments="#")
+        assert preview.header == HEADER
+        assert preview.rows == ROWS[:3]
+        assert preview.delimiter == "\t"
+        assert preview.compression == compression
+
+
+def test_preview_reads_a_bounded_window(tmp_path):
+    (tmp_path / "plain.csv").write_bytes(TEXT.replace(b"\t", b","))
+    preview = read_preview(tmp_path / "plain.csv", nrows=len(ROWS), max_bytes=1000)
+    assert preview.delimiter == ","
+    assert 0 < len(preview.rows) < 1000 // 8
+    assert preview.rows == ROWS[:len(preview.rows)]
+
+
+def test_preview_of_small_and_empty_files(tmp_path):
+    (tmp_path / "small.tsv").write_bytes(b"a\tb\n1\t2")
+    assert read_preview(tmp_path / "small.tsv").rows == [("1", "2")]
+    (tmp_path / "empty.tsv").write_bytes(b"")
+    assert read_preview(tmp_path / "empty.tsv").header == ()
@@ -0,0 +1,18 @@
+import petl as etl
+
+from gwas_sumstats_tools.interfaces.pvalue import NegLog10PvalueView, neg_log10_to_pvalue
+
+
+def test_neg_log10_to_pvalue():
+    assert neg_log10_to_pvalue(["2", "0.30103", "412.5", "1000", "0"]) == \
+        ["1e-2", "5e-1", "3.16228e-413", "1e-1000", "1e0"]
+
+
+def test_neg_log10_to_pvalue_keeps_values_that_are_not_numbers():
+    assert neg_log10_to_pvalue(["#NA", None, "7.3"]) == ["#NA", None, "5.01187e-8"]
+
+
+def test_neg_log10_pvalue_view_converts_in_chunks():
+    table = etl.wrap([("rsid", "p_value")] + [(f"rs{i}", str(i)) for i in range(1, 6)])
+    rows = list(NegLog10PvalueView(table, chunksize=2))
+    assert rows == [("rsid", "p_value")] + [(f"rs{i}", f"1e-{i}") for i in range(1, 6)]
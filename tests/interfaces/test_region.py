@@ -0,0 +1,86 @@
+import gzip
+import shutil
+
+import petl as etl
+import pytest
+
+from gwas_sumstats_tools.interfaces import bgzf
+from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+from gwas_sumstats_tools.interfaces.region import (RegionView, coordinate_index_path,
+                                                   parse_region, Region, MAX_POSITION)
+
+
+HEADER = ("chromosome", "base_pair_location", "p_value")
+ROWS = [(str(c), str(p), "0.5") for c in (1, 2, 3) for p in range(1, 200_000, 37)]
+
+
+def in_region(region, rows=ROWS):
+    return sorted(row for row in rows if region.contains(row[0], row[1]))
+
+
+def count_blocks(monkeypatch):
+    loads = []
+    load = bgzf.BgzfReader._load
+    monkeypatch.setattr(bgzf.BgzfReader, "_load", lambda self, offset: loads.append(offset) or load(self, offset))
+    return loads
+
+
+def test_parse_region():
+    assert parse_region("7:27,000,000-27300000") == Region("7", 27_000_000, 27_300_000)
+    assert parse_region("chr7").names() == ("chr7", "7")
+    assert parse_region("7:100-").start == 100
+    assert parse_region("7:100-").end == parse_region("7").end == MAX_POSITION
+    with pytest.raises(ValueError):
+        parse_region("7:200-100")
+
+
+def test_region_through_tabix_index(tmp_path, monkeypatch):
+    outfile = tmp_path / "sorted.tsv.gz"
+    SumStatsTable.from_table(etl.wrap([HEADER] + ROWS)).to_file(outfile, bgzip=True)
+    loads = count_blocks(monkeypatch)
+    region = parse_region("2:100000-101000")
+    view = RegionView(outfile, region, header=HEADER)
+    rows = list(view)
+    assert view.method == "tabix index"
+    assert rows[0] == HEADER
+    assert sorted(rows[1:]) == in_region(region)
+    assert len(set(loads)) <= 2
+    assert not coordinate_index_path(outfile).exists()
+    region = parse_region("2:150000-")
+    assert sorted(list(RegionView(outfile, region, header=HEADER))[1:]) == in_region(region)
+
+
+def test_region_through_coordinate_index_of_unsorted_bgzf(tmp_path):
+    outfile = tmp_path / "unsorted.tsv.gz"
+    rows = ROWS[::-1]
+    SumStatsTable.from_table(etl.wrap([HEADER] + rows)).to_file(outfile, bgzip=True)
+    region = parse_region("chr3:5000-9000")
+    view = RegionView(outfile, region, header=HEADER)
+    assert sorted(list(view)[1:]) == in_region(region)
+    assert view.method == "coordinate index"
+    assert coordinate_index_path(outfile).exists()
+
+
+def test_region_of_uncompressed_and_gzip_files(tmp_path):
+    tsv = tmp_path / "plain.tsv"
+    etl.totsv(etl.wrap([HEADER] + ROWS), str(tsv))
+    gz = tmp_path / "plain.tsv.gz"
+    with open(tsv, "rb") as fh, gzip.open(gz, "wb") as out:
+        shutil.copyfileobj(fh, out)
+    region = parse_region("1:1-1000")
+    view = RegionView(tsv, region, header=HEADER)
+    assert sorted(list(view)[1:]) == in_region(region)
+    assert view.method == "coordinate index"
+    view = RegionView(gz, region, header=HEADER)
+    assert sorted(list(view)[1:]) == in_region(region)
+    assert view.method == "full scan"
+
+
+def test_coordinate_index_is_rebuilt_when_the_file_changes(tmp_path):
+    tsv = tmp_path / "plain.tsv"
+    etl.totsv(etl.wrap([HEADER] + ROWS[:10]), str(tsv))
+    region = parse_region("1:1-1000")
+    list(RegionView(tsv, region, header=HEADER))
+    etl.totsv(etl.wrap([HEADER] + ROWS), str(tsv))
+    view = RegionView(tsv, region, header=HEADER)
+    assert sorted(list(view)[1:]) == in_region(region)
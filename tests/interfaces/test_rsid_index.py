@@ -0,0 +1,50 @@
+import gzip
+
+import petl as etl
+import pytest
+
+from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+from gwas_sumstats_tools.interfaces.rsid_index import (RsidView, build_rsid_index, load_rsid_index,
+                                                       lookup_offsets, rsid_index_path, rsid_number)
+
+
+HEADER = ("chromosome", "base_pair_location", "rsid")
+ROWS = [("1", str(p), f"rs{(p * 7919) % 100_003}" if p % 5 else "#NA") for p in range(1, 30_000)]
+
+
+def test_rsid_number():
+    assert rsid_number("rs123") == 123
+    assert rsid_number("RS123 ") == 123
+    assert rsid_number("1_100_A_G") is None
+
+
+@pytest.mark.parametrize("bgzip", [True, False])
+def test_rsid_lookup(tmp_path, bgzip):
+    outfile = tmp_path / ("test.tsv.gz" if bgzip else "test.tsv")
+    SumStatsTable.from_table(etl.wrap([HEADER] + ROWS)).to_file(outfile, bgzip=bgzip)
+    index_file, nindexed, nrows = build_rsid_index(outfile, HEADER)
+    assert index_file == rsid_index_path(outfile)
+    assert nrows == len(ROWS)
+    assert nindexed == sum(1 for row in ROWS if row[2] != "#NA")
+    records = load_rsid_index(outfile)
+    assert list(records["rsid"]) == sorted(records["rsid"])
+    wanted = [ROWS[i][2] for i in (1, 500, 29_000)] + ["rs999999999", "#NA"]
+    assert len(lookup_offsets(records, wanted)) == 3
+    rows = list(RsidView(outfile, wanted, header=HEADER))
+    assert rows == [HEADER, ROWS[1], ROWS[500], ROWS[29_000]]
+
+
+def test_rsid_index_is_rebuilt_when_the_file_changes(tmp_path):
+    outfile = tmp_path / "test.tsv"
+    etl.totsv(etl.wrap([HEADER] + ROWS[:10]), str(outfile))
+    build_rsid_index(outfile, HEADER)
+    etl.totsv(etl.wrap([HEADER] + ROWS), str(outfile))
+    assert load_rsid_index(outfile) is None
+    assert list(RsidView(outfile, [ROWS[20_000][2]], header=HEADER)) == [HEADER, ROWS[20_000]]
+
+
+def test_gzip_files_cannot_be_indexed(tmp_path):
+    outfile = tmp_path / "test.tsv.gz"
+    outfile.write_bytes(gzip.compress(b"rsid\nrs1\n"))
+    with pytest.raises(ValueError, match="--bgzip"):
+        build_rsid_index(outfile, ("rsid",))
@@ -0,0 +1,47 @@
+from gwas_sumstats_tools.interfaces.bgzf import BgzfWriter
+from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+from gwas_sumstats_tools.interfaces.sample import sample_rows
+
+
+LINES = ["#comment\n", "a\tb\n"] + [f"{i}\tx{i}\n" for i in range(50000)]
+
+
+def _check_sample(header, rows, nrows):
+    ids = [int(row[0]) for row in rows]
+    assert header == ("a", "b")
+    assert all(row == (str(i), f"x{i}") for i, row in zip(ids, rows))
+    assert ids == sorted(set(ids))
+    assert 0 < len(ids) <= nrows
+    assert ids[-1] > 45000
+
+
+def test_sample_uncompressed(tmp_path):
+    infile = tmp_path / "sample.tsv"
+    infile.write_text("".join(LINES))
+    header, rows, locations = sample_rows(infile, nrows=500, windows=50, removecomments="#")
+    _check_sample(header, rows, 500)
+    assert len(rows) == 500
+    assert locations[0].startswith("byte ")
+
+
+def test_sample_bgzf(tmp_path):
+    infile = tmp_path / "sample.tsv.gz"
+    with BgzfWriter(infile) as writer:
+        writer.write("".join(LINES).encode())
+    header, rows, locations = sample_rows(infile, nrows=500, windows=50, removecomments="#")
+    _check_sample(header, rows, 500)
+    assert locations[0] == "block 0"
+
+
+def test_small_file_is_sampled_whole(tmp_path):
+    infile = tmp_path / "sample.tsv"
+    infile.write_text("".join(LINES[:12]))
+    header, rows, _ = sample_rows(infile, removecomments="#")
+    assert [row[0] for row in rows] == [str(i) for i in range(10)]
+
+
+def test_sampled_rows_are_split_as_the_file_is_read(tmp_path):
+    infile = tmp_path / "sample.txt"
+    infile.write_text("a::b\n 1::x \n2::::y\n")
+    header, rows, _ = sample_rows(infile, delimiter="::")
+    assert [header] + rows == list(SumStatsTable(infile, delimiter="::").sumstats)
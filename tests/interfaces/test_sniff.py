@@ -0,0 +1,51 @@
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from gwas_sumstats_tools.interfaces.bgzf import BgzfWriter
+from gwas_sumstats_tools.interfaces.data_table import SumStatsTable
+from gwas_sumstats_tools.interfaces.sniff import sniff, sniff_delimiter, _sniff
+
+
+DATA = b"chromosome\tbase_pair_location\tp_value\n1\t100\t0.5\n2\t200\t0.1\n"
+
+
+@pytest.mark.parametrize("compression, write", [
+    (None, lambda f, data: f.write_bytes(data)),
+    ("gzip", lambda f, data: f.write_bytes(gzip.compress(data))),
+    ("bz2", lambda f, data: f.write_bytes(bz2.compress(data))),
+    ("xz", lambda f, data: f.write_bytes(lzma.compress(data))),
+    ("bgzf", lambda f, data: _bgzf(f, data)),
+])
+def test_sniff_compression_and_delimiter(tmp_path, compression, write):
+    infile = tmp_path / "mislabelled.csv"
+    write(infile, DATA)
+    assert sniff(infile) == (compression, "\t")
+    table = SumStatsTable(infile)
+    assert table.compression == compression
+    assert table.delimiter == "\t"
+    assert list(table.sumstats)[1] == ("1", "100", "0.5")
+
+
+def _bgzf(filename, data):
+    with BgzfWriter(filename) as writer:
+        writer.write(data)
+
+
+def test_sniff_delimiter():
+    assert sniff_delimiter("a,b,c\n1,\"2,3\",4\n") == ","
+    assert sniff_delimiter("a b c\n1 2 3\n") == " "
+    assert sniff_delimiter(" CHR  SNP  P\n   1  rs1  0.5\n") == r"\s+"
+    assert sniff_delimiter("## comment\na\tb\n1\t2\n", comment="##") == "\t"
+    assert sniff_delimiter("single\ncolumn\n") is None
+
+
+def test_sniff_is_cached(tmp_path):
+    infile = tmp_path / "test.tsv"
+    infile.write_bytes(DATA)
+    sniff(infile)
+    hits = _sniff.cache_info().hits
+    sniff(infile)
+    assert _sniff.cache_info().hits == hits + 1
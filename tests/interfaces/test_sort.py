@@ -0,0 +1,22 @@
+import petl as etl
+
+from gwas_sumstats_tools.interfaces.sort import ExternalSortView, position_key
+
+
+HEADER = ("chromosome", "base_pair_location", "n")
+
+
+def test_position_key():
+    assert position_key("2", "10") < position_key("10", "1")
+    assert position_key("22", "10") < position_key("X", "1") < position_key("MT", "1")
+    assert position_key("1", "5") < position_key("1", "#NA")
+
+
+def test_external_sort_spills_and_merges_runs(tmp_path):
+    rows = [(str(c), str(p), str(i)) for i, (c, p) in
+            enumerate((c, p) for p in (30, 10, 20, 10) for c in (10, 2, 1, 23))]
+    view = ExternalSortView(etl.wrap([HEADER] + rows), memory_budget=1, tempdir=tmp_path)
+    sorted_rows = list(view)
+    assert sorted_rows[0] == HEADER
+    assert sorted_rows[1:] == sorted(rows, key=lambda r: (position_key(r[0], r[1]), int(r[2])))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gwas_sumstats_tools.interfaces.bgzf import BgzfWriter
+from gwas_sumstats_tools.interfaces.stats import SumStats, log10_p
+from gwas_sumstats_tools.stats import stats
+
+
+HEADER = ("chromosome", "base_pair_location", "effect_allele", "other_allele",
+          "beta", "standard_error", "effect_allele_frequency", "p_value")
+
+
+def frame(n=20_000, seed=1):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"chromosome": rng.integers(1, 24, n).astype(str),
+                         "effect_allele_frequency": rng.uniform(0, 1, n).round(4).astype(str),
+                         "p_value": rng.uniform(0, 1, n).astype(str)})
+
+
+def test_log10_p_keeps_p_values_below_the_smallest_float():
+    logs = log10_p(pd.Series(["0.01", "1e-400", "2.5E-1000", "0", "#NA"], dtype=object))
+    assert logs[:3] == pytest.approx([-2, -400, np.log10(2.5) - 1000])
+    assert logs[3] == -np.inf
+    assert np.isnan(logs[4])
+
+
+def test_merged_summaries_equal_the_summary_of_all_rows():
+    df = frame()
+    whole = SumStats().update(df).to_dict()
+    merged = SumStats().update(df[:7000]).merge(SumStats().update(df[7000:])).to_dict()
+    assert merged == whole
+    assert whole["rows"] == sum(whole["chromosomes"].values()) == 20_000
+    assert whole["p_value"]["lambda_gc"] == pytest.approx(1, abs=0.05)
+    assert sum(whole["effect_allele_frequency"]["minor_allele_frequency"].values()) == 20_000
+
+
+def test_lambda_gc_of_the_median_p_value():
+    p_values = pd.Series(np.linspace(0.001, 0.999, 999).astype(str))
+    # median p of 0.5 is a chi-squared statistic of 0.4549, lambda GC 1
+    assert SumStats().update(pd.DataFrame({"p_value": p_values})).lambda_gc() == pytest.approx(1, abs=1e-3)
+
+
+def test_stats_of_bgzf_file_in_parallel(tmp_path):
+    df = frame()
+    df["p_value"] = df["p_value"].where(df.index != 5, "1e-400")
+    df["p_value"] = df["p_value"].where(df.index != 6, "#NA")
+    table = pd.DataFrame({field: df[field] if field in df else "1" for field in HEADER})
+    filename = tmp_path / "in.tsv.gz"
+    with BgzfWriter(filename) as writer:
+        writer.write(table.to_csv(sep="\t", index=False).encode())
+    summary = stats(filename, workers=3)
+    assert summary == stats(filename)
+    assert summary["rows"] == 20_000
+    assert summary["p_value"]["minimum_p_value"] == "1e-400"
+    assert summary["p_value"]["missing"] == 1
+    assert summary["p_value"]["significant"]["p < 5e-08"] >= 1
@@ -0,0 +1,72 @@
+import gzip
+import json
+
+import pytest
+
+from benchmarks.run import app, parse_rows, regressions, run_benchmarks
+from benchmarks.synthetic import GWAS_SSF_FIELDS, preset_layout, synthetic_chunks, write_synthetic
+from gwas_sumstats_tools.schema.pre_defined_configure import pre_defined_configure
+
+
+NROWS = 2000
+
+
+def test_synthetic_files_are_deterministic(tmp_path):
+    paths = [write_synthetic(tmp_path / f"{compression}.tsv", NROWS, seed=3, compression=compression)
+             for compression in ("plain", "gz", "bgzf")]
+    again = write_synthetic(tmp_path / "again.tsv", NROWS, seed=3)
+    plain = paths[0].read_bytes()
+    assert again.read_bytes() == plain
+    assert all(gzip.decompress(path.read_bytes()) == plain for path in paths[1:])
+    lines = plain.decode().splitlines()
+    assert tuple(lines[0].split("\t")) == GWAS_SSF_FIELDS
+    assert len(lines) == NROWS + 1
+    assert write_synthetic(tmp_path / "other.tsv", NROWS, seed=4).read_bytes() != plain
+
+
+def test_broken_variants_differ_from_valid():
+    valid = next(synthetic_chunks(50_000))
+    for variant, fraction in (("light", 1e-4), ("heavy", 0.05)):
+        broken = next(synthetic_chunks(50_000, variant=variant))
+        rows = {row for field in GWAS_SSF_FIELDS
+                for row, (good, bad) in enumerate(zip(valid[field], broken[field])) if good != bad}
+        assert 0 < len(rows) < 50_000 * fraction * 2
+
+
+@pytest.mark.parametrize("preset", list(pre_defined_configure))
+def test_preset_layout_has_preset_fields(preset):
+    layout = preset_layout(next(synthetic_chunks(10)), preset)
+    assert list(layout) == [edit["field"] for edit in pre_defined_configure[preset]["columnConfig"]["edit"]]
+    assert all(len(values) == 10 for values in layout.values())
+
+
+def test_parse_rows():
+    assert [parse_rows(rows) for rows in ("1M", "250k", "1.5m", "1000")] == [1_000_000, 250_000, 1_500_000, 1000]
+
+
+def test_run_benchmarks(tmp_path):
+    results = run_benchmarks(NROWS, tmp_path,
+                             benchmarks=["startup", "validate", "read", "gen_meta"],
+                             compressions=["plain", "bgzf"])
+    outcomes = {(entry["benchmark"], entry["variant"], entry["compression"]): entry["outcome"] for entry in results}
+    assert outcomes[("validate", "valid", "plain")] == "valid"
+    assert outcomes[("validate", "valid", "bgzf")] == "valid"
+    assert outcomes[("validate", "heavy", "plain")] == "data"
+    assert outcomes[("read", "valid", "bgzf")] == f"{NROWS} rows"
+    assert outcomes[("gen_meta", "valid", "plain")] == "ok"
+    assert ("startup", "valid", "plain") in outcomes
+    assert all(entry["seconds"] > 0 for entry in results)
+    slower = [dict(entry, seconds=entry["seconds"] * 2) for entry in results[:2]]
+    assert regressions(slower, results, tolerance=1.5) == list(zip(slower, results[:2]))
+    assert regressions(results, results, tolerance=1.5) == []
+
+
+def test_run_writes_json(tmp_path):
+    from typer.testing import CliRunner
+    out = tmp_path / "bench.json"
+    result = CliRunner().invoke(app, ["--rows", "500", "--benchmark", "read,stats", "--compression", "gz",
+                                      "--workdir", str(tmp_path), "--out", str(out)])
+    assert result.exit_code == 0
+    report = json.loads(out.read_text())
+    assert {"version", "python", "cpu_count", "results"} <= set(report)
+    assert [entry["benchmark"] for entry in report["results"]] == ["read", "stats"]
@@ -1,3 +1,8 @@
+import json
+import subprocess
+import sys
+
+import pytest
 from typer.testing import CliRunner
 
 from gwas_sumstats_tools.cli import app
@@ -17,3 +22,66 @@ def test_all_commands():
     assert format_cmd.exit_code == 0
     validate_cmd = runner.invoke(app, ["validate"])
     assert validate_cmd.exit_code == 0
+
+
+# Modules light commands must not load, they make startup slow. The
+# startup time itself is measured by the startup benchmark, see benchmarks/run.py.
+HEAVY_MODULES = ("pandas", "pandera", "pydantic", "numpy", "requests", "ruamel", "bsub")
+STARTUP_SCRIPT = """
+import json, sys
+from gwas_sumstats_tools.cli import app
+try:
+    app(sys.argv[1:])
+except SystemExit:
+    pass
+print(json.dumps([m for m in %r if m in sys.modules]), file=sys.stderr)
+"""
+
+
+def loaded_heavy_modules(*args):
+    result = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT % (HEAVY_MODULES,), *args],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stderr.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("args", [["version"], ["read", "--get-header", "{file}"]])
+def test_light_commands_do_not_load_heavy_modules(tmp_path, args):
+    sumstats = tmp_path / "in.tsv"
+    sumstats.write_text("chromosome\tbase_pair_location\tp_value\n1\t100\t0.5\n")
+    args = [arg.format(file=sumstats) for arg in args]
+    assert loaded_heavy_modules(*args) == []
+
+
+def test_profile(tmp_path):
+    sumstats = tmp_path / "in.tsv"
+    sumstats.write_text("chromosome\tbase_pair_location\tp_value\n1\t100\t0.5\n")
+    profile = tmp_path / "read.prof"
+    result = runner.invoke(app, ["--profile", str(profile), "--profile-sample", "read", str(sumstats)])
+    assert result.exit_code == 0
+    assert "Hot spots" in result.output
+    assert "Hot lines" in result.output
+    assert profile.exists()
+    assert (tmp_path / "read.prof.folded").exists()
+    assert runner.invoke(app, ["--profile-sample", "version"]).exit_code != 0
+
+
+def test_metrics(tmp_path):
+    from benchmarks.synthetic import write_synthetic
+    sumstats = write_synthetic(tmp_path / "in.tsv", 2000)
+    metrics = tmp_path / "metrics.json"
+    result = runner.invoke(app, ["--metrics", str(metrics), "validate", str(sumstats), "--min-rows", "1000"])
+    assert result.exit_code == 0
+    assert "Peak memory by stage" in result.output
+    stages = json.loads(metrics.read_text())["stages"]
+    assert {"read", "p-value split", "schema validation"} <= set(stages)
+
+
+def test_format_metrics(tmp_path):
+    from benchmarks.synthetic import write_synthetic
+    sumstats = write_synthetic(tmp_path / "in.tsv", 2000, preset="REGENIE")
+    metrics = tmp_path / "metrics.json"
+    result = runner.invoke(app, ["--metrics", str(metrics), "format", str(sumstats), "--apply_config",
+                                 "--analysis_software", "REGENIE", "-o", str(tmp_path / "out.tsv")])
+    assert result.exit_code == 0
+    stages = json.loads(metrics.read_text())["stages"]
+    assert {"read", "split and edit", "p-value conversion", "write"} <= set(stages)
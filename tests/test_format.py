@@ -1,11 +1,27 @@
 import pytest
+import petl as etl
+from functools import partial
+from operator import itemgetter
 from pathlib import Path
 
 from tests.prep_tests import (SSTestFile,
                               TEST_DATA,
                               MetaTestFile,
                               TEST_METADATA)
-from gwas_sumstats_tools.format import Formatter
+from gwas_sumstats_tools.format import (Formatter,
+                                        format,
+                                        estimate_job_memory,
+                                        memory_class,
+                                        time_class,
+                                        write_task_manifests,
+                                        write_sbatch_script,
+                                        JOB_BASE_MEMORY,
+                                        _FormattedChunks,
+                                        _format_chunk)
+from gwas_sumstats_tools.read import Reader
+from gwas_sumstats_tools.validate import validate
+from gwas_sumstats_tools.interfaces.metadata import get_file_metadata
+from gwas_sumstats_tools.utils import get_md5sum, read_file_digest
 
 
 @pytest.fixture()
@@ -44,3 +60,187 @@ class TestFormatter:
         assert isinstance(f.data_outfile, Path)
         assert str(f.data_outfile) == "TEST_OUT"
         
+
+    def test_parallel_formatting_keeps_input_order(self, sumstats_file):
+        config = {
+            "fileConfig": {"fieldSeparator": "\t", "naValue": None,
+                           "convertNegLog10Pvalue": False, "removeComments": None},
+            "columnConfig": {
+                "split": [],
+                "edit": [{"field": "rsid", "rename": "rsid", "find": "rs",
+                          "replace": "RS", "extract": None}]
+            }
+        }
+        serial = Formatter(sumstats_file, config_dict=config,
+                           data_outfile=sumstats_file + ".serial.tsv")
+        serial.data_to_file()
+        parallel = Formatter(sumstats_file, config_dict=config, workers=2, chunksize=3,
+                             data_outfile=sumstats_file + ".parallel.tsv")
+        parallel.data_to_file()
+        with open(serial.data_outfile) as s, open(parallel.data_outfile) as p:
+            assert s.read() == p.read()
+
+    def test_parallel_formatting_of_header_only_table_keeps_header(self):
+        config = {
+            "fileConfig": {"fieldSeparator": "\t", "naValue": None,
+                           "convertNegLog10Pvalue": False, "removeComments": None},
+            "columnConfig": {"split": [], "edit": []}
+        }
+        transform = partial(_format_chunk, config=config, na_value=None)
+        header = ("chromosome", "base_pair_location", "p_value", "extra")
+        rows = ("1", "100", "0.5", "x")
+        formatted = _FormattedChunks(etl.wrap([header]), transform, workers=2, chunksize=3)
+        with_rows = _FormattedChunks(etl.wrap([header, rows]), transform, workers=2, chunksize=3)
+        assert list(formatted) == [next(iter(with_rows))]
+        assert "extra" in next(iter(formatted))
+        assert list(_FormattedChunks(etl.wrap([]), transform, workers=2, chunksize=3)) == []
+
+    def test_sort_writes_sorted_output_and_metadata(self, sumstats_file):
+        f = Formatter(sumstats_file, analysis_software="SAIGE", sort=True, sort_memory=1,
+                      data_outfile=sumstats_file + ".sorted.tsv")
+        f.data_to_file()
+        chromosomes = [int(c) for c in etl.values(etl.fromtsv(str(f.data_outfile)), "chromosome")]
+        assert chromosomes == sorted(chromosomes)
+        metadata = Reader(metadata_file=Path(str(f.data_outfile) + "-meta.yaml")).metadata_dict()
+        assert metadata["is_sorted"] is True
+        assert metadata["data_file_name"] == f.data_outfile.name
+
+    def test_validate_while_writing(self, sumstats_file):
+        f = Formatter(sumstats_file, analysis_software="SAIGE", validate=True, minimum_rows=4,
+                      data_outfile=sumstats_file + ".validated.tsv")
+        f.data_to_file()
+        valid, message, error_preview, error_type = f.validation
+        assert valid is True
+        assert error_type is None
+
+    def test_validate_minimal_to_standard(self, sumstats_file, tmp_path):
+        outfile = tmp_path / "standard.tsv"
+        data_outfile, (valid, _, _, error_type) = format(filename=sumstats_file, data_outfile=outfile,
+                                                         minimal_to_standard=True, validate=True,
+                                                         minimum_rows=4)
+        assert data_outfile == outfile
+        # the same verdict as validating the output afterwards
+        assert (valid, error_type) == itemgetter(0, 3)(validate(outfile, minimum_rows=4))
+
+    def test_batch_apply_validates_each_output(self, sumstats_file, tmp_path):
+        manifest = tmp_path / "manifest.tsv"
+        manifest.write_text(f"{sumstats_file}\t{tmp_path / 'out.tsv'}\n")
+        [(_, _, error, _)] = format(filename=manifest, batch_apply=True, analysis_software="SAIGE",
+                                    validate=True, minimum_rows=len(TEST_DATA["chromosome"]) + 1)
+        assert error.startswith("Invalid output")
+        [(_, _, error, _)] = format(filename=manifest, batch_apply=True, analysis_software="SAIGE",
+                                    validate=True, minimum_rows=4)
+        assert error is None
+
+    def test_digest_is_written_with_the_output(self, sumstats_file, mocker):
+        f = Formatter(sumstats_file, analysis_software="SAIGE",
+                      data_outfile=sumstats_file + ".digest.tsv.gz")
+        f.data_to_file()
+        digest = read_file_digest(f.data_outfile)
+        assert digest["nrows"] == len(TEST_DATA["chromosome"])
+        assert digest["md5sum"] == get_md5sum(f.data_outfile)
+        md5sum = mocker.patch("gwas_sumstats_tools.interfaces.metadata.get_md5sum")
+        assert get_file_metadata(in_file=f.data_infile,
+                                 out_file=f.data_outfile).data_file_md5sum == digest["md5sum"]
+        md5sum.assert_not_called()
+
+    def test_batch_apply_formats_largest_first_and_reports_failures(self, sumstats_file, tmp_path):
+        small = tmp_path / "small.tsv"
+        with open(sumstats_file) as fh:
+            small.write_text("".join(fh.readlines()[:3]))
+        manifest = tmp_path / "manifest.tsv"
+        manifest.write_text(f"{small}\t{tmp_path / 'small.out.tsv'}\n"
+                            f"{sumstats_file}\t{tmp_path / 'large.out.tsv'}\n"
+                            f"{tmp_path / 'missing.tsv'}\t{tmp_path / 'missing.out.tsv'}\n")
+        results = format(filename=manifest, batch_apply=True, analysis_software="SAIGE", workers=1)
+        assert [Path(infile) for infile, *_ in results] == [Path(sumstats_file), small, tmp_path / "missing.tsv"]
+        assert [error is None for _, _, error, _ in results] == [True, True, False]
+        assert etl.nrows(etl.fromtsv(str(tmp_path / "large.out.tsv"))) == len(TEST_DATA["chromosome"])
+        assert etl.nrows(etl.fromtsv(str(tmp_path / "small.out.tsv"))) == 2
+        rerun = format(filename=manifest, batch_apply=True, analysis_software="SAIGE", workers=1)
+        assert [Path(infile) for infile, *_ in rerun] == [tmp_path / "missing.tsv"]
+
+    def test_cluster_batch_is_resumed_from_derived_outfiles(self, sumstats_file, tmp_path, mocker):
+        from gwas_sumstats_tools.format import _apply_config_job, default_data_outfile
+        from gwas_sumstats_tools.schema.pre_defined_configure import pre_defined_configure
+
+        def run_jobs(config_infile, analysis_software, task, options=""):
+            # a job that finishes as soon as it is submitted
+            for line in task[0].read_text().splitlines():
+                _apply_config_job((line.split("\t")[0], None), pre_defined_configure["SAIGE"], "SAIGE", {})
+
+        submit = mocker.patch("gwas_sumstats_tools.format.lsf_apply_config", side_effect=run_jobs)
+        manifest = tmp_path / "manifest.tsv"
+        manifest.write_text(f"{sumstats_file}\n")
+        format(filename=manifest, batch_apply=True, analysis_software="SAIGE", lsf=True)
+        assert default_data_outfile(sumstats_file, pre_defined_configure["SAIGE"]).exists()
+        assert submit.call_count == 1
+        format(filename=manifest, batch_apply=True, analysis_software="SAIGE", lsf=True)
+        assert submit.call_count == 1
+
+    def test_estimate_job_memory(self):
+        assert estimate_job_memory() == JOB_BASE_MEMORY
+        assert estimate_job_memory(sort=True, sort_memory=100) == JOB_BASE_MEMORY + 100
+
+    def test_memory_and_time_class(self):
+        assert memory_class(512) == 1024
+        assert memory_class(1024) == 1024
+        assert memory_class(1536) == 2048
+        assert [time_class(minutes) for minutes in (1, 30, 31, 330)] == [30, 30, 60, 480]
+
+    def test_task_manifests_and_sbatch_script(self, tmp_path):
+        files_info = []
+        for name, size in (("small1.tsv", 1000), ("large.tsv", 10 * 1024 ** 3), ("small2.tsv", 2000)):
+            with open(tmp_path / name, "wb") as fh:
+                fh.truncate(size)
+            files_info.append([str(tmp_path / name), name + ".out"])
+        tasks = write_task_manifests(tmp_path / "manifest.tsv", files_info, sort=True, sort_memory=1024)
+        assert [(task[1], task[2], task[3]) for task in tasks] == [(2, 2048, 60), (1, 2048, 480)]
+        assert tasks[0][0].name == "manifest.tsv-tasks-2048M-60min-0.tsv"
+        assert tasks[0][0].read_text() == (f"{tmp_path / 'small1.tsv'}\tsmall1.tsv.out\n"
+                                           f"{tmp_path / 'small2.tsv'}\tsmall2.tsv.out\n")
+        script = write_sbatch_script(None, "SAIGE", tasks[1]).read_text()
+        assert "#SBATCH --array=1-1\n" in script
+        assert "#SBATCH --mem=2048M\n" in script
+        assert "$SLURM_ARRAY_TASK_ID" in script
+        assert "--analysis_software SAIGE" in script
+
+    def test_config_reports_failing_steps_for_sampled_rows(self, tmp_path):
+        infile = tmp_path / "test.tsv"
+        rows = ["chr_bp\tp"] + [f"{i % 22 + 1}_{i}\t0.5" for i in range(30)]
+        rows[25] = "X:25\t0.5"
+        infile.write_text("\n".join(rows) + "\n")
+        config = {
+            "fileConfig": {"fieldSeparator": "\t", "naValue": None,
+                           "convertNegLog10Pvalue": False, "removeComments": None},
+            "columnConfig": {
+                "split": [{"field": "chr_bp", "separator": None, "capture": r"(\d+)_(\d+)",
+                           "new_field": ["chromosome", "base_pair_location"], "include_original": False}],
+                "edit": [{"field": "p", "rename": "p_value", "find": None, "replace": None, "extract": None}]
+            }
+        }
+        f = Formatter(infile, config_dict=config)
+        sample = f.test_config()
+        assert list(f.config_failures) == ["capture chr_bp with '(\\d+)_(\\d+)'"]
+        [(location, row, error)] = f.config_failures["capture chr_bp with '(\\d+)_(\\d+)'"]
+        assert row == ("X:25", "0.5")
+        assert location.startswith("byte ")
+        assert etl.nrows(sample.sumstats) == 29
+        assert "p_value" in sample.header()
+
+    def test_suggest_header_mapping(self, tmp_path):
+        infile = tmp_path / "test.tsv"
+        infile.write_text("CHR\tBP\tSNP\tid\tP-value\tother\n1\t2\trs1\tv1\t0.5\tx\n")
+        f = Formatter(infile)
+        assert f.suggest_header_mapping() == {"CHR": "chromosome", "BP": "base_pair_location",
+                                              "SNP": "variant_id", "id": "rsid",
+                                              "P-value": "p_value", "other": "other"}
+
+    def test_regenie_log10p_beyond_float_range(self, tmp_path):
+        infile = tmp_path / "test.regenie"
+        infile.write_text("CHROM GENPOS ID ALLELE0 ALLELE1 A1FREQ N BETA SE LOG10P\n"
+                          "1 100 rs1 A G 0.1 1000 0.5 0.01 400.5\n"
+                          "1 200 rs2 C T 0.2 1000 0.1 0.02 NA\n")
+        f = Formatter(infile, analysis_software="REGENIE", data_outfile=tmp_path / "out.tsv")
+        f.data_to_file()
+        assert list(etl.values(etl.fromtsv(str(f.data_outfile)), "p_value")) == ["3.16228e-401", "#NA"]
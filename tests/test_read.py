@@ -1,3 +1,4 @@
+import petl as etl
 import pytest
 
 from tests.prep_tests import (SSTestFile,
@@ -42,3 +43,22 @@ class TestReader:
         r = Reader(metadata_file=meta_file)
         assert r.metadata_dict().get('gwas_id') == TEST_METADATA.get('gwas_id')
         assert r.metadata_dict(include=['gwas_id']) == {'gwas_id': TEST_METADATA.get('gwas_id')}
+
+    def test_preview(self, sumstats_file):
+        r = Reader(sumstats_file=sumstats_file)
+        preview = r.preview(nrows=2)
+        assert etl.header(preview) == tuple(TEST_DATA.keys())
+        assert etl.nrows(preview) == min(2, len(next(iter(TEST_DATA.values()))))
+        assert r._data is None
+
+    def test_count_rows(self, sumstats_file):
+        r = Reader(sumstats_file=sumstats_file)
+        assert r.count_rows() == len(TEST_DATA["chromosome"])
+
+    def test_head_reads_only_columns(self, sumstats_file):
+        r = Reader(sumstats_file=sumstats_file, columns=["p_value", "chromosome"])
+        assert r.columns_data.columns == ("p_value", "chromosome")
+        assert etl.header(r.head(nrows=2)) == ("p_value", "chromosome")
+        assert r.file_header() == tuple(TEST_DATA.keys())
+        with pytest.raises(ValueError, match="Columns not in the file"):
+            Reader(sumstats_file=sumstats_file, columns=["nope"]).columns_data
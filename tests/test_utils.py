@@ -4,7 +4,10 @@ from gwas_sumstats_tools.utils import (append_to_path,
                                        parse_genome_assembly,
                                        replace_dictionary_keys,
                                        split_fields_on_delimiter,
-                                       get_version)
+                                       get_version,
+                                       get_md5sum,
+                                       write_file_digest,
+                                       read_file_digest)
 
 
 def test_append_to_path():
@@ -41,3 +44,13 @@ def test_split_fields_on_delimiter():
 
 def test_get_version():
     assert version.parse(get_version())
+
+
+def test_file_digest(tmp_path):
+    data_file = tmp_path / "test.tsv"
+    data_file.write_text("a\tb\n1\t2\n")
+    write_file_digest(data_file, md5sum=get_md5sum(data_file), nrows=1)
+    assert read_file_digest(data_file) == {"md5sum": get_md5sum(data_file), "nrows": 1,
+                                           "size": 8, "mtime_ns": data_file.stat().st_mtime_ns}
+    data_file.write_text("a\tb\n1\t2\n3\t4\n")
+    assert read_file_digest(data_file) is None
@@ -1,10 +1,10 @@
 import pytest
 import pathlib
 import petl as etl
-from tests.prep_tests import SSTestFile, EFFECT_FIELDS
+from tests.prep_tests import SSTestFile, EFFECT_FIELDS, TEST_DATA
 from pandera import DataFrameSchema
 
-from gwas_sumstats_tools.validate import Validator
+from gwas_sumstats_tools.validate import Validator, StreamValidator
 
 
 @pytest.fixture()
@@ -668,4 +668,44 @@ class TestValidator:
 
         # Validate the data
         assert status is False
-        assert v.primary_error_type == 'data'
\ No newline at end of file
+        assert v.primary_error_type == 'data'
+
+
+def _stream_validate(filepath, **kwargs):
+    v = StreamValidator(sumstats_file=filepath, **kwargs)
+    rows = list(v.tee(etl.fromtsv(filepath)))
+    assert len(rows) == len(TEST_DATA["chromosome"]) + 1
+    return v
+
+
+class TestStreamValidator:
+    def test_valid_data(self, sumstats_file):
+        sumstats_file.to_file()
+        v = _stream_validate(sumstats_file.filepath, minimum_rows=4)
+        assert (v.valid, v.message) == Validator(sumstats_file=sumstats_file.filepath,
+                                                 minimum_rows=4).validate()
+
+    def test_invalid_data_in_later_chunk(self, sumstats_file):
+        sumstats_file.replace_data("p_value", TEST_DATA["p_value"][:20] + ["2"] + TEST_DATA["p_value"][21:])
+        sumstats_file.to_file()
+        v = _stream_validate(sumstats_file.filepath, minimum_rows=4, sample_size=4, chunksize=5)
+        validator = Validator(sumstats_file=sumstats_file.filepath,
+                              minimum_rows=4, sample_size=4, chunksize=5)
+        assert (v.valid, v.message) == validator.validate() == (False, "Data table is invalid")
+        assert v.primary_error_type == validator.primary_error_type == "data"
+        assert list(v.errors_table) == list(validator.errors_table)
+
+    def test_minimum_rows(self, sumstats_file):
+        sumstats_file.to_file()
+        v = _stream_validate(sumstats_file.filepath, minimum_rows=30)
+        assert v.valid is False
+        assert v.primary_error_type == "minrows"
+
+
+def test_validate_reads_only_schema_columns(sumstats_file, mocker):
+    sumstats_file.to_file()
+    v = Validator(sumstats_file=sumstats_file.filepath, minimum_rows=4)
+    assert set(v.schema_columns()) <= set(v.header())
+    as_pd_df = mocker.spy(v, "as_pd_df")
+    assert v.validate() == (True, "Data table is valid.")
+    assert all(call.kwargs["usecols"] == v.schema_columns() for call in as_pd_df.call_args_list)